@@ -0,0 +1,76 @@
+
+# Library imports
+import random
+import timeit
+
+# Project imports
+from board import Board
+from bitboard import BitBoard
+
+
+# Board sizes to benchmark, and how many calls to time per operation
+SIZES = range(3, 9)
+NUMBER = 20000
+
+# Operations to time, as statements run against a board instance "b"
+OPERATIONS = [("is_won", "b.is_won()"),
+              ("is_full", "b.is_full()"),
+              ("is_empty", "b.is_empty(0, 0)"),
+              ("matrix_copy", "b.matrix_copy()"),
+              ("copy+set_tile", "b.set_tile(r, c, v, b.matrix_copy())"),
+              ("push+pop", "b.push(r, c, v); b.pop()"),
+              ("random_empty_tile", "b.random_empty_tile()")]
+
+
+def half_filled(board_class, size, seed=0):
+    """
+    Builds a board of the given class with half its tiles taken by alternating random moves
+    :param board_class: Board or BitBoard
+    :param size: Board size
+    :param seed: Random seed, so both backends see the same position
+    :return: board instance
+    """
+    board = board_class(size)
+    tiles = [(row, col) for row in range(size) for col in range(size)]
+    random.Random(seed).shuffle(tiles)
+
+    # Take the first half of the shuffled tiles, alternating noughts and crosses
+    for index, (row, col) in enumerate(tiles[:len(tiles) // 2]):
+        board.set_tile(row, col, Board.NOUGHT if index % 2 == 0 else Board.CROSS)
+
+    return board
+
+
+def time_call(board, statement):
+    """
+    Times a statement against a board, returning the best per-call time in microseconds
+    :param board: Board instance, available to the statement as "b"
+    :param statement: Statement to time
+    :return: float
+    """
+    row, col = board.list_empty_tiles()[0]
+    namespace = {"b": board, "r": row, "c": col, "v": Board.CROSS}
+    timer = timeit.Timer(statement, globals=namespace)
+    return min(timer.repeat(repeat=3, number=NUMBER)) / NUMBER * 1e6
+
+
+def main():
+    """
+    Prints per-call timings for the matrix and bitboard backends, with the bitboard speedup
+    """
+    print("{:>4} {:>17} {:>12} {:>14} {:>9}".format("size", "operation", "matrix (us)", "bitboard (us)", "speedup"))
+
+    for size in SIZES:
+        matrix_board = half_filled(Board, size)
+        bit_board = half_filled(BitBoard, size)
+
+        for name, statement in OPERATIONS:
+            matrix_time = time_call(matrix_board, statement)
+            bit_time = time_call(bit_board, statement)
+            print("{:>4} {:>17} {:>12.3f} {:>14.3f} {:>8.1f}x".format(size, name, matrix_time, bit_time,
+                                                                      matrix_time / bit_time))
+
+
+# If this script is execute directly, call the main function
+if __name__ == "__main__":
+    main()
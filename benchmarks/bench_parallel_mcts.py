@@ -0,0 +1,58 @@
+
+# Library imports
+import os
+import time
+
+# Project imports
+from mcts import MctsSearch, ParallelMctsSearch
+
+
+# Board to search (9x9, five in a row), and seconds to search for at each worker count
+SIZE = 9
+WIN_LENGTH = 5
+TIME_LIMIT = 2.0
+
+
+def playouts_per_second(workers):
+    """
+    Searches the empty board for TIME_LIMIT seconds, and measures the total playout rate
+    :param workers: Number of worker processes (0 for a plain single process search)
+    :return: float
+    """
+    if workers:
+        search = ParallelMctsSearch(SIZE, WIN_LENGTH, time_limit=TIME_LIMIT, seed=0, workers=workers)
+    else:
+        search = MctsSearch(SIZE, WIN_LENGTH, time_limit=TIME_LIMIT, seed=0)
+
+    # Workers are already started, so this only times the search itself
+    start = time.time()
+    search.search(0, 0)
+    elapsed = time.time() - start
+
+    if workers:
+        search.close()
+    return search.playouts / elapsed
+
+
+def main():
+    """
+    Prints the playout rate of a single process search, and of the root parallel search with 1 worker up
+    to twice the number of cores
+    """
+    cores = os.cpu_count() or 1
+    print("{}x{} board, {} in a row, {} cores".format(SIZE, SIZE, WIN_LENGTH, cores))
+    print("{:>8} {:>14} {:>8}".format("workers", "playouts/sec", "speedup"))
+
+    baseline = playouts_per_second(0)
+    print("{:>8} {:>14.0f} {:>7.2f}x".format("none", baseline, 1.0))
+
+    workers = 1
+    while workers <= cores * 2:
+        rate = playouts_per_second(workers)
+        print("{:>8} {:>14.0f} {:>7.2f}x".format(workers, rate, rate / baseline))
+        workers *= 2
+
+
+# If this script is execute directly, call the main function
+if __name__ == "__main__":
+    main()
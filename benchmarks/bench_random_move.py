@@ -0,0 +1,89 @@
+
+# Library imports
+import random
+import timeit
+
+# Project imports
+from board import Board, NotEmptyException
+
+
+# Board size, fill ratios to measure at, and moves to time at each
+SIZE = 50
+FILL_RATIOS = (0.0, 0.25, 0.5, 0.75, 0.9, 0.99, 0.999)
+NUMBER = 2000
+
+
+def rejection_move(board, rng):
+    """
+    The old random move, retrying random tiles until one is free
+    :param board: Board instance
+    :param rng: random.Random instance
+    :return: (row, col) tuple
+    """
+    while True:
+        row = rng.randrange(0, board.size)
+        col = rng.randrange(0, board.size)
+        try:
+            board.set_tile(row, col, Board.CROSS)
+        except NotEmptyException:
+            pass
+        else:
+            return row, col
+
+
+def free_list_move(board, rng):
+    """
+    The new random move, picked straight from the board's free tiles
+    :param board: Board instance
+    :param rng: random.Random instance
+    :return: (row, col) tuple
+    """
+    move = board.random_empty_tile(rng)
+    board.set_tile(move[0], move[1], Board.CROSS)
+    return move
+
+
+def filled_board(ratio, rng):
+    """
+    Builds a board with the given fraction of its tiles taken (at least one tile is left free)
+    :param ratio: Fraction of tiles to take
+    :param rng: random.Random instance
+    :return: Board
+    """
+    board = Board(SIZE)
+    for _ in range(min(int(SIZE * SIZE * ratio), SIZE * SIZE - 1)):
+        free_list_move(board, rng)
+    return board
+
+
+def time_move(board, move_function, rng):
+    """
+    Times a random move (undoing it again each time, to stay at the same fill ratio)
+    :param board: Board instance
+    :param move_function: rejection_move or free_list_move
+    :param rng: random.Random instance
+    :return: float, microseconds per move
+    """
+    def move_and_undo():
+        move_function(board, rng)
+        board.pop()
+    return min(timeit.repeat(move_and_undo, repeat=3, number=NUMBER)) / NUMBER * 1e6
+
+
+def main():
+    """
+    Prints random move latency against fill ratio, for rejection sampling and the free tile list
+    """
+    rng = random.Random(0)
+    print("{}x{} board".format(SIZE, SIZE))
+    print("{:>6} {:>16} {:>16}".format("fill", "rejection (us)", "free list (us)"))
+
+    for ratio in FILL_RATIOS:
+        board = filled_board(ratio, rng)
+        print("{:>6.1%} {:>16.2f} {:>16.2f}".format(ratio, time_move(board, rejection_move, rng),
+                                                     time_move(board, free_list_move, rng)))
+
+
+# If this script is execute directly, call the main function
+if __name__ == "__main__":
+    main()
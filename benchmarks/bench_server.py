@@ -0,0 +1,129 @@
+
+# Library imports
+import argparse
+import asyncio
+import json
+import random
+import time
+
+# Project imports
+import numpy as np
+from player import AiPlayer
+from server import GameServer
+
+
+async def play_games(host, port, path, games, size, ai_options, seed, latencies):
+    """
+    One load test client, playing games one after another with random moves, over its own connection
+    :param host: Server TCP host
+    :param port: Server TCP port
+    :param path: Server Unix socket path (used instead of TCP if given)
+    :param games: Number of games to play
+    :param size: Board size
+    :param ai_options: Dict of AiPlayer options for the server's AI
+    :param seed: Random seed for this client's moves
+    :param latencies: List to append each move request's latency (seconds) to
+    """
+    if path is not None:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    rng = random.Random(seed)
+
+    async def request(message):
+        """
+        Sends a request, and waits for its response
+        """
+        writer.write(json.dumps(message).encode() + b"\n")
+        await writer.drain()
+        response = json.loads(await reader.readline())
+        if not response["ok"]:
+            raise RuntimeError(response["error"])
+        return response
+
+    for game in range(games):
+        response = await request({"op": "new", "size": size, "ai": ai_options, "seed": seed * games + game})
+        free = [(row, col) for row in range(size) for col in range(size) if not response["board"][row][col]]
+
+        # Take random free tiles until the game ends, timing each move (which includes the AI's reply)
+        while not response["finished"]:
+            row, col = free.pop(rng.randrange(len(free)))
+            start = time.perf_counter()
+            response = await request({"op": "move", "game": response["game"], "row": row, "col": col})
+            latencies.append(time.perf_counter() - start)
+            if response["move"] is not None:
+                free.remove(tuple(response["move"]))
+
+        await request({"op": "close", "game": response["game"]})
+
+    writer.close()
+    await writer.wait_closed()
+
+
+async def load_test(clients, games, size, ai_options, host=None, port=None, path=None, workers=None,
+                    processes=False):
+    """
+    Runs concurrent clients against a server, starting one in this process if no address is given
+    :param clients: Number of concurrent clients
+    :param games: Games per client
+    :param size: Board size
+    :param ai_options: Dict of AiPlayer options for the server's AI
+    :param host: Server TCP host (None to start a server here)
+    :param port: Server TCP port
+    :param path: Server Unix socket path
+    :param workers: Executor workers, for a server started here
+    :param processes: Use a process pool, for a server started here
+    :return: (list of move latencies in seconds, elapsed seconds) tuple
+    """
+    game_server = server = None
+    if host is None and path is None:
+        game_server = GameServer(workers, processes)
+        server = await game_server.start("127.0.0.1", 0)
+        host, port = server.sockets[0].getsockname()[:2]
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*[play_games(host, port, path, games, size, ai_options, client, latencies)
+                           for client in range(clients)])
+    elapsed = time.perf_counter() - start
+
+    if server is not None:
+        await game_server.wait_connections()
+        server.close()
+        await server.wait_closed()
+        game_server.close()
+    return latencies, elapsed
+
+
+def main():
+    """
+    Prints move latency percentiles for concurrent clients playing against the server
+    """
+    parser = argparse.ArgumentParser(description="Load test the game server")
+    parser.add_argument("--clients", type=int, default=100, help="concurrent clients")
+    parser.add_argument("--games", type=int, default=10, help="games per client")
+    parser.add_argument("--size", type=int, default=3, help="board size")
+    parser.add_argument("--algorithm", type=int, default=AiPlayer.RANDOM_DEFENSIVE_ALGORITHM, help="AI algorithm")
+    parser.add_argument("--playouts", type=int, default=None, help="playouts per move, for mcts")
+    parser.add_argument("--host", default=None, help="server host (default: start a server in this process)")
+    parser.add_argument("--port", type=int, default=8765, help="server port")
+    parser.add_argument("--unix", default=None, help="server Unix socket path")
+    parser.add_argument("--workers", type=int, default=None, help="executor workers, for a server started here")
+    parser.add_argument("--processes", action="store_true", help="process pool, for a server started here")
+    args = parser.parse_args()
+
+    ai_options = {"algorithm": args.algorithm}
+    if args.playouts is not None:
+        ai_options["playouts"] = args.playouts
+
+    latencies, elapsed = asyncio.run(load_test(args.clients, args.games, args.size, ai_options, args.host,
+                                               args.port, args.unix, args.workers, args.processes))
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1e3
+    print("{} clients x {} games, {} moves in {:.2f}s ({:.0f} moves/sec)".format(
+        args.clients, args.games, len(latencies), elapsed, len(latencies) / elapsed))
+    print("move latency p50: {:.2f}ms, p99: {:.2f}ms, max: {:.2f}ms".format(p50, p99, max(latencies) * 1e3))
+
+
+# If this script is execute directly, call the main function
+if __name__ == "__main__":
+    main()
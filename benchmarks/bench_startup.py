@@ -0,0 +1,112 @@
+
+# Library imports
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+
+# Entry points to time, and those that must start without importing numpy (or the process pool machinery)
+ENTRY_POINTS = ("main", "game", "simulate", "server", "gui")
+LEAN_ENTRY_POINTS = ("main", "game")
+HEAVY_MODULES = ("numpy", "concurrent.futures.process")
+
+# Default times to start each entry point (the fastest run counts), and imports to list in the breakdown
+REPEAT = 5
+TOP = 15
+
+# Repo root, which the entry points are imported from
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module):
+    """
+    Starts a fresh interpreter that imports a module under -X importtime, and reads back its report
+    :param module: Module name
+    :return: (wall seconds for the whole process, list of (self us, cumulative us, depth, name) tuples)
+    """
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", "import {}".format(module)], cwd=ROOT,
+                             stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    wall = time.perf_counter() - start
+
+    # Report lines look like "import time:  self | cumulative | <indent>name", after a header line
+    imports = []
+    for line in process.stderr.splitlines():
+        fields = line[len("import time:"):].split("|")
+        if not line.startswith("import time:") or len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        imports.append((int(fields[0]), int(fields[1]), (len(name) - len(name.lstrip())) // 2, name.strip()))
+    return wall, imports
+
+
+def measure(module, repeat=REPEAT):
+    """
+    Times an entry point's startup, keeping the fastest of several runs
+    :param module: Module name
+    :param repeat: Number of runs
+    :return: dict of "wall" (seconds to start the interpreter and import it), "import" (seconds spent in its
+             import) and "imports" (that run's importtime report)
+    """
+    best = None
+    for _ in range(repeat):
+        wall, imports = import_times(module)
+        if best is None or wall < best["wall"]:
+            total = next(cumulative for _, cumulative, _, name in imports if name == module)
+            best = {"wall": wall, "import": total / 1e6, "imports": imports}
+    return best
+
+
+def main():
+    """
+    Prints each entry point's startup time, and a breakdown of the slowest imports of one of them. Exits with
+    status 1 if a lean entry point imports a heavy module, or starts slower than the budget.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark interpreter startup and import times")
+    parser.add_argument("--modules", nargs="+", default=list(ENTRY_POINTS), help="entry points to time")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="runs per entry point, the fastest counts")
+    parser.add_argument("--breakdown", default="main", help="entry point to list the slowest imports of")
+    parser.add_argument("--top", type=int, default=TOP, help="imports to list in the breakdown")
+    parser.add_argument("--budget", type=float, default=None, help="most milliseconds a lean entry point's "
+                                                                   "imports may take")
+    args = parser.parse_args()
+
+    # The bare interpreter's start up, to compare against
+    baseline = measure("site", args.repeat)["wall"]
+    print("interpreter startup: {:.1f}ms".format(baseline * 1e3))
+
+    failures = []
+    results = {}
+    print("{:>10} {:>10} {:>11} {}".format("module", "wall (ms)", "import (ms)", "heavy imports"))
+    for module in args.modules:
+        results[module] = result = measure(module, args.repeat)
+        heavy = [name for name in HEAVY_MODULES if any(name == imported for _, _, _, imported in result["imports"])]
+        print("{:>10} {:>10.1f} {:>11.1f} {}".format(module, result["wall"] * 1e3, result["import"] * 1e3,
+                                                     ", ".join(heavy) or "-"))
+
+        # Lean entry points must stay clear of heavy modules, and within the budget
+        if module in LEAN_ENTRY_POINTS:
+            if heavy:
+                failures.append("{} imports {}".format(module, ", ".join(heavy)))
+            if args.budget is not None and result["import"] * 1e3 > args.budget:
+                failures.append("{} imports took {:.1f}ms - budget:{}ms".format(
+                    module, result["import"] * 1e3, args.budget))
+
+    # List the imports that took longest, including everything they imported in turn
+    if args.breakdown is not None:
+        imports = (results.get(args.breakdown) or measure(args.breakdown, args.repeat))["imports"]
+        print("\nslowest imports of {} (cumulative, self):".format(args.breakdown))
+        for self_time, cumulative, depth, name in sorted(imports, key=lambda item: -item[1])[:args.top]:
+            print("{:>9.1f}ms {:>8.1f}ms  {}{}".format(cumulative / 1e3, self_time / 1e3, "  " * depth, name))
+
+    for failure in failures:
+        sys.stderr.write("FAIL {}\n".format(failure))
+    if failures:
+        sys.exit(1)
+
+
+# If this script is execute directly, call the main function
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+
+# Library imports
+import timeit
+
+# Project imports
+from board import Board
+from negamax import NegamaxSearch
+
+
+# Board sizes to solve from the empty position
+SIZES = (3, 4)
+
+
+def solve(size, symmetry):
+    """
+    Solves the empty board with a fresh search, with or without symmetry reduced table keys
+    :param size: Board size
+    :param symmetry: Key the transposition table on canonical positions?
+    :return: (seconds, stats dict) tuple
+    """
+    search = NegamaxSearch(size, table_size=1 << 20, symmetry=symmetry)
+    seconds = timeit.timeit(lambda: search.search(0, 0, 0), number=1)
+    return seconds, search.stats()
+
+
+def main():
+    """
+    Prints transposition table size and hit rate for a full solve, before and after symmetry reduction,
+    and the cost of computing a canonical key on the Board
+    """
+    print("{:>4} {:>9} {:>10} {:>10} {:>10} {:>9} {:>9}".format("size", "symmetry", "time (s)", "nodes",
+                                                             "entries", "hit rate", "key (us)"))
+
+    for size in SIZES:
+        board = Board(size)
+        key_time = timeit.timeit(board.canonical_key, number=1000) / 1000 * 1e6
+
+        for symmetry in (False, True):
+            seconds, stats = solve(size, symmetry)
+            print("{:>4} {:>9} {:>10.3f} {:>10} {:>10} {:>8.1%} {:>9.1f}".format(
+                size, str(symmetry), seconds, stats["nodes"], stats["tt_entries"],
+                float(stats["tt_hits"]) / stats["tt_probes"], key_time))
+
+
+# If this script is execute directly, call the main function
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+
+# Library imports
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+# Project imports
+from board import Board
+from game import Game
+from player import AiPlayer
+
+
+# Board sizes to benchmark, the longest winning line used on the bigger ones, and the biggest board full games
+# are played on (unless asked for, a game on 50x50 takes seconds)
+SIZES = (3, 4, 8, 15, 50)
+MAX_WIN_LENGTH = 5
+MAX_GAME_SIZE = 15
+
+# Default seconds to spend timing each case, split over this many rounds (whose spread is the noise estimate)
+BUDGET = 0.5
+ROUNDS = 3
+
+# Slow down (as a fraction) that counts as a regression, on top of the noise seen in either run, and the least
+# seconds per call a regression must add (so sub-microsecond cases don't fail on timer jitter)
+THRESHOLD = 0.25
+MIN_DIFFERENCE = 1e-6
+
+
+def half_filled_board(size, seed=0):
+    """
+    Builds a board with half its tiles taken at random, without either side having won
+    :param size: Board size
+    :param seed: Random seed
+    :return: Board
+    """
+    rng = random.Random(seed)
+    board = Board(size, min(size, MAX_WIN_LENGTH))
+    value = Board.NOUGHT
+    while len(board.moves) < size * size // 2:
+
+        # Take a random tile, and give it back again if it wins
+        row, col = board.random_empty_tile(rng)
+        board.push(row, col, value)
+        if board.is_won():
+            board.pop()
+        else:
+            value = Board.CROSS if value == Board.NOUGHT else Board.NOUGHT
+    return board
+
+
+def play_game(size, seed):
+    """
+    Plays a headless random vs random defensive game
+    :param size: Board size
+    :param seed: Random seed
+    """
+    game = Game(size, min(size, MAX_WIN_LENGTH), {"algorithm": AiPlayer.RANDOM_ALGORITHM},
+                {"algorithm": AiPlayer.RANDOM_DEFENSIVE_ALGORITHM}, headless=True, seed=seed)
+    while not game.is_finished():
+        game.next_turn()
+
+
+def cases(size, big_games=False):
+    """
+    Lists the benchmark cases for a board size
+    :param size: Board size
+    :param big_games: Play full games on boards bigger than MAX_GAME_SIZE too
+    :return: list of (name, kind, function) tuples. Micro cases time one call, macro cases one full game.
+    """
+    board = half_filled_board(size)
+    matrix = board.matrix_copy()
+    player = AiPlayer(board, is_nought=True)
+    seeds = iter(range(sys.maxsize))
+
+    micro = [("is_won", "micro", lambda: board.is_won()),
+             ("is_won_matrix", "micro", lambda: board.is_won(matrix)),
+             ("check_rows", "micro", lambda: board._check_rows(matrix)),
+             ("list_empty_tiles", "micro", lambda: board.list_empty_tiles()),
+             ("list_empty_tiles_matrix", "micro", lambda: board.list_empty_tiles(matrix)),
+             ("find_enemy_winning_move", "micro", lambda: player._find_enemy_winning_move())]
+    if size > MAX_GAME_SIZE and not big_games:
+        return micro
+    return micro + [("game", "macro", lambda: play_game(size, next(seeds)))]
+
+
+def measure(function, budget, fastest=True):
+    """
+    Times a function, calling it in growing batches until the budget is spent
+    :param function: Function to time, called with no arguments
+    :param budget: Seconds to spend
+    :param fastest: Report the fastest batch, rather than the mean over every call. Calls that do different
+                    work each time (e.g. games with a new seed each) need the mean, or a batch of short games
+                    wins.
+    :return: float, seconds per call
+    """
+    best = None
+    number = 1
+    spent = 0.0
+    calls = 0
+    while spent < budget:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        spent += elapsed
+        calls += number
+
+        # Keep the fastest batch (the one least disturbed by anything else running), and grow the batch
+        # until each one takes a measurable time
+        best = elapsed / number if best is None else min(best, elapsed / number)
+        if elapsed < budget / 10:
+            number *= 2
+    return best if fastest else spent / calls
+
+
+def run(sizes=SIZES, budget=BUDGET, match=None, out=sys.stderr, rounds=ROUNDS, big_games=False):
+    """
+    Runs the benchmarks. Each case is timed over several rounds, and the spread between them is kept as an
+    estimate of how noisy the case is on this machine.
+    :param sizes: Board sizes
+    :param budget: Seconds to spend timing each case
+    :param match: Only run cases whose name contains this string (None runs all of them)
+    :param out: File to print progress to (None for silence)
+    :param rounds: Rounds to split each case's budget over
+    :param big_games: Play full games on boards bigger than MAX_GAME_SIZE too
+    :return: dict of case name ("<name>/<size>") to result dict of kind, size, seconds per call (the best
+             round) and noise (the slowest round, as a fraction slower than the best)
+    """
+    results = {}
+    for size in sizes:
+        for name, kind, function in cases(size, big_games):
+            key = "{}/{}".format(name, size)
+            if match is not None and match not in key:
+                continue
+            times = [measure(function, budget / rounds, fastest=kind == "micro") for _ in range(rounds)]
+            results[key] = {"kind": kind, "size": size, "seconds": min(times), "noise": max(times) / min(times) - 1}
+            if out is not None:
+                out.write("{:<32} {}  (noise {:.0%})\n".format(key, describe(results[key]), results[key]["noise"]))
+    return results
+
+
+def describe(result):
+    """
+    Formats a result for people: microseconds per call for micro cases, games/sec for macro ones
+    :param result: Result dict
+    :return: string
+    """
+    if result["kind"] == "macro":
+        return "{:>12.1f} games/sec".format(1 / result["seconds"])
+    return "{:>12.2f} us".format(result["seconds"] * 1e6)
+
+
+def compare(results, baseline, threshold=THRESHOLD, min_difference=MIN_DIFFERENCE):
+    """
+    Compares results against a baseline. A case only regresses if it is slower by more than the threshold
+    plus the noise seen in both runs, and by more than min_difference seconds per call.
+    :param results: Results, from run()
+    :param baseline: Earlier results, e.g. loaded from a previous run's JSON
+    :param threshold: Fraction slower than the baseline that counts as a regression, beyond the noise
+    :param min_difference: Least seconds per call a regression must add
+    :return: list of (case name, baseline result, result, ratio) tuples for the regressed cases
+    """
+    regressions = []
+    for key, result in sorted(results.items()):
+        if key not in baseline:
+            continue
+        before = baseline[key]
+        ratio = result["seconds"] / before["seconds"]
+        allowed = threshold + before.get("noise", 0.0) + result.get("noise", 0.0)
+        if ratio > 1 + allowed and result["seconds"] - before["seconds"] > min_difference:
+            regressions.append((key, before, result, ratio))
+    return regressions
+
+
+def main():
+    """
+    Runs the benchmarks from the command line (as "python -m benchmarks.run" from the repo root). Timings
+    only compare on the same machine, so record a baseline there first (--output baseline.json), and compare
+    later runs against it (--baseline baseline.json). Exits with status 1 if any case regressed.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark Board, AiPlayer and full games")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="board sizes")
+    parser.add_argument("--budget", type=float, default=BUDGET, help="seconds to spend timing each case")
+    parser.add_argument("--match", default=None, help="only run cases whose name contains this")
+    parser.add_argument("--rounds", type=int, default=ROUNDS, help="rounds per case, to estimate its noise")
+    parser.add_argument("--big-games", action="store_true", help="play full games on boards bigger than {}".format(
+        MAX_GAME_SIZE))
+    parser.add_argument("--output", default=None, help="write results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="compare against results from an earlier --output")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="slow down beyond the noise that "
+                                                                           "counts as a regression")
+    parser.add_argument("--min-difference", type=float, default=MIN_DIFFERENCE, help="least seconds per call a "
+                                                                                     "regression must add")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.budget, args.match, rounds=args.rounds, big_games=args.big_games)
+
+    # Save the results, with enough about the machine to tell baselines apart
+    if args.output is not None:
+        with open(args.output, "w") as output_file:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "results": results},
+                      output_file, indent=2, sort_keys=True)
+
+    # Fail if anything got slower than the baseline allows
+    if args.baseline is not None:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        regressions = compare(results, baseline, args.threshold, args.min_difference)
+        for key, before, after, ratio in regressions:
+            sys.stderr.write("REGRESSION {:<32} {} -> {} ({:.0%} slower)\n".format(
+                key, describe(before).strip(), describe(after).strip(), ratio - 1))
+        if regressions:
+            sys.exit(1)
+        sys.stderr.write("No regressions against {} (threshold {:.0%})\n".format(args.baseline, args.threshold))
+
+
+# If this script is execute directly, call the main function
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+
+# Library imports
+import random
+
+# Project imports
+from board import Board, IndexOutOfBoundsException, NotEmptyException, DIRECTIONS, canonical_key, symmetry_tables
+
+
+# Caches of precomputed win masks, and of the win masks through each tile, keyed by (board size, win length)
+_WIN_MASKS = {}
+_CELL_WIN_MASKS = {}
+
+# Biggest board new_board backs with a BitBoard. Both backends cache the winner and free tiles, and BitBoard plays
+# whole games faster at every size benchmarked. Checking a separate matrix (is_won(matrix)) still walks every win
+# mask though, which numpy overtakes on big boards, so those stay with Board (see benchmarks/bench_bitboard.py).
+SMALL_BOARD_SIZE = 6
+
+
+def win_masks(size, win_length=None):
+    """
+    Returns the tuple of bitmasks covering every winning line (win_length tiles in a row, column or
+    diagonal) for a board of the given size. Bit (row * size + col) represents the tile at row, col.
+    Masks are computed once per size and win length, and cached.
+    :param size: Board size (size == width == height)
+    :param win_length: Number of tiles in a row needed to win (defaults to size)
+    :return: tuple of int
+    """
+    win_length = size if win_length is None else win_length
+
+    # Return the cached masks if we've already built them for this size
+    if (size, win_length) in _WIN_MASKS:
+        return _WIN_MASKS[size, win_length]
+
+    masks = []
+
+    # Add a mask for every line of win_length tiles that fits on the board, starting from each tile
+    for row in range(size):
+        for col in range(size):
+            for row_step, col_step in DIRECTIONS:
+                end_row = row + row_step * (win_length - 1)
+                end_col = col + col_step * (win_length - 1)
+                if 0 <= end_row < size and 0 <= end_col < size:
+                    masks.append(sum(1 << ((row + row_step * i) * size + col + col_step * i)
+                                     for i in range(win_length)))
+
+    # Store in the cache and return
+    _WIN_MASKS[size, win_length] = tuple(masks)
+    return _WIN_MASKS[size, win_length]
+
+
+def cell_win_masks(size, win_length=None):
+    """
+    Returns the win masks through each tile, so a move only needs checking against the lines it is on.
+    Computed once per size and win length, and cached.
+    :param size: Board size (size == width == height)
+    :param win_length: Number of tiles in a row needed to win (defaults to size)
+    :return: tuple, indexed by tile index (row * size + col), of tuples of int
+    """
+    win_length = size if win_length is None else win_length
+
+    # Return the cached masks if we've already built them for this size
+    if (size, win_length) in _CELL_WIN_MASKS:
+        return _CELL_WIN_MASKS[size, win_length]
+
+    masks = win_masks(size, win_length)
+    _CELL_WIN_MASKS[size, win_length] = tuple(tuple(mask for mask in masks if mask >> cell & 1)
+                                              for cell in range(size * size))
+    return _CELL_WIN_MASKS[size, win_length]
+
+
+def new_board(size=3, win_length=None):
+    """
+    Creates the board for a game: a BitBoard for small boards, so numpy is never imported, or a Board for
+    bigger ones
+    :param size: Board size (size == width == height)
+    :param win_length: Number of tiles in a row needed to win (defaults to a full row, column or diagonal)
+    :return: BitBoard or Board
+    """
+    if size <= SMALL_BOARD_SIZE:
+        return BitBoard(size, win_length)
+    return Board(size, win_length)
+
+
+class BitMatrix(object):
+
+    __slots__ = ("noughts", "crosses", "size")
+
+    def __init__(self, size, noughts=0, crosses=0):
+        """
+        Board state stored as one integer bitmask per side. This is what BitBoard uses wherever Board
+        uses an np.matrix, and it can be indexed the same way (matrix[row, col]).
+        :param size: Board size
+        :param noughts: Bitmask of tiles taken by noughts
+        :param crosses: Bitmask of tiles taken by crosses
+        """
+        self.size = size
+        self.noughts = noughts
+        self.crosses = crosses
+
+    def __getitem__(self, index):
+        """
+        Returns the value of the tile at matrix[row, col]
+        :param index: (row, col) tuple
+        :return: Board.EMPTY, Board.NOUGHT or Board.CROSS
+        """
+        row, col = index
+        bit = 1 << (row * self.size + col)
+
+        if self.noughts & bit:
+            return Board.NOUGHT
+        elif self.crosses & bit:
+            return Board.CROSS
+        else:
+            return Board.EMPTY
+
+    def copy(self):
+        """
+        Returns an unlinked copy of this matrix
+        :return: BitMatrix
+        """
+        return BitMatrix(self.size, self.noughts, self.crosses)
+
+    def tolist(self):
+        """
+        Returns the tiles as a list of rows, like np.matrix.tolist
+        :return: list of lists of Board.EMPTY, Board.NOUGHT or Board.CROSS
+        """
+        return [[self[row, col] for col in range(self.size)] for row in range(self.size)]
+
+
+class BitBoard(object):
+
+    # Numerical definitions for nought, cross and empty (shared with Board)
+    EMPTY = Board.EMPTY
+    NOUGHT = Board.NOUGHT
+    CROSS = Board.CROSS
+
+    def __init__(self, size=3, win_length=None):
+        """
+        Drop-in alternative to Board, storing the board state as one integer bitmask per side instead of
+        an np.matrix. Full and empty checks are a handful of integer AND/compare operations, and the winner is
+        cached by set_tile, checking only the win masks through the tile just set.
+        :param size: Board size (size == width == height)
+        :param win_length: Number of tiles in a row needed to win (defaults to a full row, column or diagonal)
+        """
+        # Store board size in class (size == width == height), and the number in a row needed to win
+        self._size = size
+        self._win_length = size if win_length is None else win_length
+
+        # Raise exception if the win length can't fit on the board
+        if not 0 < self._win_length <= self._size:
+            raise ValueError("win_length:{} - min:1, max:{}".format(self._win_length, self._size))
+
+        # Precompute the mask of all tiles, and fetch the win masks for this size (all of them, and those
+        # through each tile)
+        self._full_mask = (1 << (size * size)) - 1
+        self._win_masks = win_masks(size, self._win_length)
+        self._cell_win_masks = cell_win_masks(size, self._win_length)
+
+        # Initialise the board matrix, with no tiles taken
+        self._matrix = BitMatrix(size)
+
+        # Cached outcome of the internal board, so is_won is a constant time lookup
+        self._winner = None
+
+        # Free tile indices (row * size + col) in no particular order, and where each one is in that list (or
+        # -1 once taken), so taking or freeing a tile is a swap with the end of the list
+        self._free_cells = list(range(size * size))
+        self._free_positions = list(range(size * size))
+
+        # Stack of moves made on the internal board, (row, col, value, winner before the move), for pop
+        self._moves = []
+
+    @property
+    def size(self):
+        """
+        Read only size property, returns size of one side of the board (its square)
+        :return: int
+        """
+        return self._size
+
+    @property
+    def win_length(self):
+        """
+        Read only win length property, returns the number of tiles in a row needed to win
+        :return: int
+        """
+        return self._win_length
+
+    def is_full(self, matrix=None):
+        """
+        Checks if all board tiles have been taken, and returns true/false
+        :param matrix: Optionally apply this to a BitMatrix other than the internal one
+        :return: bool
+        """
+        # If matrix is left as None, use the internal board matrix
+        matrix = self._matrix if matrix is None else matrix
+
+        # Board is full if the union of both sides covers every tile
+        return (matrix.noughts | matrix.crosses) == self._full_mask
+
+    def is_won(self, matrix=None):
+        """
+        Checks for win_length noughts or crosses in a row, column or diagonal.
+        :param matrix: Optionally apply this to a BitMatrix other than the internal one
+        :return: Board.NOUGHT, Board.CROSS or None
+        """
+        # If matrix is left as None, return the outcome cached by set_tile
+        if matrix is None:
+            return self._winner
+        noughts, crosses = matrix.noughts, matrix.crosses
+
+        # A side has won if it covers every tile of any win mask
+        for mask in self._win_masks:
+            if noughts & mask == mask:
+                return self.NOUGHT
+            elif crosses & mask == mask:
+                return self.CROSS
+
+        # No line is complete, return None
+        return None
+
+    def is_empty(self, row, col, matrix=None):
+        """
+        Checks if the tile with row, col specifed is empty or not
+        :param row: Row index
+        :param col: Column index
+        :param matrix: Optionally apply this to a BitMatrix other than the internal one
+        :return: bool
+        """
+        # If matrix is left as None, use the internal board matrix
+        matrix = self._matrix if matrix is None else matrix
+
+        # Return true if neither side has the tile's bit set
+        return not (matrix.noughts | matrix.crosses) & (1 << (row * self._size + col))
+
+    def set_tile(self, row, col, value, matrix=None):
+        """
+        Sets the tile with the given value
+        :param row: Row index
+        :param col: Column index
+        :param value: Value to set (should be Board.NOUGHT or Board.CROSS)
+        :param matrix: Optionally apply this to a BitMatrix other than the internal one
+        :raises IndexOutOfBoundsException if row/col are out of bounds
+        :raises NotEmptyException if tile already taken
+        """
+        # If matrix is left as None, use the internal board matrix
+        matrix = self._matrix if matrix is None else matrix
+
+        # Raise exception if row/col are out of bounds
+        if not self._in_bounds(row, col):
+            raise IndexOutOfBoundsException("row:{}, col:{} - min:0, max:{}".format(row, col, self._size))
+
+        # Raise exception if tile isn't empty
+        if not self.is_empty(row, col, matrix):
+            raise NotEmptyException("row:{}, col:{}".format(row, col))
+
+        # Set the tile's bit on the appropriate side
+        cell = row * self._size + col
+        if value == self.NOUGHT:
+            matrix.noughts |= 1 << cell
+        else:
+            matrix.crosses |= 1 << cell
+
+        # If this was the internal board matrix, record the move, and update the free tiles and cached outcome
+        # (only the lines through the tile just set can have been completed)
+        if matrix is self._matrix:
+            self._moves.append((row, col, value, self._winner))
+            self._take_free_cell(cell)
+            if self._winner is None:
+                side = matrix.noughts if value == self.NOUGHT else matrix.crosses
+                for mask in self._cell_win_masks[cell]:
+                    if side & mask == mask:
+                        self._winner = value
+                        break
+
+    def push(self, row, col, value):
+        """
+        Makes a move on the internal board in place, so it can be undone by pop
+        :param row: Row index
+        :param col: Column index
+        :param value: Value to set (should be Board.NOUGHT or Board.CROSS)
+        :raises IndexOutOfBoundsException if row/col are out of bounds
+        :raises NotEmptyException if tile already taken
+        """
+        self.set_tile(row, col, value)
+
+    def pop(self):
+        """
+        Undoes the last move made on the internal board (by push or set_tile)
+        :return: (row, col, value) tuple of the move undone
+        :raises IndexError if there are no moves to undo
+        """
+        row, col, value, self._winner = self._moves.pop()
+
+        # Clear the tile's bit (it can only be set on the side that took it), and free the tile again
+        cell = row * self._size + col
+        self._matrix.noughts &= ~(1 << cell)
+        self._matrix.crosses &= ~(1 << cell)
+        self._free_cells.append(cell)
+        self._free_positions[cell] = len(self._free_cells) - 1
+
+        return row, col, value
+
+    @property
+    def moves(self):
+        """
+        Read only list of the moves made on the internal board so far, oldest first
+        :return: list of (row, col, value) tuples
+        """
+        return [move[:3] for move in self._moves]
+
+    def matrix_copy(self):
+        """
+        Returns a copy (unlinked) of the board matrix in its current state. Changes to this matrix do not
+        affect the board instance state.
+        :return: BitMatrix of board state, indexing gives Board.EMPTY, Board.NOUGHT or Board.CROSS
+        """
+        return self._matrix.copy()
+
+    def list_empty_tiles(self, matrix=None):
+        """
+        Produces a list of (row, col) tuples of all the empty tiles on the board
+        :param matrix: Optionally apply this to a BitMatrix other than the internal one
+        :return: list of tuples
+        """
+        # If matrix is left as None, use the internal board matrix
+        matrix = self._matrix if matrix is None else matrix
+
+        # Walk the set bits of the free tile mask, lowest first
+        free = self._full_mask & ~(matrix.noughts | matrix.crosses)
+        tiles = []
+        while free:
+            low_bit = free & -free
+            tiles.append(divmod(low_bit.bit_length() - 1, self._size))
+            free ^= low_bit
+
+        return tiles
+
+    def random_empty_tile(self, rng=random):
+        """
+        Picks an empty tile of the internal board uniformly at random, in constant time
+        :param rng: Random number generator to use (anything with randrange, e.g. a random.Random)
+        :return: (row, col) tuple, or None if the board is full
+        """
+        if not self._free_cells:
+            return None
+        return divmod(self._free_cells[rng.randrange(len(self._free_cells))], self._size)
+
+    def canonical_key(self, matrix=None):
+        """
+        Returns a key that is the same for the board and all its rotations and reflections, for caching
+        evaluated positions once rather than up to 8 times
+        :param matrix: Optionally apply this to a BitMatrix other than the internal one
+        :return: (key, transform) tuple. Pass transform to from_canonical to map a move found on the
+                 canonical position back onto this board.
+        """
+        # If matrix is left as None, use the internal board matrix
+        matrix = self._matrix if matrix is None else matrix
+
+        # Read each tile's value out of the two side masks
+        tiles = [(matrix.noughts >> cell & 1) * self.NOUGHT + (matrix.crosses >> cell & 1) * self.CROSS
+                 for cell in range(self._size * self._size)]
+        return canonical_key(tiles, self._size)
+
+    def from_canonical(self, row, col, transform):
+        """
+        Maps a tile on the canonical position back to the tile it is on this board
+        :param row: Row index on the canonical position
+        :param col: Column index on the canonical position
+        :param transform: Transform returned by canonical_key
+        :return: (row, col) tuple
+        """
+        return divmod(symmetry_tables(self._size)[0][transform][row * self._size + col], self._size)
+
+    def to_canonical(self, row, col, transform):
+        """
+        Maps a tile on this board to the tile it is on the canonical position
+        :param row: Row index on this board
+        :param col: Column index on this board
+        :param transform: Transform returned by canonical_key
+        :return: (row, col) tuple
+        """
+        return divmod(symmetry_tables(self._size)[1][transform][row * self._size + col], self._size)
+
+    def _take_free_cell(self, cell):
+        """
+        Removes a tile index from the free tiles, by moving the last free tile into its place
+        :param cell: Tile index (row * size + col)
+        """
+        position = self._free_positions[cell]
+        last = self._free_cells.pop()
+        if last != cell:
+            self._free_cells[position] = last
+            self._free_positions[last] = position
+        self._free_positions[cell] = -1
+
+    def _in_bounds(self, row, col):
+        """
+        Checks if the row/col passed are in bounds
+        :param row: row to check
+        :param col: column to check
+        :return: bool
+        """
+        return (0 <= row < self._size) and (0 <= col < self._size)
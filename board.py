@@ -1,12 +1,111 @@
 
+# Library imports
+import random
+
 # Project imports
-import numpy as np
+from lazy_import import lazy_import
+
+# numpy is only imported once a Board (or a batched check) needs it, small boards can use the pure Python
+# BitBoard and never pay for it
+np = lazy_import("numpy")
 
 # Custom exception classes
 class IndexOutOfBoundsException(Exception): pass
 class NotEmptyException(Exception): pass
 
 
+# Directions (row step, col step) a line of tiles can run in: across, down, diagonal and other diagonal
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+# Cache of precomputed symmetry permutation tables, keyed by board size
+_SYMMETRY_TABLES = {}
+
+
+def symmetry_tables(size):
+    """
+    Returns the 8 dihedral symmetries (4 rotations, each optionally mirrored) of a square board as
+    permutation tables of tile indices (row * size + col). Transformed tile i holds original tile
+    tables[t][i], so a move at tile i of the transformed board is a move at tables[t][i] of the original.
+    Table 0 is the identity. Tables are computed once per size and cached, along with their inverses.
+    :param size: Board size
+    :return: (tables, inverses) tuple, each a tuple of 8 tuples of int
+    """
+    # Return the cached tables if we've already built them for this size
+    if size in _SYMMETRY_TABLES:
+        return _SYMMETRY_TABLES[size]
+
+    last = size - 1
+    sources = (lambda r, c: (r, c), lambda r, c: (c, last - r), lambda r, c: (last - r, last - c),
+               lambda r, c: (last - c, r), lambda r, c: (r, last - c), lambda r, c: (c, r),
+               lambda r, c: (last - r, c), lambda r, c: (last - c, last - r))
+
+    tables = []
+    inverses = []
+    for source in sources:
+
+        # For each transformed tile, find which original tile it holds
+        table = [0] * (size * size)
+        for row in range(size):
+            for col in range(size):
+                source_row, source_col = source(row, col)
+                table[row * size + col] = source_row * size + source_col
+
+        # Invert the table, to map original tiles to transformed tiles
+        inverse = [0] * (size * size)
+        for cell, source_cell in enumerate(table):
+            inverse[source_cell] = cell
+
+        tables.append(tuple(table))
+        inverses.append(tuple(inverse))
+
+    # Store in the cache and return
+    _SYMMETRY_TABLES[size] = (tuple(tables), tuple(inverses))
+    return _SYMMETRY_TABLES[size]
+
+
+def canonical_key(tiles, size):
+    """
+    Finds the canonical key of a position, the smallest base 3 number that any of its 8 symmetries reads as.
+    Symmetric positions share the same key.
+    :param tiles: Flat sequence of tile values, indexed by row * size + col
+    :param size: Board size
+    :return: (key, transform) tuple. Transform is the symmetry table index the key was read through.
+    """
+    best_key, best_transform = None, 0
+    for transform, table in enumerate(symmetry_tables(size)[0]):
+
+        # Read the tiles in the transformed order as a base 3 number
+        key = 0
+        for cell in table:
+            key = key * 3 + tiles[cell]
+
+        if best_key is None or key < best_key:
+            best_key, best_transform = key, transform
+
+    return best_key, best_transform
+
+
+def _windows_won(taken, win_length):
+    """
+    Vectorised check for win_length tiles in a row, in any direction. Works on the last two axes, so any
+    leading axes (e.g. a stack of boards) are checked in the same pass.
+    :param taken: Boolean array [..., size, size], true where a tile is taken by the player being checked
+    :param win_length: Number of tiles in a row needed to win
+    :return: Boolean array of the leading axes (or a bool for a single board)
+    """
+    # Check every horizontal and vertical window of win_length tiles
+    won = np.lib.stride_tricks.sliding_window_view(taken, win_length, axis=-1).all(axis=-1).any(axis=(-2, -1))
+    won |= np.lib.stride_tricks.sliding_window_view(taken, win_length, axis=-2).all(axis=-1).any(axis=(-2, -1))
+
+    # Take every win_length square window, and check its main diagonal and other diagonal
+    squares = np.lib.stride_tricks.sliding_window_view(taken, (win_length, win_length), axis=(-2, -1))
+    won |= squares.diagonal(axis1=-2, axis2=-1).all(axis=-1).any(axis=(-2, -1))
+    won |= squares[..., ::-1].diagonal(axis1=-2, axis2=-1).all(axis=-1).any(axis=(-2, -1))
+
+    return won
+
+
 class Board(object):
 
     # Numerical definitions for nought, cross and empty.
@@ -14,17 +113,40 @@ class Board(object):
     NOUGHT = 1
     CROSS = 2
 
-    def __init__(self, size=3):
+    def __init__(self, size=3, win_length=None):
         """
         Class to store the current state of the noughts & crosses board, with a user defined square size
         :param size:
+        :param win_length: Number of tiles in a row needed to win (defaults to a full row, column or diagonal)
         """
-        # Store board size in class (size == width == height)
+        # Store board size in class (size == width == height), and the number in a row needed to win
         self._size = size
+        self._win_length = size if win_length is None else win_length
+
+        # Raise exception if the win length can't fit on the board
+        if not 0 < self._win_length <= self._size:
+            raise ValueError("win_length:{} - min:1, max:{}".format(self._win_length, self._size))
 
         # Initialise the board matrix to the size specified, filled as empty
         self._matrix = np.matrix(np.full((self._size, self._size), self.EMPTY))
 
+        # Per player occupancy counters for every row, column and both diagonals, kept up to date by set_tile
+        self._row_counts = {self.NOUGHT: [0] * self._size, self.CROSS: [0] * self._size}
+        self._col_counts = {self.NOUGHT: [0] * self._size, self.CROSS: [0] * self._size}
+        self._diagonal_counts = {self.NOUGHT: [0, 0], self.CROSS: [0, 0]}
+
+        # Cached outcome of the internal board, so is_won/is_full are constant time lookups
+        self._tiles_taken = 0
+        self._winner = None
+
+        # Free tile indices (row * size + col) in no particular order, and where each one is in that list (or
+        # -1 once taken), so taking or freeing a tile is a swap with the end of the list
+        self._free_cells = list(range(self._size * self._size))
+        self._free_positions = list(range(self._size * self._size))
+
+        # Stack of moves made on the internal board, (row, col, value, winner before the move), for pop
+        self._moves = []
+
     @property
     def size(self):
         """
@@ -33,26 +155,40 @@ class Board(object):
         """
         return self._size
 
+    @property
+    def win_length(self):
+        """
+        Read only win length property, returns the number of tiles in a row needed to win
+        :return: int
+        """
+        return self._win_length
+
     def is_full(self, matrix=None):
         """
         Checks if all board tiles have been taken, and returns true/false
         :param matrix: Optionally apply this to matrix other than the internal one
         :return: bool
         """
-        # If matrix is left as None, use the internal board matrix
-        matrix = self._matrix if matrix is None else matrix
+        # If matrix is left as None, the internal board is full once every tile has been counted in
+        if matrix is None:
+            return self._tiles_taken == self._size * self._size
 
         # Return true if Board.EMPTY does not appear anywhere in the board (its full)
         return self.EMPTY not in matrix
 
     def is_won(self, matrix=None):
         """
-        Checks for full column, row or diagonal of noughts or crosses.
+        Checks for win_length noughts or crosses in a row, column or diagonal.
         :param matrix: Optionally apply this to matrix other than the internal one
         :return: Board.NOUGHT, Board.CROSS or None
         """
-        # If matrix is left as None, use the internal board matrix
-        matrix = self._matrix if matrix is None else matrix
+        # If matrix is left as None, return the outcome cached by set_tile
+        if matrix is None:
+            return self._winner
+
+        # If a shorter line than the full board wins, check every window in one vectorised pass
+        if self._win_length < self._size:
+            return self._check_windows(matrix)
 
         # Check rows, and return it if we found a winner
         winner = self._check_rows(matrix)
@@ -110,6 +246,49 @@ class Board(object):
         # Set tile to value
         matrix[row, col] = value
 
+        # If this was the internal board matrix, record the move, and update the free tiles, line counters
+        # and cached outcome
+        if matrix is self._matrix:
+            self._moves.append((row, col, value, self._winner))
+            self._take_free_cell(row * self._size + col)
+            self._count_tile(row, col, value)
+
+    def push(self, row, col, value):
+        """
+        Makes a move on the internal board in place, so it can be undone by pop
+        :param row: Row index
+        :param col: Column index
+        :param value: Value to set (should be Board.NOUGHT or Board.CROSS)
+        :raises IndexOutOfBoundsException if row/col are out of bounds
+        :raises NotEmptyException if tile already taken
+        """
+        self.set_tile(row, col, value)
+
+    def pop(self):
+        """
+        Undoes the last move made on the internal board (by push or set_tile)
+        :return: (row, col, value) tuple of the move undone
+        :raises IndexError if there are no moves to undo
+        """
+        row, col, value, winner = self._moves.pop()
+
+        # Clear the tile, and put the free tiles, line counters and cached outcome back how they were
+        self._matrix[row, col] = self.EMPTY
+        self._free_cells.append(row * self._size + col)
+        self._free_positions[row * self._size + col] = len(self._free_cells) - 1
+        self._uncount_tile(row, col, value)
+        self._winner = winner
+
+        return row, col, value
+
+    @property
+    def moves(self):
+        """
+        Read only list of the moves made on the internal board so far, oldest first
+        :return: list of (row, col, value) tuples
+        """
+        return [move[:3] for move in self._moves]
+
     def matrix_copy(self):
         """
         Returns a copy (unlinked) of the board matrix in its current state. Changes to this matrix do not
@@ -124,9 +303,220 @@ class Board(object):
         :param matrix: Optionally apply this to matrix other than the internal one
         :return: list of tuples
         """
-        rows, cols = np.where(self._matrix == self.EMPTY)
-        return [(rows[x], cols[x]) for x in range(len(rows))]
+        # If matrix is left as None, read the internal board's free tiles
+        if matrix is None:
+            return [divmod(cell, self._size) for cell in self._free_cells]
+
+        rows, cols = np.where(np.asarray(matrix) == self.EMPTY)
+        return list(zip(rows.tolist(), cols.tolist()))
+
+    def random_empty_tile(self, rng=random):
+        """
+        Picks an empty tile of the internal board uniformly at random, in constant time
+        :param rng: Random number generator to use (anything with randrange, e.g. a random.Random)
+        :return: (row, col) tuple, or None if the board is full
+        """
+        if not self._free_cells:
+            return None
+        return divmod(self._free_cells[rng.randrange(len(self._free_cells))], self._size)
+
+    def canonical_key(self, matrix=None):
+        """
+        Returns a key that is the same for the board and all its rotations and reflections, for caching
+        evaluated positions once rather than up to 8 times
+        :param matrix: Optionally apply this to matrix other than the internal one
+        :return: (key, transform) tuple. Pass transform to from_canonical to map a move found on the
+                 canonical position back onto this board.
+        """
+        # If matrix is left as None, use the internal board matrix
+        matrix = self._matrix if matrix is None else matrix
+
+        return canonical_key(np.asarray(matrix).ravel().tolist(), self._size)
+
+    def from_canonical(self, row, col, transform):
+        """
+        Maps a tile on the canonical position back to the tile it is on this board
+        :param row: Row index on the canonical position
+        :param col: Column index on the canonical position
+        :param transform: Transform returned by canonical_key
+        :return: (row, col) tuple
+        """
+        return divmod(symmetry_tables(self._size)[0][transform][row * self._size + col], self._size)
+
+    def to_canonical(self, row, col, transform):
+        """
+        Maps a tile on this board to the tile it is on the canonical position
+        :param row: Row index on this board
+        :param col: Column index on this board
+        :param transform: Transform returned by canonical_key
+        :return: (row, col) tuple
+        """
+        return divmod(symmetry_tables(self._size)[1][transform][row * self._size + col], self._size)
 
+    def _count_tile(self, row, col, value):
+        """
+        Updates the line occupancy counters for a newly set tile on the internal board, and caches the
+        winner if the tile completed a row, column or diagonal
+        :param row: Row index
+        :param col: Column index
+        :param value: Value that was set (Board.NOUGHT or Board.CROSS)
+        """
+        self._tiles_taken += 1
+
+        # If a shorter line than the full board wins, the counters don't apply, look around the tile instead
+        if self._win_length < self._size:
+            if self._winner is None and self._completes_line(row, col, value):
+                self._winner = value
+            return
+
+        # Count the tile in its row and column
+        row_counts = self._row_counts[value]
+        col_counts = self._col_counts[value]
+        row_counts[row] += 1
+        col_counts[col] += 1
+        completed = row_counts[row] == self._size or col_counts[col] == self._size
+
+        # Count the tile in the main diagonal and the other diagonal, if it lies on them
+        diagonal_counts = self._diagonal_counts[value]
+        if row == col:
+            diagonal_counts[0] += 1
+            completed = completed or diagonal_counts[0] == self._size
+        if row + col == self._size - 1:
+            diagonal_counts[1] += 1
+            completed = completed or diagonal_counts[1] == self._size
+
+        # Cache the first line to be completed as the winner
+        if completed and self._winner is None:
+            self._winner = value
+
+    def _uncount_tile(self, row, col, value):
+        """
+        Reverses _count_tile for a tile being cleared from the internal board (the caller restores the
+        cached winner)
+        :param row: Row index
+        :param col: Column index
+        :param value: Value that was cleared (Board.NOUGHT or Board.CROSS)
+        """
+        self._tiles_taken -= 1
+
+        # Counters are only kept when the full row, column or diagonal is needed to win
+        if self._win_length < self._size:
+            return
+
+        self._row_counts[value][row] -= 1
+        self._col_counts[value][col] -= 1
+        if row == col:
+            self._diagonal_counts[value][0] -= 1
+        if row + col == self._size - 1:
+            self._diagonal_counts[value][1] -= 1
+
+    def _take_free_cell(self, cell):
+        """
+        Removes a tile index from the free tiles, by moving the last free tile into its place
+        :param cell: Tile index (row * size + col)
+        """
+        position = self._free_positions[cell]
+        last = self._free_cells.pop()
+        if last != cell:
+            self._free_cells[position] = last
+            self._free_positions[last] = position
+        self._free_positions[cell] = -1
+
+    @classmethod
+    def batch_outcomes(cls, boards, win_length=None):
+        """
+        Checks a whole stack of boards for a winner, and for being full, in one vectorised pass with no
+        Python loop over the boards. Tile values are Board.EMPTY, Board.NOUGHT and Board.CROSS, so board
+        matrices can be stacked directly (e.g. np.stack([board.matrix_copy(), ...])).
+        :param boards: Array [N, size, size] of tile values (uint8 recommended)
+        :param win_length: Number of tiles in a row needed to win (defaults to a full row, column or diagonal)
+        :return: (winners, full) tuple. winners is a uint8 array [N] of Board.NOUGHT, Board.CROSS or
+                 Board.EMPTY where there is no winner. full is a bool array [N].
+        """
+        boards = np.asarray(boards)
+
+        # Raise exception if this isn't a stack of square boards
+        if boards.ndim != 3 or boards.shape[1] != boards.shape[2]:
+            raise ValueError("boards shape:{} - expected (N, size, size)".format(boards.shape))
+
+        # Default to needing a full row, column or diagonal
+        win_length = boards.shape[1] if win_length is None else win_length
+
+        # Check noughts and crosses together, by stacking their taken tiles on a new leading axis
+        taken = np.stack((boards == cls.NOUGHT, boards == cls.CROSS))
+        noughts_won, crosses_won = _windows_won(taken, win_length)
+
+        # Noughts take precedence if both have a line (can't happen in a real game), same as is_won
+        winners = np.full(boards.shape[0], cls.EMPTY, dtype=np.uint8)
+        winners[crosses_won] = cls.CROSS
+        winners[noughts_won] = cls.NOUGHT
+
+        # A board is full when it has no empty tiles
+        full = (boards != cls.EMPTY).all(axis=(1, 2))
+
+        return winners, full
+
+    @classmethod
+    def batch_is_won(cls, boards, win_length=None):
+        """
+        Batched version of is_won, for a stack of boards
+        :param boards: Array [N, size, size] of tile values
+        :param win_length: Number of tiles in a row needed to win (defaults to a full row, column or diagonal)
+        :return: uint8 array [N] of Board.NOUGHT, Board.CROSS or Board.EMPTY where there is no winner
+        """
+        return cls.batch_outcomes(boards, win_length)[0]
+
+    @classmethod
+    def batch_is_full(cls, boards):
+        """
+        Batched version of is_full, for a stack of boards
+        :param boards: Array [N, size, size] of tile values
+        :return: bool array [N]
+        """
+        return (np.asarray(boards) != cls.EMPTY).all(axis=(1, 2))
+
+    def _completes_line(self, row, col, value):
+        """
+        Checks whether the tile at row, col is part of win_length tiles of value in a row on the internal
+        board. Only looks at the win_length - 1 tiles either side of it, in each direction.
+        :param row: Row index
+        :param col: Column index
+        :param value: Value to look for (Board.NOUGHT or Board.CROSS)
+        :return: bool
+        """
+        matrix = self._matrix
+
+        for row_step, col_step in DIRECTIONS:
+
+            # Count the tile itself, then walk forwards and backwards along the line while the value matches
+            run = 1
+            for direction in (1, -1):
+                r, c = row + row_step * direction, col + col_step * direction
+                while run < self._win_length and self._in_bounds(r, c) and matrix[r, c] == value:
+                    run += 1
+                    r, c = r + row_step * direction, c + col_step * direction
+
+            # Return true as soon as any direction has a long enough run
+            if run >= self._win_length:
+                return True
+
+        return False
+
+    def _check_windows(self, matrix):
+        """
+        Checks every row, column and diagonal window of win_length tiles for noughts or crosses
+        :param matrix: Matrix to check
+        :return: Board.NOUGHT, Board.CROSS or None
+        """
+        matrix = np.asarray(matrix)
+
+        # Check noughts, then crosses
+        for value in (self.NOUGHT, self.CROSS):
+            if _windows_won(matrix == value, self._win_length):
+                return value
+
+        # No window is all noughts or crosses, return None
+        return None
 
     def _check_rows(self, matrix):
         """
@@ -189,5 +579,5 @@ class Board(object):
         :param col: column to check
         :return: bool
         """
-        return (0 <= row < self._size) or (0 <= col < self._size)
+        return (0 <= row < self._size) and (0 <= col < self._size)
 
@@ -4,28 +4,74 @@ import random
 
 # Project imports
 from board import Board
+from bitboard import new_board
+from game_record import HUMAN
 from player import HumanPlayer, AiPlayer
-from view import View
+from sparse_board import SparseBoard
+from view import View, NullView
+
+
+# AI algorithms that can play on a SparseBoard (the others need a bounded, dense board)
+SPARSE_ALGORITHMS = (AiPlayer.RANDOM_ALGORITHM, AiPlayer.RANDOM_DEFENSIVE_ALGORITHM)
 
 
 class Game(object):
 
-    def __init__(self, size=3):
+    def __init__(self, size=3, win_length=None, nought_player=None, cross_player=None, headless=False, seed=None,
+                 instrumentation=None, recorder=None, sparse=False, max_fps=None):
         """
         Main game logic class
+        :param size: Board size
+        :param win_length: Number of tiles in a row needed to win (defaults to a full row, column or diagonal)
+        :param nought_player: Dict of AiPlayer options to play noughts as an AI (defaults to a HumanPlayer)
+        :param cross_player: Dict of AiPlayer options to play crosses as an AI (defaults to a random
+                             defensive AiPlayer)
+        :param headless: Run without a view, so render does nothing
+        :param seed: Seed for choosing the first player, for reproducible games
+        :param instrumentation: Optional Instrumentation, to record each turn's timings and search counters
+        :param recorder: Optional GameRecordWriter, to stream the game's moves to as they are made
+        :param sparse: Store the board as a SparseBoard, for very large boards played by the random AIs
+        :param max_fps: Most frames the view draws per second, for fast AI vs AI playback (None for no limit)
+        :raises ValueError if a sparse game is given an algorithm other than the random ones, a recorder, or
+                an unbounded board with a view
         """
-        # Initialise vars
-        self.board = Board(size)
-        self.view = View(self.board)
+        # Raise exception if a sparse game is asked for something only the dense boards support
+        if sparse:
+            for options in (nought_player, cross_player):
+                algorithm = (options or {}).get("algorithm", AiPlayer.RANDOM_ALGORITHM)
+                if algorithm not in SPARSE_ALGORITHMS:
+                    raise ValueError("algorithm:{} - sparse boards support:{}".format(algorithm, SPARSE_ALGORITHMS))
+            if recorder is not None:
+                raise ValueError("recorder - sparse games can't be recorded")
+            if size is None and not headless:
+                raise ValueError("size:None - unbounded boards can only be played headless")
+
+        # Initialise vars (small boards get the pure Python BitBoard, see new_board)
+        self.board = SparseBoard(size, win_length) if sparse else new_board(size, win_length)
+        self.view = NullView() if headless else View(self.board, max_fps=max_fps)
         self._turn_number = 0
+        self.instrumentation = instrumentation
 
         # Initialise players
-        self.nought_player = HumanPlayer(self.board, True)
-        self.cross_player = AiPlayer(self.board, False, algorithm=AiPlayer.RANDOM_DEFENSIVE_ALGORITHM)
+        if nought_player is None:
+            self.nought_player = HumanPlayer(self.board, True)
+        else:
+            self.nought_player = AiPlayer(self.board, True, **nought_player)
+        if cross_player is None:
+            cross_player = {"algorithm": AiPlayer.RANDOM_DEFENSIVE_ALGORITHM}
+        self.cross_player = AiPlayer(self.board, False, **cross_player)
         self.players = [self.nought_player, self.cross_player]
 
         # Shuffle player list to randomise first player
-        random.shuffle(self.players)
+        random.Random(seed).shuffle(self.players)
+
+        # Start recording the game
+        self.recorder = recorder
+        if recorder is not None:
+            algorithms = [HUMAN if options is None else options.get("algorithm", AiPlayer.RANDOM_ALGORITHM)
+                          for options in (nought_player, cross_player)]
+            first = Board.NOUGHT if self.players[0] is self.nought_player else Board.CROSS
+            recorder.start_game(size, self.board.win_length, algorithms[0], algorithms[1], first, seed)
 
     @property
     def turn_number(self):
@@ -49,19 +95,52 @@ class Game(object):
         Return the winning player (or None)
         :return: Player or None
         """
-        if self.board.is_won() == Board.NOUGHT:
+        winner = self.board.is_won()
+        if winner == Board.NOUGHT:
             return self.nought_player
-        elif self.board.is_won() == Board.CROSS:
+        elif winner == Board.CROSS:
             return self.cross_player
         else:
             return None
 
-    def next_turn(self):
+    def next_turn(self, move=None):
         """
         Execute the next turn
-        :return:
+        :param move: Optional (row, col) tuple to play for the current player, rather than asking them for a
+                     move (for human moves that arrive from elsewhere, e.g. over a socket)
+        :return: (row, col) tuple of the move made
+        :raises IndexOutOfBoundsException or NotEmptyException if the given move isn't valid
+        """
+        # Only instrumented games pay for timing the turn
+        if self.instrumentation is not None:
+            move = self.instrumentation.play_turn(self, lambda: self._play_turn(move))
+        else:
+            move = self._play_turn(move)
+
+        # Stream the move to the recorder, finishing the record once the game is over
+        finished = self.is_finished()
+        if self.recorder is not None:
+            self.recorder.add_move(*move)
+            if finished:
+                self.recorder.end_game(self.board.is_won())
+
+        # Nothing left to ponder once the game is over
+        if finished:
+            for player in self.players:
+                player.stop_pondering()
+        return move
+
+    def _play_turn(self, move=None):
+        """
+        Has the current player make their move (or plays the given move for them), and moves on to the next
+        turn
+        :param move: Optional (row, col) tuple to play
+        :return: (row, col) tuple of the move made
         """
-        move = self.current_player.make_move()
+        if move is None:
+            move = self.current_player.make_move()
+        else:
+            self.current_player.set_tile(*move)
         self._turn_number += 1
         return move
 
@@ -72,9 +151,18 @@ class Game(object):
         """
         return self.board.is_won() or self.board.is_full()
 
+    def close(self):
+        """
+        Closes both players, shutting down any worker processes their searches started. Call once the game
+        is no longer needed (it can't be played on afterwards).
+        """
+        for player in self.players:
+            player.close()
+
     def render(self):
         """
-        Render the game state to the screen
+        Render the game state to the screen (unless headless). The final position is always drawn, however
+        recently the last frame was.
         """
-        self.view.render()
+        self.view.render(force=self.is_finished())
 
@@ -0,0 +1,302 @@
+
+# Library imports
+import collections
+import mmap
+import os
+import struct
+from array import array
+
+# Project imports
+from lazy_import import lazy_import
+from board import Board
+
+# numpy is only needed to replay positions in bulk
+np = lazy_import("numpy")
+
+
+# Custom exception classes
+class CorruptRecordException(Exception): pass
+
+
+# File format: file header (magic, version), then games back to back. Each game is a game header (board size,
+# win length, nought and cross algorithms, first player, seed), one varint per move (the tile index plus one,
+# so tiles below 127 take one byte), a zero byte ending the moves, and the winner. A varint's last byte is
+# never zero, so the end of the moves can be found with a plain byte search.
+MAGIC = b"NGGR"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sH")
+GAME_HEADER = struct.Struct("<HHBBBq")
+
+# Algorithm value recorded for human players, and seed value recorded for unseeded games
+HUMAN = 0xff
+NO_SEED = -1
+
+# One recorded game. Moves are (row, col) tuples, first is the first player's tile value, and winner is
+# Board.NOUGHT, Board.CROSS or Board.EMPTY for a draw.
+GameRecord = collections.namedtuple("GameRecord", ["size", "win_length", "nought_algorithm", "cross_algorithm",
+                                                   "first", "seed", "winner", "moves"])
+
+
+def _index_games(buffer, path):
+    """
+    Scans a game record file's contents for the start of every complete game
+    :param buffer: File contents (bytes or mmap)
+    :param path: File name, for error messages
+    :return: (array of game offsets, offset just past the last complete game) tuple
+    :raises CorruptRecordException if the file header doesn't match this format
+    """
+    # Raise exception if the file is too short for a header, or the header doesn't match this format
+    if len(buffer) < FILE_HEADER.size:
+        raise CorruptRecordException("{} - too short for a header".format(path))
+    magic, version = FILE_HEADER.unpack_from(buffer)
+    if magic != MAGIC or version != VERSION:
+        raise CorruptRecordException("{} - magic:{!r}, version:{} - expected {!r}, {}".format(
+            path, magic, version, MAGIC, VERSION))
+
+    # A game ends at the first zero byte after its header, plus the winner byte
+    offsets = array("Q")
+    offset = FILE_HEADER.size
+    while True:
+        end = buffer.find(b"\x00", offset + GAME_HEADER.size)
+        if end == -1 or end + 2 > len(buffer):
+            break
+        offsets.append(offset)
+        offset = end + 2
+    return offsets, offset
+
+
+def _varint(value):
+    """
+    Encodes an unsigned int as a little endian base 128 varint
+    :param value: int
+    :return: bytes
+    """
+    encoded = bytearray()
+    while value >= 0x80:
+        encoded.append(value & 0x7f | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+class GameRecordWriter(object):
+
+    def __init__(self, path):
+        """
+        Append only writer of game records. Moves are written as they are made, so it can stream from
+        Game.next_turn. A game cut off half way (e.g. by a crash) can only be at the end of the file, where
+        the reader skips it, and it is truncated away when the file is next opened for writing.
+        :param path: File to append to, created with a file header if it doesn't exist
+        :raises CorruptRecordException if the file exists, but its header doesn't match this format
+        """
+        header = FILE_HEADER.pack(MAGIC, VERSION)
+        length = os.path.getsize(path) if os.path.exists(path) else 0
+
+        # Find where the last complete game ends, so a file header or game left incomplete there can be cut off,
+        # and the games appended after it found again
+        end = length
+        if length:
+            with open(path, "rb") as record_file:
+                if length < FILE_HEADER.size and header.startswith(record_file.read()):
+                    end = 0
+                else:
+                    buffer = mmap.mmap(record_file.fileno(), 0, access=mmap.ACCESS_READ)
+                    try:
+                        end = _index_games(buffer, path)[1]
+                    finally:
+                        buffer.close()
+
+        self._file = open(path, "ab")
+        if end < length:
+            self._file.truncate(end)
+            self._file.seek(0, os.SEEK_END)
+        if end == 0:
+            self._file.write(header)
+        self._size = None
+
+    def start_game(self, size, win_length, nought_algorithm, cross_algorithm, first, seed=None):
+        """
+        Starts recording a game
+        :param size: Board size
+        :param win_length: Number of tiles in a row needed to win
+        :param nought_algorithm: AiPlayer algorithm of the nought player (HUMAN for a human)
+        :param cross_algorithm: AiPlayer algorithm of the cross player (HUMAN for a human)
+        :param first: Tile value of the first player (Board.NOUGHT or Board.CROSS)
+        :param seed: Game's seed (None if unseeded)
+        """
+        self._size = size
+        self._file.write(GAME_HEADER.pack(size, win_length, nought_algorithm, cross_algorithm, first,
+                                          NO_SEED if seed is None else seed))
+
+    def add_move(self, row, col):
+        """
+        Records a move of the game being recorded
+        :param row: Row index
+        :param col: Column index
+        """
+        self._file.write(_varint(row * self._size + col + 1))
+
+    def end_game(self, winner):
+        """
+        Finishes the game being recorded, and flushes it to the file
+        :param winner: Board.NOUGHT, Board.CROSS or Board.EMPTY for a draw
+        """
+        self._file.write(bytes((0, winner or Board.EMPTY)))
+        self._file.flush()
+        self._size = None
+
+    def write_game(self, size, win_length, nought_algorithm, cross_algorithm, first, seed, winner, moves):
+        """
+        Records a whole game at once (same arguments as GameRecord)
+        """
+        self.start_game(size, win_length, nought_algorithm, cross_algorithm, first, seed)
+        for row, col in moves:
+            self.add_move(row, col)
+        self.end_game(winner)
+
+    def close(self):
+        """
+        Closes the file
+        """
+        self._file.close()
+
+
+class GameRecordReader(object):
+
+    def __init__(self, path):
+        """
+        Read only, memory mapped game records. Games are found with one scan on opening, which keeps just
+        their offsets, and are only decoded when asked for.
+        :param path: File written by GameRecordWriter
+        :raises CorruptRecordException if the file header doesn't match this format
+        """
+        # Raise exception if the file is too short for a header (an empty file can't be mapped anyway)
+        with open(path, "rb") as record_file:
+            if os.fstat(record_file.fileno()).st_size < FILE_HEADER.size:
+                raise CorruptRecordException("{} - too short for a header".format(path))
+            self._mmap = mmap.mmap(record_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Index the start of every complete game
+        self._offsets = _index_games(self._mmap, path)[0]
+
+    def __len__(self):
+        """
+        Number of complete games
+        :return: int
+        """
+        return len(self._offsets)
+
+    def __getitem__(self, index):
+        """
+        Decodes a game
+        :param index: Game number (negative numbers count from the end)
+        :return: GameRecord
+        """
+        size, win_length, nought_algorithm, cross_algorithm, first, seed = GAME_HEADER.unpack_from(
+            self._mmap, self._offsets[index])
+        cells, end = self._decode(index)
+        return GameRecord(size, win_length, nought_algorithm, cross_algorithm, first, None if seed == NO_SEED else seed,
+                          self._mmap[end + 1], [divmod(cell, size) for cell in cells])
+
+    def __iter__(self):
+        """
+        Decodes every game, in the order they were written
+        :return: generator of GameRecord
+        """
+        for index in range(len(self)):
+            yield self[index]
+
+    def cells(self, index):
+        """
+        Decodes just a game's moves, as tile indices
+        :param index: Game number
+        :return: list of int (row * size + col)
+        """
+        return self._decode(index)[0]
+
+    def _decode(self, index):
+        """
+        Decodes a game's move varints
+        :param index: Game number
+        :return: (list of tile indices, offset of the byte ending the moves) tuple
+        """
+        start = self._offsets[index] + GAME_HEADER.size
+        end = self._mmap.find(b"\x00", start)
+        cells = []
+        value = shift = 0
+        for byte in self._mmap[start:end]:
+            value |= (byte & 0x7f) << shift
+            shift += 7
+            if not byte & 0x80:
+                cells.append(value - 1)
+                value = shift = 0
+        return cells, end
+
+    def close(self):
+        """
+        Unmaps the file
+        """
+        self._mmap.close()
+
+
+def replay_board(record, plies=None):
+    """
+    Replays a game onto a Board, so its move stack can be stepped back through with pop
+    :param record: GameRecord
+    :param plies: Number of moves to replay (defaults to all of them)
+    :return: Board
+    """
+    board = Board(record.size, record.win_length)
+    value = record.first
+    for row, col in record.moves[:plies]:
+        board.push(row, col, value)
+        value = Board.CROSS if value == Board.NOUGHT else Board.NOUGHT
+    return board
+
+
+def replay_positions(reader, indices=None):
+    """
+    Bulk replays games into every position played, for training and analysis datasets. All the games must
+    be on the same board size.
+    :param reader: GameRecordReader
+    :param indices: Game numbers to replay (defaults to all of them)
+    :return: dict of arrays, one row per position: "boards" (uint8 [P, size, size], before the move),
+             "moves" (tile index played), "to_move" (tile value of the side to move), "winner" (the game's
+             winner) and "game" (game number)
+    """
+    indices = range(len(reader)) if indices is None else indices
+    boards, moves, to_move, winners, games = [], [], [], [], []
+    size = None
+    for index in indices:
+        record = reader[index]
+        if size is None:
+            size = record.size
+        elif record.size != size:
+            raise ValueError("game:{} - size:{}, expected {}".format(index, record.size, size))
+
+        # Sides alternate from the first player. Position j holds every move before move j, which is the
+        # lower triangle of (position, move) pairs.
+        cells = np.array([row * size + col for row, col in record.moves], dtype=np.intp)
+        second = Board.CROSS if record.first == Board.NOUGHT else Board.NOUGHT
+        values = np.where(np.arange(len(cells)) % 2 == 0, record.first, second).astype(np.uint8)
+        positions = np.zeros((len(cells), size * size), dtype=np.uint8)
+        position, move = np.tril_indices(len(cells), -1)
+        positions[position, cells[move]] = values[move]
+
+        boards.append(positions)
+        moves.append(cells)
+        to_move.append(values)
+        winners.append(np.full(len(cells), record.winner, dtype=np.uint8))
+        games.append(np.full(len(cells), index, dtype=np.int64))
+
+    # Nothing to replay
+    if size is None:
+        return {"boards": np.zeros((0, 0, 0), dtype=np.uint8), "moves": np.zeros(0, dtype=np.intp),
+                "to_move": np.zeros(0, dtype=np.uint8), "winner": np.zeros(0, dtype=np.uint8),
+                "game": np.zeros(0, dtype=np.int64)}
+
+    return {"boards": np.concatenate(boards).reshape(-1, size, size),
+            "moves": np.concatenate(moves),
+            "to_move": np.concatenate(to_move),
+            "winner": np.concatenate(winners),
+            "game": np.concatenate(games)}
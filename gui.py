@@ -0,0 +1,276 @@
+
+# Library imports
+import argparse
+import queue
+import threading
+import time
+import tkinter
+
+# Project imports
+from board import Board, IndexOutOfBoundsException, NotEmptyException
+from game import Game
+from simulate import ALGORITHMS
+
+
+# Pixels per tile, and gap around the board
+TILE_SIZE = 32
+MARGIN = 20
+
+# Milliseconds between checks for the AI's move, and between AI vs AI moves
+POLL_MS = 50
+MOVE_DELAY_MS = 200
+
+# Tile icons and colours
+ICONS = {Board.EMPTY: "", Board.NOUGHT: "O", Board.CROSS: "X"}
+COLOURS = {Board.EMPTY: "black", Board.NOUGHT: "blue", Board.CROSS: "red"}
+SPINNER = "|/-\\"
+
+
+class GameWindow(object):
+
+    def __init__(self, root, size=3, win_length=None, nought_player=None, cross_player=None):
+        """
+        Tkinter front end for Game. The board is drawn once on a Canvas, and after each move only the tiles
+        that changed are updated. AI moves are worked out in a worker thread while the window keeps running,
+        and picked up by polling with after(), with a thinking indicator showing the search's speed.
+        :param root: tkinter.Tk instance
+        :param size: Board size
+        :param win_length: Number of tiles in a row needed to win (defaults to a full row, column or diagonal)
+        :param nought_player: Dict of AiPlayer options to play noughts as an AI (None for a human clicking tiles)
+        :param cross_player: Dict of AiPlayer options to play crosses as an AI (defaults to a random defensive
+                             AiPlayer)
+        """
+        self._root = root
+        self._size = size
+        self._win_length = win_length
+        self._player_options = (nought_player, cross_player)
+
+        # Board canvas, with a status line and new game button under it
+        pixels = size * TILE_SIZE + 2 * MARGIN
+        self._canvas = tkinter.Canvas(root, width=pixels, height=pixels, background="white", highlightthickness=0)
+        self._canvas.pack()
+        self._canvas.bind("<Button-1>", self._click)
+        self._status = tkinter.StringVar()
+        tkinter.Label(root, textvariable=self._status, anchor="w").pack(fill="x", padx=MARGIN // 2)
+        tkinter.Button(root, text="New game", command=self.new_game).pack(pady=MARGIN // 4)
+
+        # Grid lines and one (empty) text item per tile are created once, later moves just reconfigure them
+        end = MARGIN + size * TILE_SIZE
+        for line in range(size + 1):
+            offset = MARGIN + line * TILE_SIZE
+            self._canvas.create_line(MARGIN, offset, end, offset, fill="grey")
+            self._canvas.create_line(offset, MARGIN, offset, end, fill="grey")
+        self._tiles = [[self._canvas.create_text(MARGIN + (col + 0.5) * TILE_SIZE, MARGIN + (row + 0.5) * TILE_SIZE,
+                                                 text="", font=("Helvetica", TILE_SIZE // 2, "bold"))
+                        for col in range(size)] for row in range(size)]
+
+        # Moves worked out by worker threads, as (generation, move, error) tuples, when the current AI started
+        # thinking, and whether a poll for its move is scheduled
+        self._results = queue.Queue()
+        self._thinking = None
+        self._thread = None
+        self._polling = False
+        self._spinner = 0
+
+        self.game = None
+        self._shown = []
+        self._generation = 0
+        self.new_game()
+
+    def new_game(self):
+        """
+        Starts a new game. An AI still thinking about the old game finishes in the background, and its move
+        is thrown away.
+        """
+        if self.game is not None:
+            self._retire_game()
+
+        # Moves from an older game's worker are told apart by their generation
+        self._generation += 1
+        self._thinking = None
+        nought_player, cross_player = self._player_options
+        self.game = Game(self._size, self._win_length, nought_player, cross_player, headless=True)
+
+        self._human = self.game.nought_player if nought_player is None else None
+        self._repaint()
+        self._next_turn()
+
+    def _next_turn(self):
+        """
+        Reports the game's outcome once it's over, otherwise waits for a click or has the AI think
+        """
+        if self.game.is_finished():
+            winner = self.game.winning_player
+            self._status.set("Game over. {}".format(
+                "Its a draw." if winner is None else "Winner is {} ({}).".format(
+                    winner.name, winner.noughts_or_crosses_string)))
+            return
+
+        player = self.game.current_player
+        if player is self._human:
+            self._status.set("Your move ({}), click a tile.".format(player.noughts_or_crosses_string))
+            return
+
+        # Search in a worker thread, so the window carries on responding while it thinks
+        self._thinking = time.perf_counter()
+        thread = threading.Thread(target=self._think, args=(self.game, self._generation), name="think")
+        thread.daemon = True
+        thread.start()
+        self._thread = thread
+        if not self._polling:
+            self._polling = True
+            self._root.after(POLL_MS, self._poll)
+
+    def _think(self, game, generation):
+        """
+        Worker thread, has the current AI player make its move (the window doesn't touch the game meanwhile)
+        :param game: Game to move in
+        :param generation: Game generation, handed back with the move
+        """
+        try:
+            self._results.put((generation, game.next_turn(), None))
+        except Exception as error:
+            self._results.put((generation, None, error))
+
+    def _poll(self):
+        """
+        Checks whether the AI has moved yet, updating the thinking indicator if not
+        """
+        try:
+            generation, move, error = self._results.get_nowait()
+        except queue.Empty:
+            if self._thinking is not None:
+                self._show_thinking()
+                self._root.after(POLL_MS, self._poll)
+            else:
+                self._polling = False
+            return
+
+        # Ignore a move from a game that has since been replaced, and keep waiting for the current game's
+        if generation != self._generation:
+            self._root.after(POLL_MS, self._poll)
+            return
+
+        self._polling = False
+        self._thinking = None
+        if error is not None:
+            self._status.set("AI failed: {}: {}".format(type(error).__name__, error))
+            return
+        self._repaint()
+
+        # Leave a gap between AI moves, so AI vs AI games can be followed (unless a new game starts meanwhile)
+        if self._human is None and not self.game.is_finished():
+            self._root.after(MOVE_DELAY_MS, lambda: generation == self._generation and self._next_turn())
+        else:
+            self._next_turn()
+
+    def _show_thinking(self):
+        """
+        Updates the thinking indicator, with the nodes (or playouts) searched so far and their rate
+        """
+        player = self.game.current_player
+        elapsed = time.perf_counter() - self._thinking
+        progress = player.progress
+        self._spinner = (self._spinner + 1) % len(SPINNER)
+        self._status.set("{} {} thinking... {:.1f}s, {} nodes ({:.0f} nodes/sec)".format(
+            SPINNER[self._spinner], player.noughts_or_crosses_string.capitalize(), elapsed, progress,
+            progress / elapsed if elapsed else 0.0))
+
+    def _click(self, event):
+        """
+        Plays a human's move on the clicked tile
+        :param event: tkinter click event
+        """
+        # Ignore clicks while the AI thinks, once the game is over, or outside the board
+        if self._thinking is not None or self.game.is_finished() or self.game.current_player is not self._human:
+            return
+        row, col = (event.y - MARGIN) // TILE_SIZE, (event.x - MARGIN) // TILE_SIZE
+
+        try:
+            self.game.next_turn((row, col))
+        except (IndexOutOfBoundsException, NotEmptyException):
+            return
+        self._repaint()
+        self._next_turn()
+
+    def _repaint(self):
+        """
+        Updates the tiles whose moves differ from the moves shown (new moves, or ones cleared by a new game)
+        """
+        moves = self.game.board.moves
+        shown = self._shown
+
+        # Find how many moves are the same as last repaint
+        same = 0
+        limit = min(len(shown), len(moves))
+        while same < limit and shown[same] == moves[same]:
+            same += 1
+
+        for row, col, _ in shown[same:]:
+            self._canvas.itemconfigure(self._tiles[row][col], text=ICONS[Board.EMPTY])
+        for row, col, value in moves[same:]:
+            self._canvas.itemconfigure(self._tiles[row][col], text=ICONS[value], fill=COLOURS[value])
+        self._shown = moves
+
+    def _retire_game(self):
+        """
+        Closes the current game, once it is being replaced or the window closes. Pondering stops straight
+        away, but an AI still thinking keeps its search (and any worker processes) until its move is done.
+        """
+        game, thread = self.game, self._thread
+        for player in game.players:
+            player.stop_pondering()
+        if thread is None or not thread.is_alive():
+            game.close()
+            return
+
+        def close_after_move():
+            """
+            Waits for the worker thread's move, then closes its game
+            """
+            thread.join()
+            game.close()
+
+        closer = threading.Thread(target=close_after_move, name="close game")
+        closer.daemon = True
+        closer.start()
+
+    def close(self):
+        """
+        Stops any pondering, closes the game and closes the window
+        """
+        self._retire_game()
+        self._root.destroy()
+
+
+def main():
+    """
+    Opens a game window
+    """
+    parser = argparse.ArgumentParser(description="Play noughts and crosses in a window")
+    parser.add_argument("--size", type=int, default=3, help="board size")
+    parser.add_argument("--win-length", type=int, default=None, help="tiles in a row needed to win")
+    parser.add_argument("--nought", choices=["human"] + sorted(ALGORITHMS), default="human", help="nought player")
+    parser.add_argument("--cross", choices=sorted(ALGORITHMS), default="defensive", help="cross algorithm")
+    parser.add_argument("--time-limit", type=float, default=None, help="seconds per move, for anytime algorithms")
+    parser.add_argument("--depth", type=int, default=None, help="search depth, for negamax")
+    args = parser.parse_args()
+
+    def options(name):
+        """
+        AiPlayer options for a command line player (None for a human)
+        """
+        if name == "human":
+            return None
+        return {"algorithm": ALGORITHMS[name], "time_limit": args.time_limit, "search_depth": args.depth}
+
+    root = tkinter.Tk()
+    root.title("Noughts & crosses")
+    window = GameWindow(root, args.size, args.win_length, options(args.nought), options(args.cross))
+    root.protocol("WM_DELETE_WINDOW", window.close)
+    root.mainloop()
+
+
+# If this script is execute directly, call the main function
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+
+# Library imports
+import cProfile
+import json
+import time
+
+
+class MemorySink(object):
+
+    def __init__(self):
+        """
+        Keeps turn records in a list
+        """
+        self.records = []
+
+    def write(self, record):
+        """
+        Stores a turn record
+        :param record: dict
+        """
+        self.records.append(record)
+
+    def close(self):
+        """
+        Nothing to release, the records stay available
+        """
+        pass
+
+
+class JsonLinesSink(object):
+
+    def __init__(self, path):
+        """
+        Appends turn records to a file, one JSON object per line
+        :param path: File to append to
+        """
+        self._file = open(path, "a")
+
+    def write(self, record):
+        """
+        Writes a turn record, flushing it so a slow game can be watched as it happens
+        :param record: dict
+        """
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self):
+        """
+        Closes the file
+        """
+        self._file.close()
+
+
+class Instrumentation(object):
+
+    def __init__(self, sink, profile_turns=(), profile_path="turn_{turn}.prof"):
+        """
+        Opt-in per turn instrumentation for Game. Each turn writes a record of its wall time, split between
+        choosing the move and checking the outcome, and the player's search counters, to the sink. Games
+        without instrumentation skip all of this.
+        :param sink: Where the records go (MemorySink, JsonLinesSink or anything with write(record))
+        :param profile_turns: Turn numbers to run under cProfile
+        :param profile_path: Where to dump each profiled turn's stats (formatted with the turn number), for
+                             reading with pstats
+        """
+        self.sink = sink
+        self._profile_turns = frozenset(profile_turns)
+        self._profile_path = profile_path
+
+    def play_turn(self, game, make_move):
+        """
+        Plays a turn, timing it and writing its record to the sink
+        :param game: Game instance
+        :param make_move: Function that plays the turn and returns the move
+        :return: (row, col) tuple of the move made
+        """
+        turn = game.turn_number
+        player = game.current_player
+        profile = cProfile.Profile() if turn in self._profile_turns else None
+
+        # Choose and make the move, under the profiler if this turn is being profiled
+        start = time.perf_counter()
+        if profile is not None:
+            move = profile.runcall(make_move)
+        else:
+            move = make_move()
+        selected = time.perf_counter()
+
+        # Check the outcome
+        finished = bool(game.is_finished())
+        checked = time.perf_counter()
+
+        record = {"turn": turn,
+                  "player": player.name,
+                  "side": player.noughts_or_crosses_string,
+                  "move": None if move is None else list(move),
+                  "total": checked - start,
+                  "select": selected - start,
+                  "check": checked - selected,
+                  "finished": finished,
+                  "stats": getattr(player, "stats", {})}
+
+        # Dump the profile, and point the record at it
+        if profile is not None:
+            record["profile"] = self._profile_path.format(turn=turn)
+            profile.dump_stats(record["profile"])
+
+        self.sink.write(record)
+        return move
+
+    def close(self):
+        """
+        Closes the sink
+        """
+        self.sink.close()
@@ -0,0 +1,34 @@
+
+# Library imports
+import importlib
+
+
+class LazyModule(object):
+
+    def __init__(self, name):
+        """
+        Stand in for a module that is only imported the first time one of its attributes is used, so a heavy
+        import (e.g. numpy) isn't paid for by programs that never need it. After the import, the module's
+        attributes are copied onto this object, so later lookups cost the same as on the module itself.
+        :param name: Module name, as given to import
+        """
+        self.__dict__["_lazy_name"] = name
+
+    def __getattr__(self, attr):
+        """
+        Imports the module (only called for attributes not copied across yet)
+        :param attr: Attribute name
+        :return: The module's attribute
+        """
+        module = importlib.import_module(self.__dict__["_lazy_name"])
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+def lazy_import(name):
+    """
+    Returns a module that is imported on first use, for use in place of "import name"
+    :param name: Module name
+    :return: LazyModule
+    """
+    return LazyModule(name)
@@ -0,0 +1,171 @@
+
+# Library imports
+import argparse
+import time
+
+# Project imports
+import numpy as np
+from board import Board
+from bitboard import win_masks
+from player import AiPlayer
+
+
+# Algorithms the engine can play, for either side
+ALGORITHMS = (AiPlayer.RANDOM_ALGORITHM, AiPlayer.RANDOM_DEFENSIVE_ALGORITHM)
+
+
+class LockstepEngine(object):
+
+    def __init__(self, size=3, win_length=None):
+        """
+        Plays thousands of games at once, in step with each other. Every game's board is a row of one
+        [N, size * size] array, and each step picks moves for every live game together, checks them for a
+        win together, and masks finished games out.
+        :param size: Board size
+        :param win_length: Number of tiles in a row needed to win (defaults to a full row, column or diagonal)
+        """
+        self._size = size
+        self._cells = size * size
+
+        # Tile indices of every winning line. Boards carry one extra tile at the end that is always empty,
+        # which pads out the lines through each tile to the same count with a line that can never be won.
+        lines = [[cell for cell in range(self._cells) if mask >> cell & 1] for mask in win_masks(size, win_length)]
+        self._lines = np.array(lines + [[self._cells] * len(lines[0])], dtype=np.intp)
+        through = [[index for index, line in enumerate(lines) if cell in line] for cell in range(self._cells)]
+        width = max(len(indices) for indices in through)
+        self._cell_lines = np.array([indices + [len(lines)] * (width - len(indices)) for indices in through],
+                                    dtype=np.intp)
+
+        # Which tiles each line covers, to turn "lines under threat" into "tiles that block them"
+        self._line_tiles = np.zeros((len(lines), self._cells), dtype=np.float32)
+        for index, line in enumerate(lines):
+            self._line_tiles[index, line] = 1
+
+    def play(self, games, nought_algorithm=AiPlayer.RANDOM_ALGORITHM, cross_algorithm=AiPlayer.RANDOM_ALGORITHM,
+             seed=None):
+        """
+        Plays a batch of games to the end. The first player of each game is picked at random, like Game.
+        :param games: Number of games
+        :param nought_algorithm: AiPlayer.RANDOM_ALGORITHM or AiPlayer.RANDOM_DEFENSIVE_ALGORITHM
+        :param cross_algorithm: AiPlayer.RANDOM_ALGORITHM or AiPlayer.RANDOM_DEFENSIVE_ALGORITHM
+        :param seed: Random seed, for reproducible batches
+        :return: dict of arrays [games]: "first" (Board.NOUGHT/CROSS), "winner" (Board.NOUGHT/CROSS, or
+                 Board.EMPTY for a draw) and "moves"
+        """
+        # Raise exception for algorithms that can't be vectorised
+        for algorithm in (nought_algorithm, cross_algorithm):
+            if algorithm not in ALGORITHMS:
+                raise ValueError("algorithm:{} - supported:{}".format(algorithm, ALGORITHMS))
+        defensive = {Board.NOUGHT: nought_algorithm == AiPlayer.RANDOM_DEFENSIVE_ALGORITHM,
+                     Board.CROSS: cross_algorithm == AiPlayer.RANDOM_DEFENSIVE_ALGORITHM}
+
+        rng = np.random.default_rng(seed)
+        boards = np.zeros((games, self._cells + 1), dtype=np.uint8)
+        first = np.where(rng.random(games) < 0.5, Board.NOUGHT, Board.CROSS).astype(np.uint8)
+        to_move = first.copy()
+        winner = np.zeros(games, dtype=np.uint8)
+        moves = np.zeros(games, dtype=np.int32)
+        live = np.arange(games)
+
+        while len(live):
+            board = boards[live]
+            mover = to_move[live]
+
+            # Random move, the highest random score among the empty tiles
+            scores = rng.random((len(live), self._cells))
+            scores[board[:, :self._cells] != Board.EMPTY] = -1.0
+
+            # Defensive players only pick among the tiles that block an immediate win, if there are any
+            guarding = np.zeros(len(live), dtype=bool)
+            for value, is_defensive in defensive.items():
+                if is_defensive:
+                    guarding |= mover == value
+            if guarding.any():
+                rows = np.flatnonzero(guarding)
+                blocks = self._blocking_tiles(board[rows], 3 - mover[rows])
+                threatened = blocks.any(axis=1)
+                rows, blocks = rows[threatened], blocks[threatened]
+                scores[rows] = np.where(blocks, scores[rows], -1.0)
+
+            cells = scores.argmax(axis=1)
+            board[np.arange(len(live)), cells] = mover
+            boards[live] = board
+
+            # A move can only complete the lines through its own tile
+            line_values = board[np.arange(len(live))[:, None, None], self._lines[self._cell_lines[cells]]]
+            won = (line_values == mover[:, None, None]).all(axis=-1).any(axis=-1)
+
+            # Record the results, and drop finished games
+            moves[live] += 1
+            winner[live[won]] = mover[won]
+            to_move[live] = 3 - mover
+            live = live[~won & (moves[live] < self._cells)]
+
+        return {"first": first, "winner": winner, "moves": moves}
+
+    def _blocking_tiles(self, boards, enemies):
+        """
+        Finds the tiles that would stop the enemy winning on their next move
+        :param boards: uint8 array [N, cells + 1]
+        :param enemies: uint8 array [N] of the enemy's tile value
+        :return: bool array [N, cells]
+        """
+        # A line is under threat if the enemy holds all but one of its tiles and the last one is empty
+        line_values = boards[:, self._lines[:-1]]
+        enemy_tiles = (line_values == enemies[:, None, None]).sum(axis=-1)
+        empty_tiles = (line_values == Board.EMPTY).sum(axis=-1)
+        threatened = ((enemy_tiles == line_values.shape[-1] - 1) & (empty_tiles == 1)).astype(np.float32)
+
+        # Blocking tiles are the empty tiles of threatened lines
+        return (threatened @ self._line_tiles > 0) & (boards[:, :self._cells] == Board.EMPTY)
+
+
+def first_mover_stats(size, games, win_length=None, nought_algorithm=AiPlayer.RANDOM_ALGORITHM,
+                      cross_algorithm=AiPlayer.RANDOM_ALGORITHM, seed=None):
+    """
+    Plays a batch of games, and summarises how often the first and second players win
+    :param size: Board size
+    :param games: Number of games
+    :param win_length: Number of tiles in a row needed to win (defaults to a full row, column or diagonal)
+    :param nought_algorithm: AiPlayer.RANDOM_ALGORITHM or AiPlayer.RANDOM_DEFENSIVE_ALGORITHM
+    :param cross_algorithm: AiPlayer.RANDOM_ALGORITHM or AiPlayer.RANDOM_DEFENSIVE_ALGORITHM
+    :param seed: Random seed
+    :return: dict of first/second player win rates, draw rate, mean moves and games per second
+    """
+    start = time.time()
+    results = LockstepEngine(size, win_length).play(games, nought_algorithm, cross_algorithm, seed)
+    elapsed = time.time() - start
+
+    decided = results["winner"] != Board.EMPTY
+    first_won = results["winner"] == results["first"]
+    return {"first": float(first_won.mean()),
+            "second": float((decided & ~first_won).mean()),
+            "draw": float((~decided).mean()),
+            "moves": float(results["moves"].mean()),
+            "games_per_sec": games / elapsed}
+
+
+def main():
+    """
+    Prints first mover advantage per board size, from the command line
+    """
+    parser = argparse.ArgumentParser(description="First mover advantage per board size, by lockstep self-play")
+    parser.add_argument("--games", type=int, default=100000, help="games per board size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[3, 4, 5, 6, 7], help="board sizes")
+    parser.add_argument("--win-length", type=int, default=None, help="tiles in a row needed to win")
+    parser.add_argument("--defensive", action="store_true", help="both sides play random defensive")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    algorithm = AiPlayer.RANDOM_DEFENSIVE_ALGORITHM if args.defensive else AiPlayer.RANDOM_ALGORITHM
+    print("{:>4} {:>8} {:>8} {:>8} {:>7} {:>12}".format("size", "first", "second", "draw", "moves", "games/min"))
+    for size in args.sizes:
+        win_length = None if args.win_length is None else min(args.win_length, size)
+        stats = first_mover_stats(size, args.games, win_length, algorithm, algorithm, args.seed)
+        print("{:>4} {first:>8.1%} {second:>8.1%} {draw:>8.1%} {moves:>7.2f} {:>12,.0f}".format(
+            size, stats["games_per_sec"] * 60, **stats))
+
+
+# If this script is execute directly, call the main function
+if __name__ == "__main__":
+    main()
@@ -19,7 +19,7 @@ def main():
         print("Second player is {}, using {}".format(game.players[1].name, game.players[1].noughts_or_crosses_string))
 
         # Wait for user to be ready
-        raw_input("Press any key to start")
+        input("Press any key to start")
 
         # Initial game render
         game.render()
@@ -37,7 +37,7 @@ def main():
             print("Game over. Its a draw, how exciting.")
 
         # Ask if the user wants to play again
-        raw_input("Press any key to play again...")
+        input("Press any key to play again...")
 
 
 # If this script is execute directly, call the main function
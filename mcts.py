@@ -0,0 +1,456 @@
+
+# Library imports
+import math
+import os
+import random
+import time
+
+# Project imports
+from board import Board
+from bitboard import win_masks
+from lazy_import import lazy_import
+
+# Worker processes are only needed by ParallelMctsSearch
+multiprocessing = lazy_import("multiprocessing")
+
+
+class Node(object):
+
+    __slots__ = ("cell", "parent", "children", "untried", "visits", "wins", "won")
+
+    def __init__(self, cell, parent, untried, won):
+        """
+        Search tree node, for the position after a move
+        :param cell: Tile index of the move leading here (None for the root)
+        :param parent: Parent Node (None for the root)
+        :param untried: List of tile indices not expanded yet
+        :param won: Did the move leading here win the game?
+        """
+        self.cell = cell
+        self.parent = parent
+        self.children = {}
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0.0
+        self.won = won
+
+
+class MctsSearch(object):
+
+    def __init__(self, size, win_length=None, time_limit=None, playouts=None, exploration=1.4, seed=None):
+        """
+        Anytime Monte Carlo tree search (UCT). Positions are a pair of bitmasks, and playouts place tiles
+        straight into those, so nothing is copied or allocated per step. The tree is kept between moves.
+        :param size: Board size
+        :param win_length: Number of tiles in a row needed to win (defaults to size)
+        :param time_limit: Seconds to search per move (None for no time limit)
+        :param playouts: Playouts per move, counting the ones already under the root from earlier searches
+                         or pondering (None for no playout limit)
+        :param exploration: UCT exploration constant
+        :param seed: Random seed, for reproducible searches
+        """
+        # Fall back to a one second budget if there isn't any other
+        if time_limit is None and playouts is None:
+            time_limit = 1.0
+
+        self._size = size
+        self._cells = size * size
+        self._full_mask = (1 << self._cells) - 1
+        self._time_limit = time_limit
+        self._playouts = playouts
+        self._exploration = exploration
+        self._random = random.Random(seed)
+
+        # Group the win masks by the tiles they cover, so a move only checks the lines through it
+        masks = win_masks(size, win_length)
+        self._cell_masks = [tuple(mask for mask in masks if mask >> cell & 1) for cell in range(self._cells)]
+
+        # The root of the kept tree, and the position it is for (side to move's tiles, other side's tiles)
+        self._root = None
+        self._position = None
+
+        # Counters for the most recent search
+        self.playouts = 0
+        self.reused = 0
+
+    def stats(self):
+        """
+        Returns the counters for the most recent search
+        :return: dict
+        """
+        return {"playouts": self.playouts,
+                "reused_visits": self.reused,
+                "root_visits": self._root.visits if self._root else 0}
+
+    def best_move(self, board, value):
+        """
+        Searches the board's current position, and returns the most visited move
+        :param board: Board (or BitBoard) instance
+        :param value: Side to move (Board.NOUGHT or Board.CROSS)
+        :return: (row, col) tuple
+        """
+        self.search(*self.masks_of(board, value))
+        return divmod(self.best_cell(), self._size)
+
+    def search(self, mine, theirs):
+        """
+        Searches a position until the budget runs out. The root stays at the position, and the next search
+        follows the moves made since then down the tree, so its subtree is reused.
+        :param mine: Bitmask of tiles taken by the side to move
+        :param theirs: Bitmask of tiles taken by the other side
+        """
+        self._reroot(mine, theirs)
+        self.reused = self._root.visits
+
+        # Search until the budget runs out
+        self.playouts = 0
+        deadline = None if self._time_limit is None else time.time() + self._time_limit
+        while not self._exhausted(deadline):
+            self.iterate()
+
+    def ponder(self, mine, theirs, side, stop):
+        """
+        Keeps growing the tree during the opponent's turn. The next search follows their actual move down
+        the tree, so everything found under it is reused. Only ever touches the bitmasks, never a Board, so
+        it can run in a background thread.
+        :param mine: Bitmask of tiles taken by the opponent (the side to move)
+        :param theirs: Bitmask of tiles taken by this side
+        :param side: Unused, for the same interface as NegamaxSearch.ponder
+        :param stop: threading.Event, stops pondering as soon as it is set
+        """
+        self._reroot(mine, theirs)
+
+        # Search until stopped, or the game is over
+        root = self._root
+        while not stop.is_set() and not root.won and (root.untried or root.children):
+            self.iterate()
+
+    def reseed(self, seed):
+        """
+        Reseeds the search's random number generator
+        :param seed: Random seed
+        """
+        self._random.seed(seed)
+
+    def root_visits(self):
+        """
+        Returns the visit count of every expanded move from the root
+        :return: dict of tile index: visits
+        """
+        return dict((cell, child.visits) for cell, child in self._root.children.items())
+
+    def masks_of(self, board, value):
+        """
+        Reads a board into a pair of bitmasks
+        :param board: Board (or BitBoard) instance
+        :param value: Side to move (Board.NOUGHT or Board.CROSS)
+        :return: (mine, theirs) tuple of int
+        """
+        matrix = board.matrix_copy()
+        mine = theirs = 0
+        for cell in range(self._cells):
+            tile = matrix[divmod(cell, self._size)]
+            if tile == value:
+                mine |= 1 << cell
+            elif tile != Board.EMPTY:
+                theirs |= 1 << cell
+        return mine, theirs
+
+    def best_cell(self):
+        """
+        Returns the most visited move from the root so far
+        :return: int tile index
+        """
+        # If nothing has been expanded yet, any legal move will do
+        if not self._root.children:
+            return self._root.untried[0]
+        return max(self._root.children.values(), key=lambda child: child.visits).cell
+
+    def iterate(self):
+        """
+        Runs one iteration: select a leaf by UCT, expand it, play it out at random, and back up the result
+        """
+        node = self._root
+        mine, theirs = self._position
+
+        # Selection, walk down fully expanded nodes by UCT. Positions swap sides with every move.
+        while not node.untried and node.children and not node.won:
+            node = self._select(node)
+            mine, theirs = theirs, mine | (1 << node.cell)
+
+        # Expansion, add one untried move
+        if node.untried and not node.won:
+            cell = node.untried.pop(self._random.randrange(len(node.untried)))
+            mine, theirs = theirs, mine | (1 << cell)
+            child = Node(cell, node, self._free_cells(mine | theirs), self._wins(theirs, cell))
+            node.children[cell] = child
+            node = child
+
+        # Simulation, score 1 for a win for the side that moved into the node, 0.5 for a draw
+        result = 1.0 if node.won else self._playout(mine, theirs)
+        self.playouts += 1
+
+        # Backpropagation, flipping the result at every level
+        while node is not None:
+            node.visits += 1
+            node.wins += result
+            result = 1.0 - result
+            node = node.parent
+
+    def _exhausted(self, deadline):
+        """
+        Checks if the search budget has run out
+        :param deadline: time.time() to stop at, or None
+        :return: bool
+        """
+        # Nothing to search if the game is over
+        if self._root.won or (not self._root.untried and not self._root.children):
+            return True
+        if self._playouts is not None and self.playouts + self.reused >= self._playouts:
+            return True
+        return deadline is not None and time.time() >= deadline
+
+    def _select(self, node):
+        """
+        Picks the child with the highest UCT score
+        :param node: Fully expanded Node
+        :return: Node
+        """
+        log_visits = math.log(node.visits)
+        exploration = self._exploration
+        best, best_score = None, -1.0
+        for child in node.children.values():
+            score = child.wins / child.visits + exploration * math.sqrt(log_visits / child.visits)
+            if score > best_score:
+                best, best_score = child, score
+        return best
+
+    def _playout(self, mine, theirs):
+        """
+        Plays random moves until the game ends
+        :param mine: Bitmask of tiles taken by the side to move
+        :param theirs: Bitmask of tiles taken by the side that just moved
+        :return: 1.0 if the side that just moved wins, 0.0 if it loses, 0.5 for a draw
+        """
+        free = self._free_cells(mine | theirs)
+        randrange = self._random.randrange
+        cell_masks = self._cell_masks
+
+        # Alternate moves, starting with the side to move, which is "mine" on even turns
+        turn = 0
+        while free:
+
+            # Pick a random free tile, moving the last one into its place so the pop is O(1)
+            index = randrange(len(free))
+            cell = free[index]
+            free[index] = free[-1]
+            free.pop()
+
+            bit = 1 << cell
+            if turn % 2 == 0:
+                mine |= bit
+                bits = mine
+            else:
+                theirs |= bit
+                bits = theirs
+
+            # The mover wins if a line through the tile is complete
+            for mask in cell_masks[cell]:
+                if bits & mask == mask:
+                    return 0.0 if turn % 2 == 0 else 1.0
+            turn += 1
+
+        return 0.5
+
+    def _wins(self, bits, cell):
+        """
+        Checks if the side owning bits has completed a line through cell
+        :param bits: Bitmask of the side's tiles
+        :param cell: Tile index just taken
+        :return: bool
+        """
+        for mask in self._cell_masks[cell]:
+            if bits & mask == mask:
+                return True
+        return False
+
+    def _free_cells(self, taken):
+        """
+        Lists the free tiles
+        :param taken: Bitmask of taken tiles
+        :return: list of tile indices
+        """
+        free = self._full_mask & ~taken
+        cells = []
+        while free:
+            low_bit = free & -free
+            cells.append(low_bit.bit_length() - 1)
+            free ^= low_bit
+        return cells
+
+    def _advance(self, cell):
+        """
+        Moves the root down to the child for a move, keeping its subtree (or a fresh node if not expanded)
+        :param cell: Tile index of the move
+        """
+        mine, theirs = self._position
+        mine, theirs = theirs, mine | (1 << cell)
+        child = self._root.children.get(cell)
+        if child is None:
+            child = Node(cell, None, self._free_cells(mine | theirs), self._wins(theirs, cell))
+
+        child.parent = None
+        self._root = child
+        self._position = (mine, theirs)
+
+    def _reroot(self, mine, theirs):
+        """
+        Moves the root down the kept tree to the current position, following the moves made since the last
+        search. Starts a fresh tree if the position isn't in it.
+        :param mine: Bitmask of tiles taken by the side to move
+        :param theirs: Bitmask of tiles taken by the other side
+        """
+        while self._root is not None and self._position != (mine, theirs):
+            root_mine, root_theirs = self._position
+
+            # Work out which side the root's mover is now, and find its new tiles
+            if not root_mine & ~mine and not root_theirs & ~theirs:
+                new_for_mover = mine & ~root_mine
+            elif not root_mine & ~theirs and not root_theirs & ~mine:
+                new_for_mover = theirs & ~root_mine
+            else:
+                break
+
+            # Follow one of its moves, or give up if it hasn't made any
+            if not new_for_mover:
+                break
+            self._advance((new_for_mover & -new_for_mover).bit_length() - 1)
+
+        # Reuse the tree if the root reached the position
+        if self._root is not None and self._position == (mine, theirs):
+            return
+
+        # Position isn't in the tree, start again
+        self._root = Node(None, None, self._free_cells(mine | theirs), False)
+        self._position = (mine, theirs)
+
+
+def _worker_loop(connection, size, win_length, time_limit, playouts, exploration):
+    """
+    Worker process, builds its own search up front, then searches each position it is sent with the seed it
+    is given, and sends back its root visits. Its tree is kept between moves, so it can be reused.
+    :param connection: This worker's end of its Pipe. Receives (mine, theirs, seed) tuples, or None to stop.
+    :param size: Board size
+    :param win_length: Number of tiles in a row needed to win
+    :param time_limit: Seconds to search per move
+    :param playouts: Playouts to run per move
+    :param exploration: UCT exploration constant
+    """
+    search = MctsSearch(size, win_length, time_limit, playouts, exploration)
+    connection.send(os.getpid())
+
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        mine, theirs, seed = message
+        search.reseed(seed)
+        search.search(mine, theirs)
+        connection.send((search.root_visits(), search.playouts))
+    connection.close()
+
+
+class ParallelMctsSearch(MctsSearch):
+
+    def __init__(self, size, win_length=None, time_limit=None, playouts=None, exploration=1.4, seed=None,
+                 workers=None):
+        """
+        Root parallel MCTS. Each worker process grows its own tree from the same position with a different
+        seed, and the root visit counts are summed to pick the move. Workers are started up front and
+        kept, along with their trees, for every move. Each worker has its own pipe, so every worker searches
+        each move exactly once.
+        :param size: Board size
+        :param win_length: Number of tiles in a row needed to win (defaults to size)
+        :param time_limit: Seconds to search per move (None for no time limit)
+        :param playouts: Total playouts to run per move, split between the workers (None for no limit)
+        :param exploration: UCT exploration constant
+        :param seed: Random seed, for reproducible searches
+        :param workers: Number of worker processes (defaults to the number of cores)
+        """
+        super(ParallelMctsSearch, self).__init__(size, win_length, time_limit, playouts, exploration, seed)
+        self._workers = workers or os.cpu_count() or 1
+
+        # Each worker gets a share of the playout budget, and the full time budget
+        worker_playouts = None if self._playouts is None else -(-self._playouts // self._workers)
+        self._connections = []
+        self._processes = []
+        for _ in range(self._workers):
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_worker_loop, name="mcts worker", daemon=True,
+                                              args=(worker_connection, size, win_length, self._time_limit,
+                                                    worker_playouts, exploration))
+            process.start()
+            worker_connection.close()
+            self._connections.append(connection)
+            self._processes.append(process)
+
+        # Wait for every worker to build its search, rather than on the first move
+        for connection in self._connections:
+            connection.recv()
+
+        self._visits = {}
+
+    def stats(self):
+        """
+        Returns the counters for the most recent search
+        :return: dict
+        """
+        return {"playouts": self.playouts,
+                "workers": self._workers,
+                "root_visits": sum(self._visits.values())}
+
+    def search(self, mine, theirs):
+        """
+        Searches a position in every worker at once, and merges their root visit counts
+        :param mine: Bitmask of tiles taken by the side to move
+        :param theirs: Bitmask of tiles taken by the other side
+        """
+        self._position = (mine, theirs)
+        for connection in self._connections:
+            connection.send((mine, theirs, self._random.getrandbits(32)))
+
+        self._visits = {}
+        self.playouts = 0
+        for connection in self._connections:
+            visits, playouts = connection.recv()
+            self.playouts += playouts
+            for cell, count in visits.items():
+                self._visits[cell] = self._visits.get(cell, 0) + count
+
+    def best_cell(self):
+        """
+        Returns the move with the most visits summed over every worker
+        :return: int tile index
+        """
+        # If nothing was expanded (e.g. no budget), any legal move will do
+        if not self._visits:
+            return self._free_cells(self._position[0] | self._position[1])[0]
+        return max(self._visits, key=self._visits.get)
+
+    def root_visits(self):
+        """
+        Returns the visit count of every move from the root, summed over every worker
+        :return: dict of tile index: visits
+        """
+        return dict(self._visits)
+
+    def close(self):
+        """
+        Shuts down the worker processes
+        """
+        for connection, process in zip(self._connections, self._processes):
+            connection.send(None)
+            process.join()
+            connection.close()
+        self._connections = []
+        self._processes = []
@@ -0,0 +1,714 @@
+
+# Library imports
+import random
+import time
+
+# Project imports
+from board import Board, symmetry_tables
+from bitboard import win_masks
+
+
+# Custom exception classes
+class SearchStoppedException(Exception): pass
+
+
+# Score for a won position, from the point of view of the side that won
+WIN_SCORE = 1000000
+
+# Nodes between checks for a request to stop (while pondering, or against a deadline)
+STOP_CHECK_NODES = 1024
+
+
+class ZobristKeys(object):
+
+    def __init__(self, size, seed=0, symmetry=False):
+        """
+        Random 64 bit keys for every (side, tile) pair, plus one for the side to move. XORing together the
+        keys of every taken tile gives a position hash that can be updated incrementally, one XOR per move.
+        With symmetry enabled, a hash is kept for each of the board's 8 orientations, and the smallest is
+        the same for every rotation and reflection of a position.
+        :param size: Board size
+        :param seed: Seed for the key generator, so hashes are reproducible between runs
+        :param symmetry: Keep a hash per orientation?
+        """
+        rng = random.Random(seed)
+        keys = [[rng.getrandbits(64) for _ in range(size * size)] for _ in range(2)]
+        self.side = rng.getrandbits(64)
+
+        # Permutation tables of the orientations being hashed (just the identity without symmetry)
+        if symmetry:
+            self.tables, self.inverses = symmetry_tables(size)
+        else:
+            self.tables = self.inverses = (tuple(range(size * size)),)
+
+        # Tile keys per orientation. A tile's key in an orientation is the key of the tile it moves to.
+        self.tiles = [[[keys[side][cell] for cell in inverse] for side in range(2)] for inverse in self.inverses]
+
+    def hash_position(self, mine, theirs, side):
+        """
+        Computes the hashes of a position from scratch (use incremental updates wherever possible)
+        :param mine: Bitmask of tiles taken by the side to move
+        :param theirs: Bitmask of tiles taken by the other side
+        :param side: 0 or 1, which key set belongs to the side to move
+        :return: tuple of int, one hash per orientation
+        """
+        keys = []
+        for tiles in self.tiles:
+            key = self.side if side else 0
+            for cell in range(len(tiles[0])):
+                if mine >> cell & 1:
+                    key ^= tiles[side][cell]
+                elif theirs >> cell & 1:
+                    key ^= tiles[1 - side][cell]
+            keys.append(key)
+        return tuple(keys)
+
+
+class TranspositionTable(object):
+
+    # Replacement policies, for when two positions hash to the same slot
+    ALWAYS_REPLACE = 0
+    DEPTH_PREFERRED = 1
+
+    # Bound types for stored scores
+    EXACT = 0
+    LOWER_BOUND = 1
+    UPPER_BOUND = 2
+
+    def __init__(self, size=1 << 16, replacement=DEPTH_PREFERRED):
+        """
+        Fixed size hash table of searched positions, indexed by the low bits of the Zobrist hash
+        :param size: Number of slots (rounded up to a power of two)
+        :param replacement: Replacement policy (constants defined in class)
+        """
+        # Round the size up to a power of two, so the slot index is a single AND
+        self._mask = (1 << max(size - 1, 1).bit_length()) - 1
+        self._slots = [None] * (self._mask + 1)
+        self._replacement = replacement
+
+        # Counters
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.entries = 0
+
+    def __len__(self):
+        """
+        Returns the number of slots in the table
+        :return: int
+        """
+        return len(self._slots)
+
+    def probe(self, key):
+        """
+        Looks up a position
+        :param key: Zobrist hash of the position
+        :return: (key, depth, score, bound, move) tuple or None if not stored
+        """
+        self.probes += 1
+        entry = self._slots[key & self._mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        """
+        Stores a searched position, subject to the replacement policy
+        :param key: Zobrist hash of the position
+        :param depth: Remaining depth the position was searched to
+        :param score: Score found, from the point of view of the side to move
+        :param bound: TranspositionTable.EXACT, LOWER_BOUND or UPPER_BOUND
+        :param move: Best move found (tile index) or None
+        """
+        index = key & self._mask
+        current = self._slots[index]
+
+        # Keep a deeper search of a different position, if preferring depth
+        if (current is not None and current[0] != key and self._replacement == self.DEPTH_PREFERRED
+                and current[1] > depth):
+            return
+
+        if current is None:
+            self.entries += 1
+        self.stores += 1
+        self._slots[index] = (key, depth, score, bound, move)
+
+    def clear(self):
+        """
+        Empties the table, and resets its counters
+        """
+        self._slots = [None] * (self._mask + 1)
+        self.probes = self.hits = self.stores = self.entries = 0
+
+
+class NegamaxSearch(object):
+
+    def __init__(self, size, win_length=None, max_depth=None, table_size=1 << 16,
+                 replacement=TranspositionTable.DEPTH_PREFERRED, symmetry=False, seed=0):
+        """
+        Negamax search with alpha-beta pruning and a Zobrist hashed transposition table. Positions are held
+        as a pair of bitmasks (side to move, other side), so making a move is an OR and needs no copying.
+        :param size: Board size
+        :param win_length: Number of tiles in a row needed to win (defaults to size)
+        :param max_depth: Maximum plies to search (None searches to the end of the game)
+        :param table_size: Number of transposition table slots
+        :param replacement: Transposition table replacement policy
+        :param symmetry: Key the transposition table on the canonical (symmetry reduced) position?
+        :param seed: Seed for the Zobrist keys
+        """
+        self._size = size
+        self._cells = size * size
+        self._full_mask = (1 << self._cells) - 1
+        self._max_depth = max_depth
+
+        # Group the win masks by the tiles they cover, so a move only checks the lines through it
+        masks = win_masks(size, win_length)
+        self._cell_masks = [tuple(mask for mask in masks if mask >> cell & 1) for cell in range(self._cells)]
+
+        # Static move ordering, tiles on the most lines first (centre and diagonals on small boards)
+        self._ordering = sorted(range(self._cells), key=lambda cell: -len(self._cell_masks[cell]))
+
+        self.zobrist = ZobristKeys(size, seed, symmetry)
+        self.table = TranspositionTable(table_size, replacement)
+
+        # Counters for the most recent search
+        self.nodes = 0
+        self.cutoffs = 0
+
+        # Event that stops the search when set, while pondering
+        self._stop = None
+
+    def stats(self):
+        """
+        Returns the counters for the most recent search, and the table's running totals
+        :return: dict
+        """
+        return {"nodes": self.nodes,
+                "cutoffs": self.cutoffs,
+                "tt_probes": self.table.probes,
+                "tt_hits": self.table.hits,
+                "tt_entries": self.table.entries}
+
+    def best_move(self, board, value):
+        """
+        Searches the board's current position for the best move for the given side
+        :param board: Board (or BitBoard) instance
+        :param value: Side to move (Board.NOUGHT or Board.CROSS)
+        :return: (row, col) tuple, or None if there are no moves
+        """
+        mine, theirs = self.masks_of(board, value)
+        cell = self.search(mine, theirs, 0 if value == Board.NOUGHT else 1)[1]
+        return None if cell is None else divmod(cell, self._size)
+
+    def masks_of(self, board, value):
+        """
+        Reads a board into a pair of bitmasks
+        :param board: Board (or BitBoard) instance
+        :param value: Side to move (Board.NOUGHT or Board.CROSS)
+        :return: (mine, theirs) tuple of int
+        """
+        matrix = board.matrix_copy()
+        mine = theirs = 0
+        for cell in range(self._cells):
+            tile = matrix[divmod(cell, self._size)]
+            if tile == value:
+                mine |= 1 << cell
+            elif tile != Board.EMPTY:
+                theirs |= 1 << cell
+        return mine, theirs
+
+    def search(self, mine, theirs, side):
+        """
+        Searches a position
+        :param mine: Bitmask of tiles taken by the side to move
+        :param theirs: Bitmask of tiles taken by the other side
+        :param side: 0 or 1, which Zobrist key set belongs to the side to move (0 for noughts)
+        :return: (score, cell) tuple. Score is from the point of view of the side to move, cell is None
+                 if there are no moves.
+        """
+        self.nodes = 0
+        self.cutoffs = 0
+
+        # Search to the end of the game, unless limited
+        depth = self._cells if self._max_depth is None else self._max_depth
+        keys = self.zobrist.hash_position(mine, theirs, side)
+        return self._negamax(mine, theirs, side, keys, depth, -WIN_SCORE - 1, WIN_SCORE + 1)
+
+    def ponder(self, mine, theirs, side, stop):
+        """
+        Searches ahead during the opponent's turn, filling the transposition table so the search after their
+        actual move finds its result there. Searches the position itself first, which finds the opponent's
+        best reply and the answer to it, then each of their other replies in turn. Only ever touches the
+        bitmasks, never a Board, so it can run in a background thread.
+        :param mine: Bitmask of tiles taken by the opponent (the side to move)
+        :param theirs: Bitmask of tiles taken by this side
+        :param side: 0 or 1, Zobrist key set of the opponent
+        :param stop: threading.Event, stops pondering as soon as it is set
+        """
+        self._stop = stop
+        try:
+            self.search(mine, theirs, side)
+            free = self._full_mask & ~(mine | theirs)
+            for cell in self._ordering:
+                if stop.is_set():
+                    break
+
+                # Replies that win end the game, so there is nothing to answer
+                if free >> cell & 1 and not self._wins(mine | (1 << cell), cell):
+                    self.search(theirs, mine | (1 << cell), 1 - side)
+        except SearchStoppedException:
+            pass
+        finally:
+            self._stop = None
+
+    def _stopped(self):
+        """
+        Checks if the search has been asked to stop
+        :return: bool
+        """
+        return self._stop is not None and self._stop.is_set()
+
+    def _wins(self, bits, cell):
+        """
+        Checks if the side owning bits has completed a line through cell
+        :param bits: Bitmask of the side's tiles
+        :param cell: Tile index just taken
+        :return: bool
+        """
+        for mask in self._cell_masks[cell]:
+            if bits & mask == mask:
+                return True
+        return False
+
+    def _negamax(self, mine, theirs, side, keys, depth, alpha, beta):
+        """
+        Recursive alpha-beta search
+        :param mine: Bitmask of tiles taken by the side to move
+        :param theirs: Bitmask of tiles taken by the other side
+        :param side: 0 or 1, Zobrist key set of the side to move
+        :param keys: Zobrist hashes of the position, one per orientation
+        :param depth: Remaining plies to search
+        :param alpha: Lower bound of the search window
+        :param beta: Upper bound of the search window
+        :return: (score, cell) tuple
+        """
+        self.nodes += 1
+
+        # Give up if pondering has been stopped. Results already in the table are for fully searched
+        # positions, so they stay valid.
+        if not self.nodes % STOP_CHECK_NODES and self._stopped():
+            raise SearchStoppedException()
+
+        # No tiles left is a draw, and running out of depth scores as unknown (also 0)
+        free = self._full_mask & ~(mine | theirs)
+        if not free or depth == 0:
+            return 0, None
+
+        # The table is keyed on the smallest hash, and stores moves in that orientation
+        key = min(keys)
+        transform = keys.index(key)
+        table, inverse = self.zobrist.tables[transform], self.zobrist.inverses[transform]
+
+        # Use the stored result if it was searched deep enough, otherwise just try its best move first
+        original_alpha = alpha
+        hash_move = None
+        entry = self.table.probe(key)
+        if entry is not None:
+            hash_move = table[entry[4]]
+            _, entry_depth, entry_score, bound, _ = entry
+            if entry_depth >= depth:
+                if bound == TranspositionTable.EXACT:
+                    return entry_score, hash_move
+                elif bound == TranspositionTable.LOWER_BOUND:
+                    alpha = max(alpha, entry_score)
+                else:
+                    beta = min(beta, entry_score)
+                if alpha >= beta:
+                    return entry_score, hash_move
+
+        # Order moves, with the hash move first
+        moves = [cell for cell in self._ordering if free >> cell & 1]
+        if hash_move is not None and free >> hash_move & 1:
+            moves.remove(hash_move)
+            moves.insert(0, hash_move)
+
+        # Winning straight away is the best there is, no need to search further
+        for cell in moves:
+            if self._wins(mine | (1 << cell), cell):
+                self.table.store(key, depth, WIN_SCORE, TranspositionTable.EXACT, inverse[cell])
+                return WIN_SCORE, cell
+
+        orientations = tuple(enumerate(self.zobrist.tiles))
+        side_key = self.zobrist.side
+        best_score, best_cell = -WIN_SCORE - 1, None
+        for cell in moves:
+            child_mine = mine | (1 << cell)
+
+            # Search the reply, from the other side's point of view
+            child_keys = tuple(keys[index] ^ tiles[side][cell] ^ side_key for index, tiles in orientations)
+            score = -self._negamax(theirs, child_mine, 1 - side, child_keys, depth - 1, -beta, -alpha)[0]
+
+            if score > best_score:
+                best_score, best_cell = score, cell
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                self.cutoffs += 1
+                break
+
+        # Store the result, with the bound it represents given the window it was searched with
+        if best_score <= original_alpha:
+            bound = TranspositionTable.UPPER_BOUND
+        elif best_score >= beta:
+            bound = TranspositionTable.LOWER_BOUND
+        else:
+            bound = TranspositionTable.EXACT
+        self.table.store(key, depth, best_score, bound, inverse[best_cell])
+
+        return best_score, best_cell
+
+
+class SearchStats(object):
+
+    def __init__(self):
+        """
+        Counters for one iterative deepening search
+        """
+        self.depth = 0
+        self.nodes = 0
+        self.cutoffs = 0
+        self.score = 0
+        self.elapsed = 0.0
+        self.principal_variation = []
+
+    @property
+    def nodes_per_sec(self):
+        """
+        Search speed
+        :return: float
+        """
+        return self.nodes / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        """
+        Returns the counters as a dict, e.g. for JSON
+        :return: dict
+        """
+        return {"depth": self.depth,
+                "nodes": self.nodes,
+                "cutoffs": self.cutoffs,
+                "score": self.score,
+                "elapsed": self.elapsed,
+                "nodes_per_sec": self.nodes_per_sec,
+                "principal_variation": list(self.principal_variation)}
+
+
+class IterativeDeepeningSearch(NegamaxSearch):
+
+    # Move ordering priorities, highest first. Moves with none of these are ordered by history score.
+    PV_PRIORITY = 1 << 40
+    HASH_PRIORITY = 1 << 39
+    THREAT_PRIORITY = 1 << 36
+    KILLER_PRIORITY = 1 << 32
+
+    def __init__(self, size, win_length=None, time_limit=None, max_depth=None, table_size=1 << 20,
+                 replacement=TranspositionTable.DEPTH_PREFERRED, symmetry=False, seed=0):
+        """
+        Iterative deepening negamax under a per move time limit, for boards too big to search to the end.
+        Each iteration searches one ply deeper, trying the previous iteration's principal variation first,
+        then the transposition table move, moves that make a threat (all but one tile of a line), killer
+        moves and finally the history heuristic. When the opponent threatens to win, only the blocking
+        moves are searched. Positions at the depth limit are scored by counting open lines.
+        :param size: Board size
+        :param win_length: Number of tiles in a row needed to win (defaults to size)
+        :param time_limit: Seconds to search per move (None for no time limit)
+        :param max_depth: Deepest iteration (None to go on until the end of the game)
+        :param table_size: Number of transposition table slots
+        :param replacement: Transposition table replacement policy
+        :param symmetry: Key the transposition table on the canonical (symmetry reduced) position?
+        :param seed: Seed for the Zobrist keys
+        """
+        super(IterativeDeepeningSearch, self).__init__(size, win_length, max_depth, table_size, replacement,
+                                                       symmetry, seed)
+
+        # Fall back to a one second budget if there isn't any other
+        if time_limit is None and max_depth is None:
+            time_limit = 1.0
+        self._time_limit = time_limit
+        self._deadline = None
+
+        # Open lines are scored by how many tiles they have. The weights grow fast enough that one line
+        # nearer completion outweighs several further away, and stay below a win however many lines there are.
+        self._masks = win_masks(size, win_length)
+        self._win_length = bin(self._masks[0]).count("1")
+        self._weights = [4 ** tiles for tiles in range(self._win_length + 1)]
+        self._max_evaluation = WIN_SCORE - 1
+
+        # Killer moves (two per ply) and history scores (per side, per tile)
+        self._killers = []
+        self._history = [[0] * self._cells, [0] * self._cells]
+
+        self.search_stats = SearchStats()
+
+    def stats(self):
+        """
+        Returns the counters for the most recent search, and the table's running totals
+        :return: dict
+        """
+        stats = self.search_stats.as_dict()
+        stats.update(tt_probes=self.table.probes, tt_hits=self.table.hits, tt_entries=self.table.entries)
+        return stats
+
+    def search(self, mine, theirs, side):
+        """
+        Searches a position one ply deeper at a time, until the time runs out, a forced result is found, or
+        the game's end (or max_depth) is reached. An iteration cut short by the deadline is thrown away.
+        :param mine: Bitmask of tiles taken by the side to move
+        :param theirs: Bitmask of tiles taken by the other side
+        :param side: 0 or 1, which Zobrist key set belongs to the side to move (0 for noughts)
+        :return: (score, cell) tuple from the deepest complete iteration. Score is from the point of view of
+                 the side to move, cell is None if there are no moves.
+        """
+        stats = self.search_stats = SearchStats()
+        self.nodes = self.cutoffs = 0
+        start = time.time()
+        self._deadline = None if self._time_limit is None else start + self._time_limit
+
+        # Killers only apply to this search, history carries over but fades
+        free = self._full_mask & ~(mine | theirs)
+        self._killers = [[None, None] for _ in range(self._cells + 1)]
+        for history in self._history:
+            for cell in range(self._cells):
+                history[cell] >>= 1
+
+        # Any legal move is better than none, if even the first iteration doesn't finish
+        best = (0, next((cell for cell in self._ordering if free >> cell & 1), None))
+        free_count = bin(free).count("1")
+        max_depth = free_count if self._max_depth is None else min(self._max_depth, free_count)
+        keys = self.zobrist.hash_position(mine, theirs, side)
+
+        principal_variation = ()
+        for depth in range(1, max_depth + 1):
+            try:
+                best = self._search_node(mine, theirs, side, keys, depth, -WIN_SCORE - 1, WIN_SCORE + 1, 0,
+                                         principal_variation)
+            except SearchStoppedException:
+                break
+            principal_variation = self._principal_variation(mine, theirs, side, keys, depth)
+            stats.depth = depth
+
+            # A forced win or loss won't change with more depth
+            if abs(best[0]) >= WIN_SCORE:
+                break
+
+        self._deadline = None
+        stats.nodes, stats.cutoffs, stats.score = self.nodes, self.cutoffs, best[0]
+        stats.elapsed = time.time() - start
+        stats.principal_variation = list(principal_variation)
+        return best
+
+    def _stopped(self):
+        """
+        Checks if the search has been asked to stop, or has run out of time
+        :return: bool
+        """
+        if super(IterativeDeepeningSearch, self)._stopped():
+            return True
+        return self._deadline is not None and time.time() >= self._deadline
+
+    def _search_node(self, mine, theirs, side, keys, depth, alpha, beta, ply, principal_variation):
+        """
+        Recursive alpha-beta search, with heuristic move ordering
+        :param mine: Bitmask of tiles taken by the side to move
+        :param theirs: Bitmask of tiles taken by the other side
+        :param side: 0 or 1, Zobrist key set of the side to move
+        :param keys: Zobrist hashes of the position, one per orientation
+        :param depth: Remaining plies to search
+        :param alpha: Lower bound of the search window
+        :param beta: Upper bound of the search window
+        :param ply: Plies from the root
+        :param principal_variation: Previous iteration's best line of tile indices, if this node is on it
+                                    (empty otherwise)
+        :return: (score, cell) tuple
+        :raises SearchStoppedException if the search runs out of time
+        """
+        self.nodes += 1
+        if not self.nodes % STOP_CHECK_NODES and self._stopped():
+            raise SearchStoppedException()
+
+        # No tiles left is a draw, and the depth limit is scored by the open lines
+        free = self._full_mask & ~(mine | theirs)
+        if not free:
+            return 0, None
+        if depth == 0:
+            return self._evaluate(mine, theirs), None
+
+        # The table is keyed on the smallest hash, and stores moves in that orientation
+        key = min(keys)
+        transform = keys.index(key)
+        table, inverse = self.zobrist.tables[transform], self.zobrist.inverses[transform]
+
+        # Use the stored result if it was searched deep enough, otherwise just try its best move early
+        original_alpha = alpha
+        hash_move = None
+        entry = self.table.probe(key)
+        if entry is not None:
+            hash_move = table[entry[4]]
+            _, entry_depth, entry_score, bound, _ = entry
+            if entry_depth >= depth and not principal_variation:
+                if bound == TranspositionTable.EXACT:
+                    return entry_score, hash_move
+                elif bound == TranspositionTable.LOWER_BOUND:
+                    alpha = max(alpha, entry_score)
+                else:
+                    beta = min(beta, entry_score)
+                if alpha >= beta:
+                    return entry_score, hash_move
+
+        # Winning straight away is the best there is, no need to search further
+        moves = [cell for cell in self._ordering if free >> cell & 1]
+        for cell in moves:
+            if self._wins(mine | (1 << cell), cell):
+                self.table.store(key, depth, WIN_SCORE, TranspositionTable.EXACT, inverse[cell])
+                return WIN_SCORE, cell
+
+        pv_move = principal_variation[ply] if ply < len(principal_variation) else None
+        moves = self._order_moves(mine, theirs, side, moves, depth, ply, hash_move, pv_move)
+
+        orientations = tuple(enumerate(self.zobrist.tiles))
+        side_key = self.zobrist.side
+        best_score, best_cell = -WIN_SCORE - 1, None
+        for cell in moves:
+            child_mine = mine | (1 << cell)
+
+            # Search the reply, from the other side's point of view (still on the principal variation if
+            # this is its move)
+            child_keys = tuple(keys[index] ^ tiles[side][cell] ^ side_key for index, tiles in orientations)
+            score = -self._search_node(theirs, child_mine, 1 - side, child_keys, depth - 1, -beta, -alpha,
+                                       ply + 1, principal_variation if cell == pv_move else ())[0]
+
+            if score > best_score:
+                best_score, best_cell = score, cell
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                self.cutoffs += 1
+
+                # Remember the move that caused the cutoff, for sibling positions at this ply and the history
+                killers = self._killers[ply]
+                if killers[0] != cell:
+                    killers[1] = killers[0]
+                    killers[0] = cell
+                self._history[side][cell] += depth * depth
+                break
+
+        # Store the result, with the bound it represents given the window it was searched with
+        if best_score <= original_alpha:
+            bound = TranspositionTable.UPPER_BOUND
+        elif best_score >= beta:
+            bound = TranspositionTable.LOWER_BOUND
+        else:
+            bound = TranspositionTable.EXACT
+        self.table.store(key, depth, best_score, bound, inverse[best_cell])
+
+        return best_score, best_cell
+
+    def _order_moves(self, mine, theirs, side, moves, depth, ply, hash_move, pv_move):
+        """
+        Orders a node's moves, best first
+        :param mine: Bitmask of tiles taken by the side to move
+        :param theirs: Bitmask of tiles taken by the other side
+        :param side: 0 or 1, the side to move
+        :param moves: Free tile indices, in static order
+        :param depth: Remaining plies to search
+        :param ply: Plies from the root
+        :param hash_move: Transposition table move (or None)
+        :param pv_move: Principal variation move (or None)
+        :return: list of tile indices
+        """
+        # If the other side is about to win, only blocking them can help
+        blocks = [cell for cell in moves if self._wins(theirs | (1 << cell), cell)]
+        if blocks:
+            return blocks
+
+        killers = self._killers[ply]
+        history = self._history[side]
+        priorities = {}
+        for cell in moves:
+            priority = history[cell]
+            if cell == pv_move:
+                priority += self.PV_PRIORITY
+            if cell == hash_move:
+                priority += self.HASH_PRIORITY
+            if cell in killers:
+                priority += self.KILLER_PRIORITY
+
+            # Threats are only worth spotting away from the leaves, where the search is big enough to gain
+            if depth > 1:
+                priority += self.THREAT_PRIORITY * self._threats(mine | (1 << cell), theirs, cell)
+            priorities[cell] = priority
+
+        # Python's sort is stable, so ties keep the static order
+        return sorted(moves, key=priorities.get, reverse=True)
+
+    def _threats(self, bits, other_bits, cell):
+        """
+        Counts the lines through cell that are one tile from complete, and not blocked
+        :param bits: Bitmask of the side's tiles
+        :param other_bits: Bitmask of the other side's tiles
+        :param cell: Tile index just taken
+        :return: int
+        """
+        threats = 0
+        for mask in self._cell_masks[cell]:
+            if not other_bits & mask and bin(bits & mask).count("1") == self._win_length - 1:
+                threats += 1
+        return threats
+
+    def _evaluate(self, mine, theirs):
+        """
+        Scores a position at the depth limit, from the side to move's point of view. Each line only one
+        side has tiles in scores for them, more the fuller it is.
+        :param mine: Bitmask of tiles taken by the side to move
+        :param theirs: Bitmask of tiles taken by the other side
+        :return: int
+        """
+        weights = self._weights
+        score = 0
+        for mask in self._masks:
+            if mine & mask:
+                if not theirs & mask:
+                    score += weights[bin(mine & mask).count("1")]
+            elif theirs & mask:
+                score -= weights[bin(theirs & mask).count("1")]
+        return max(-self._max_evaluation, min(self._max_evaluation, score))
+
+    def _principal_variation(self, mine, theirs, side, keys, depth):
+        """
+        Reads the best line found back out of the transposition table
+        :param mine: Bitmask of tiles taken by the side to move
+        :param theirs: Bitmask of tiles taken by the other side
+        :param side: 0 or 1, Zobrist key set of the side to move
+        :param keys: Zobrist hashes of the position, one per orientation
+        :param depth: Longest line to read
+        :return: tuple of tile indices
+        """
+        line = []
+        orientations = tuple(enumerate(self.zobrist.tiles))
+        for _ in range(depth):
+            key = min(keys)
+            entry = self.table.probe(key)
+            if entry is None:
+                break
+            cell = self.zobrist.tables[keys.index(key)][entry[4]]
+            if (mine | theirs) >> cell & 1:
+                break
+            line.append(cell)
+
+            # Stop after a winning move, the game is over
+            if self._wins(mine | (1 << cell), cell):
+                break
+            keys = tuple(keys[index] ^ tiles[side][cell] ^ self.zobrist.side for index, tiles in orientations)
+            mine, theirs, side = theirs, mine | (1 << cell), 1 - side
+        return tuple(line)
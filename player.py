@@ -1,9 +1,20 @@
 
 # Library imports
+import os
 import random
 
 # Project imports
 from board import IndexOutOfBoundsException, NotEmptyException
+from negamax import NegamaxSearch, IterativeDeepeningSearch, TranspositionTable
+from mcts import MctsSearch, ParallelMctsSearch
+from ponder import Ponderer
+from sparse_board import SparseBoard
+from threat_search import ThreatSpaceSearch
+from lazy_import import lazy_import
+import solved_table
+
+# The tablebase module (and the numpy it uses) is only imported for the tablebase algorithm
+tablebase = lazy_import("tablebase")
 
 
 class Player(object):
@@ -52,6 +63,19 @@ class Player(object):
         """
         raise NotImplemented
 
+    def stop_pondering(self):
+        """
+        Stops thinking during the opponent's turn (only AI players ponder, so by default there is nothing
+        to stop)
+        """
+        pass
+
+    def close(self):
+        """
+        Releases anything the player holds once its game is over (stops pondering, by default)
+        """
+        self.stop_pondering()
+
 
 class HumanPlayer(Player):
 
@@ -67,13 +91,14 @@ class HumanPlayer(Player):
     def make_move(self):
         """
         Ask user for player move over console, and do it
+        :return: (row, col) tuple of the move made
         """
 
         # Loop forever (or until a valid move is made)
         while True:
 
             # Ask user for a move
-            user_str = raw_input("Enter move, human (row col)")
+            user_str = input("Enter move, human (row col)")
             user_inputs = user_str.strip(" ").split(" ")
 
             # If the user response doesn't split into two values, tell them to try again
@@ -100,60 +125,153 @@ class HumanPlayer(Player):
                 except NotEmptyException:
                     print("Tile is already taken. Try again, stupid human.")
 
-                # Valid move made, lets break the loop
+                # Valid move made, lets return it
                 else:
-                    break
+                    return row, col
 
 
 class AiPlayer(Player):
 
     RANDOM_ALGORITHM = 0
     RANDOM_DEFENSIVE_ALGORITHM = 1
-
-    def __init__(self, board, is_nought, name="HAL9000", algorithm=RANDOM_ALGORITHM):
+    NEGAMAX_ALGORITHM = 2
+    SOLVED_TABLE_ALGORITHM = 3
+    TABLEBASE_ALGORITHM = 4
+    MCTS_ALGORITHM = 5
+    ITERATIVE_DEEPENING_ALGORITHM = 6
+    THREAT_SPACE_ALGORITHM = 7
+
+    def __init__(self, board, is_nought, name="HAL9000", algorithm=RANDOM_ALGORITHM, search_depth=None,
+                 table_size=1 << 16, table_replacement=TranspositionTable.DEPTH_PREFERRED, symmetry=True,
+                 table_path=None, time_limit=None, playouts=None, workers=None, seed=None, ponder=False,
+                 ponder_limit=60.0):
         """
         AI player. Uses different algorithms to calculate next turn.
         :param board: ref to the game's Board instance
         :param is_nought: Playing as noughts?
         :param name: Name of player
         :param algorithm: Algorithm to use (constants defined in class for algorithm type)
+        :param search_depth: Maximum plies to search ahead, for search algorithms (None for no limit). For
+                             threat space search, the most attacker moves in a sequence of fours.
+        :param table_size: Number of transposition table slots, for search algorithms
+        :param table_replacement: Transposition table replacement policy (constants in TranspositionTable)
+        :param symmetry: Cache positions once for all their rotations and reflections, for search algorithms
+        :param table_path: Table file, for the solved table (built if missing) and tablebase algorithms. Defaults
+                           to the default location of the algorithm's table (for the solved table, only on 3x3).
+        :param time_limit: Seconds to think per move, for anytime algorithms (MCTS, iterative deepening,
+                           threat space search)
+        :param playouts: Playouts per move, for MCTS (one second per move if neither budget is given)
+        :param workers: Worker processes for root parallel MCTS (None or 1 searches in this process)
+        :param seed: Seed for this player's random number generator, for reproducible games (None to seed
+                     from the system)
+        :param ponder: Keep searching in a background thread during the opponent's turn, for negamax and
+                       single process MCTS
+        :param ponder_limit: Seconds to ponder for at most, per opponent turn (None for no limit)
+        :raises ValueError if pondering is asked for with an algorithm that can't ponder, or the solved table
+                algorithm has no table_path on a board other than 3x3
         """
         super(AiPlayer, self).__init__(board=board, is_nought=is_nought, name=name)
+        self._random = random.Random(seed)
         self._algorithm_choice = algorithm
         self._algorithms = {self.RANDOM_ALGORITHM: self._random_algorithm,
-                            self.RANDOM_DEFENSIVE_ALGORITHM: self._random_defensive_algorithm}
+                            self.RANDOM_DEFENSIVE_ALGORITHM: self._random_defensive_algorithm,
+                            self.NEGAMAX_ALGORITHM: self._search_algorithm,
+                            self.SOLVED_TABLE_ALGORITHM: self._solved_table_algorithm,
+                            self.TABLEBASE_ALGORITHM: self._tablebase_algorithm,
+                            self.MCTS_ALGORITHM: self._search_algorithm,
+                            self.ITERATIVE_DEEPENING_ALGORITHM: self._search_algorithm,
+                            self.THREAT_SPACE_ALGORITHM: self._search_algorithm}
+
+        # Search algorithms keep their search (and its transposition table) between moves
+        self._search = None
+        if algorithm == self.NEGAMAX_ALGORITHM:
+            self._search = NegamaxSearch(board.size, board.win_length, max_depth=search_depth,
+                                         table_size=table_size, replacement=table_replacement,
+                                         symmetry=symmetry)
+        elif algorithm == self.ITERATIVE_DEEPENING_ALGORITHM:
+            self._search = IterativeDeepeningSearch(board.size, board.win_length, time_limit=time_limit,
+                                                    max_depth=search_depth, table_size=table_size,
+                                                    replacement=table_replacement, symmetry=symmetry)
+        elif algorithm == self.THREAT_SPACE_ALGORITHM:
+            self._search = ThreatSpaceSearch(board.size, board.win_length, time_limit=time_limit,
+                                             vcf_depth=12 if search_depth is None else search_depth)
+        elif algorithm == self.MCTS_ALGORITHM and workers is not None and workers > 1:
+            self._search = ParallelMctsSearch(board.size, board.win_length, time_limit=time_limit,
+                                              playouts=playouts, seed=seed, workers=workers)
+        elif algorithm == self.MCTS_ALGORITHM:
+            self._search = MctsSearch(board.size, board.win_length, time_limit=time_limit, playouts=playouts,
+                                      seed=seed)
+
+        # Pondering runs the search in a background thread, on a snapshot of the position
+        self._ponderer = None
+        if ponder:
+            if self._search is None or isinstance(self._search, (ParallelMctsSearch, ThreatSpaceSearch)):
+                raise ValueError("algorithm:{}, workers:{} - pondering needs negamax or single process MCTS".format(
+                    algorithm, workers))
+            self._ponderer = Ponderer(self._search, ponder_limit)
+
+        # The solved table algorithm maps its table at startup, building it first if it doesn't exist yet. The
+        # default table is the 3x3 one, so other games must name their own file (and take their time to build).
+        self._solved_table = None
+        if algorithm == self.SOLVED_TABLE_ALGORITHM:
+            if table_path is None and (board.size, board.win_length) != (3, 3):
+                raise ValueError("size:{}, win_length:{} - the default solved table is 3x3, pass a table_path".format(
+                    board.size, board.win_length))
+            table_path = solved_table.DEFAULT_PATH if table_path is None else table_path
+            if not os.path.exists(table_path):
+                solved_table.build(table_path, board.size, board.win_length)
+            self._solved_table = solved_table.SolvedTable.load(table_path)
+
+        # The tablebase algorithm maps its tablebase at startup (build it with tablebase.py)
+        elif algorithm == self.TABLEBASE_ALGORITHM:
+            self._solved_table = tablebase.Tablebase.load(tablebase.DEFAULT_PATH if table_path is None
+                                                          else table_path)
+
+        # Raise exception if the table was solved for a different game
+        table = self._solved_table
+        if table is not None and (table.size, table.win_length) != (board.size, board.win_length):
+            raise ValueError("table size:{}, win_length:{} - board size:{}, win_length:{}".format(
+                table.size, table.win_length, board.size, board.win_length))
+
+    @property
+    def stats(self):
+        """
+        Returns the search counters (nodes searched, cache hits etc) from the last move, if the algorithm
+        reports any
+        :return: dict
+        """
+        return self._search.stats() if self._search else {}
+
+    @property
+    def progress(self):
+        """
+        Returns how much work the current (or last) search has done so far: nodes searched, or playouts for
+        MCTS. Counters are plain ints, so it can be read from another thread while the search runs.
+        :return: int
+        """
+        if self._search is None:
+            return 0
+        return getattr(self._search, "nodes", None) or getattr(self._search, "playouts", 0)
 
     def make_move(self):
         """
         Makes a move using the algorithm specified at initialisation
+        :return: (row, col) tuple of the move made
         """
-        self._algorithms[self._algorithm_choice]()
+        return self._algorithms[self._algorithm_choice]()
 
     def _random_algorithm(self):
         """
-        Entirely random move choice. Keeps randomly trying moves until it makes a legal one
+        Entirely random move choice, picked uniformly from the board's free tiles. An unbounded board has
+        no end of free tiles, so the move is picked from the candidate tiles near taken ones instead.
         """
-        # Loop forever (or until a valid move is found)
-        while True:
-
-            # Get random tile row/col position
-            row = random.randrange(0, self._board.size)
-            col = random.randrange(0, self._board.size)
-
-            # Try to make the random move
-            try:
-                self.set_tile(row, col)
-
-            # Catch not empty exception, and ignore
-            except NotEmptyException:
-                pass
-
-            # We found a valid move, break the loop
-            else:
-                break
-
-        # Return the move
-        return row, col
+        if self._board.size is None:
+            candidates = self._board.candidate_tiles()
+            move = candidates[self._random.randrange(len(candidates))]
+        else:
+            move = self._board.random_empty_tile(self._random)
+        self.set_tile(*move)
+        return move
 
     def _random_defensive_algorithm(self):
         """
@@ -178,19 +296,79 @@ class AiPlayer(Player):
         # Fetch the enemy player type (if we're noughts, they must be crosses)
         enemy = self._board.CROSS if self.is_nought else self._board.NOUGHT
 
+        # A sparse board keeps track of the tiles each side would win at, rather than trying every empty tile
+        if isinstance(self._board, SparseBoard):
+            winning_tiles = self._board.winning_tiles(enemy)
+            return winning_tiles[0] if winning_tiles else None
+
         # Iterate through all empty tiles
         for row, col in self._board.list_empty_tiles():
 
-            # Grab a clean copy of the board matrix
-            matrix = self._board.matrix_copy()
-
-            # Set the tile as an enemy tile
-            self._board.set_tile(row, col, enemy, matrix)
+            # Try the tile as an enemy tile, see if the enemy would now win, then undo it
+            self._board.push(row, col, enemy)
+            enemy_wins = self._board.is_won() == enemy
+            self._board.pop()
 
-            # Can the enemy now win?
-            if self._board.is_won(matrix) == enemy:
+            # Can the enemy win there?
+            if enemy_wins:
                 return row, col
 
         # If we get here, the enemy is not one turn away from winning, return None
         return None
 
+    def _search_algorithm(self):
+        """
+        Searches for the best move (negamax with alpha-beta pruning, iterative deepening, MCTS or threat
+        space search), and takes it
+        """
+        # The search is shared with the pondering thread, so stop that first
+        self.stop_pondering()
+        move = self._search.best_move(self._board, self._set_val)
+        self.set_tile(*move)
+
+        # Ponder the opponent's turn, handing the thread the position rather than the Board
+        if self._ponderer is not None and not (self._board.is_won() or self._board.is_full()):
+            enemy = self._board.CROSS if self.is_nought else self._board.NOUGHT
+            mine, theirs = self._search.masks_of(self._board, enemy)
+            self._ponderer.start(mine, theirs, 0 if enemy == self._board.NOUGHT else 1)
+        return move
+
+    def stop_pondering(self):
+        """
+        Stops thinking during the opponent's turn, waiting for the background search to finish
+        """
+        if self._ponderer is not None:
+            self._ponderer.stop()
+
+    def close(self):
+        """
+        Stops pondering, and shuts down any worker processes the search started. The player can't search
+        again afterwards.
+        """
+        self.stop_pondering()
+        if isinstance(self._search, ParallelMctsSearch):
+            self._search.close()
+
+    def _solved_table_algorithm(self):
+        """
+        Looks up the best move in the solved position table, and takes it
+        """
+        tiles = solved_table.relative_tiles(self._board.matrix_copy(), self._board.size, self._set_val)
+        cell = self._solved_table.lookup(tiles)[1]
+
+        # Positions the table doesn't cover can't come up in a real game, but play defensively if they do
+        if cell is None:
+            return self._random_defensive_algorithm()
+
+        move = divmod(cell, self._board.size)
+        self.set_tile(*move)
+        return move
+
+    def _tablebase_algorithm(self):
+        """
+        Looks up the value of every move in the tablebase, and takes the best
+        """
+        tiles = solved_table.relative_tiles(self._board.matrix_copy(), self._board.size, self._set_val)
+        move = divmod(self._solved_table.best_move(tiles)[1], self._board.size)
+        self.set_tile(*move)
+        return move
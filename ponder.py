@@ -0,0 +1,62 @@
+
+# Library imports
+import threading
+
+
+class Ponderer(object):
+
+    def __init__(self, search, time_limit=None):
+        """
+        Runs a search's ponder method in a background thread during the opponent's turn. The thread is
+        given the position as bitmasks, and never touches the Board. The search object is shared, so the
+        owner must call stop (which waits for the thread) before searching with it again.
+        :param search: NegamaxSearch or MctsSearch instance
+        :param time_limit: Seconds to ponder for at most (None to ponder until stopped)
+        """
+        self._search = search
+        self._time_limit = time_limit
+        self._stop = None
+        self._timer = None
+        self._thread = None
+
+    @property
+    def is_pondering(self):
+        """
+        Is the background search running?
+        :return: bool
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, mine, theirs, side):
+        """
+        Starts pondering a position, stopping any pondering already running first
+        :param mine: Bitmask of tiles taken by the opponent (the side to move)
+        :param theirs: Bitmask of tiles taken by this side
+        :param side: 0 or 1, which side the opponent is (0 for noughts)
+        """
+        self.stop()
+        self._stop = threading.Event()
+
+        # Stop on our own once the time limit is up
+        if self._time_limit is not None:
+            self._timer = threading.Timer(self._time_limit, self._stop.set)
+            self._timer.daemon = True
+            self._timer.start()
+
+        # Daemon thread, so a program exiting mid ponder doesn't wait for it
+        self._thread = threading.Thread(target=self._search.ponder, args=(mine, theirs, side, self._stop),
+                                        name="ponder")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops pondering, and waits for the background search to finish with the search object
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        if self._timer is not None:
+            self._timer.cancel()
+        self._thread.join()
+        self._thread = self._timer = self._stop = None
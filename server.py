@@ -0,0 +1,454 @@
+
+# Library imports
+import argparse
+import asyncio
+import functools
+import itertools
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Project imports
+from board import IndexOutOfBoundsException, NotEmptyException
+from bitboard import new_board
+from game import Game
+from player import AiPlayer
+from solved_table import CorruptTableException
+from lazy_import import lazy_import
+
+# The tablebase module (and the numpy it uses) is only imported to check games asking for the tablebase AI
+tablebase = lazy_import("tablebase")
+
+
+# AiPlayer options clients may set for their opponent, and the algorithms they may pick
+AI_OPTIONS = ("algorithm", "search_depth", "time_limit", "playouts", "symmetry", "seed")
+AI_ALGORITHMS = (AiPlayer.RANDOM_ALGORITHM, AiPlayer.RANDOM_DEFENSIVE_ALGORITHM, AiPlayer.NEGAMAX_ALGORITHM,
+                 AiPlayer.SOLVED_TABLE_ALGORITHM, AiPlayer.TABLEBASE_ALGORITHM, AiPlayer.MCTS_ALGORITHM,
+                 AiPlayer.ITERATIVE_DEEPENING_ALGORITHM, AiPlayer.THREAT_SPACE_ALGORITHM)
+
+# Most games held at once, biggest board allowed, and longest request line accepted
+MAX_SESSIONS = 10000
+MAX_SIZE = 50
+MAX_LINE = 1 << 16
+
+# Most seconds, playouts and plies an AI may be given per move. Plain negamax has no clock, so it is only
+# allowed on small boards, and only searches to the end of the game on 3x3.
+MAX_TIME_LIMIT = 10.0
+MAX_PLAYOUTS = 100000
+MAX_SEARCH_DEPTH = 12
+NEGAMAX_MAX_SIZE = 4
+FULL_SEARCH_MAX_SIZE = 3
+
+
+# Custom exception classes
+class RequestException(Exception): pass
+
+
+logger = logging.getLogger(__name__)
+
+
+def _worker_move(size, win_length, options, moves, is_nought):
+    """
+    Process pool worker, rebuilds a position and picks the AI's move on it. The AI starts afresh each
+    move, so searches don't keep their tables or trees between moves in process mode.
+    :param size: Board size
+    :param win_length: Number of tiles in a row needed to win
+    :param options: Dict of AiPlayer options
+    :param moves: List of (row, col, value) tuples played so far
+    :param is_nought: AI plays noughts?
+    :return: (row, col) tuple
+    """
+    board = new_board(size, win_length)
+    for row, col, value in moves:
+        board.push(row, col, value)
+    player = AiPlayer(board, is_nought, **options)
+    return player.make_move()
+
+
+class Session(object):
+
+    def __init__(self, game_id, game, ai_options):
+        """
+        One game being played on the server, a human (noughts) against an AI (crosses)
+        :param game_id: Session id
+        :param game: Game instance
+        :param ai_options: Dict of the AI's AiPlayer options
+        """
+        self.game_id = game_id
+        self.game = game
+        self.ai_options = ai_options
+
+        # Requests for the same game wait their turn, so the AI never moves while another request reads
+        # or changes the board
+        self.lock = asyncio.Lock()
+
+    def summary(self, board=False):
+        """
+        Describes the game's state for a response
+        :param board: Include the board matrix?
+        :return: dict
+        """
+        winner = self.game.winning_player
+        summary = {"game": self.game_id,
+                   "winner": None if winner is None else "nought" if winner.is_nought else "cross",
+                   "finished": bool(self.game.is_finished())}
+        if board:
+            summary["board"] = self.game.board.matrix_copy().tolist()
+        return summary
+
+
+class GameServer(object):
+
+    def __init__(self, workers=None, processes=False, max_sessions=MAX_SESSIONS):
+        """
+        Hosts many concurrent games over a line based JSON protocol. Each request is a JSON object on one
+        line, and gets one JSON object back on one line (echoing the request's "id", if it had one):
+            {"op": "new", "size": 3, "win_length": null, "ai": {"algorithm": 5, "playouts": 500}, "seed": 1}
+            {"op": "move", "game": 1, "row": 0, "col": 2}
+            {"op": "state", "game": 1}
+            {"op": "close", "game": 1}
+        Human moves are simply awaited, and AI moves are worked out in an executor, so slow searches never
+        stall other games.
+        :param workers: Executor workers (defaults to the executor's own default)
+        :param processes: Search in a process pool rather than a thread pool. Searches then run in parallel
+                          across cores, but start afresh each move.
+        :param max_sessions: Most games held at once
+        """
+        self._processes = processes
+        self._executor = ProcessPoolExecutor(workers) if processes else ThreadPoolExecutor(workers)
+
+        # Start the worker processes now, before the event loop's threads exist to be forked mid lock
+        if processes:
+            for future in [self._executor.submit(os.getpid) for _ in range(workers or os.cpu_count())]:
+                future.result()
+        self._max_sessions = max_sessions
+        self._sessions = {}
+        self._connections = set()
+        self._ids = itertools.count(1)
+        self._ops = {"new": self._new, "move": self._move, "state": self._state, "close": self._close}
+
+    @property
+    def sessions(self):
+        """
+        Number of games being held
+        :return: int
+        """
+        return len(self._sessions)
+
+    async def handle(self, request):
+        """
+        Handles one request
+        :param request: Request dict
+        :return: Response dict, with "ok" true or false (and an "error" message)
+        """
+        try:
+            if not isinstance(request, dict) or request.get("op") not in self._ops:
+                raise RequestException("unknown op, expected one of {}".format(sorted(self._ops)))
+            response = await self._ops[request["op"]](request)
+            response["ok"] = True
+        except (RequestException, IndexOutOfBoundsException, NotEmptyException, KeyError, ValueError,
+                TypeError) as error:
+            response = {"ok": False, "error": "{}: {}".format(type(error).__name__, error)}
+
+        if isinstance(request, dict) and "id" in request:
+            response["id"] = request["id"]
+        return response
+
+    async def _new(self, request):
+        """
+        Starts a game. If the AI goes first, it makes its move before responding. The game is only held
+        once it is set up, and the AI has made any first move.
+        """
+        # Raise exception if the server is full, or the board size, win length or AI options aren't allowed
+        self._check_capacity()
+        size = int(request.get("size", 3))
+        if not 1 <= size <= MAX_SIZE:
+            raise RequestException("size:{} - min:1, max:{}".format(size, MAX_SIZE))
+        win_length = request.get("win_length")
+        if win_length is not None:
+            win_length = int(win_length)
+            if not 1 <= win_length <= size:
+                raise RequestException("win_length:{} - min:1, max:{}".format(win_length, size))
+        ai_options = self._check_ai_options(request.get("ai", {}), size, size if win_length is None else win_length)
+
+        # Setting up the AI can map a table, so it's done off the event loop. Process mode still builds the game
+        # in a thread, since the game (and its AI) is kept here.
+        loop = asyncio.get_running_loop()
+        executor = None if self._processes else self._executor
+        game = await loop.run_in_executor(executor, functools.partial(
+            Game, size, win_length, None, ai_options, headless=True, seed=request.get("seed")))
+        session = Session(next(self._ids), game, ai_options)
+        try:
+            move = await self._ai_turn(session) if game.current_player is game.cross_player else None
+
+            # The server may have filled up while the game was set up
+            self._check_capacity()
+        except Exception:
+            await loop.run_in_executor(None, game.close)
+            raise
+        self._sessions[session.game_id] = session
+
+        response = session.summary(board=True)
+        response["move"] = None if move is None else list(move)
+        return response
+
+    async def _move(self, request):
+        """
+        Plays the human's move, then the AI's reply (unless the human's move finished the game)
+        """
+        session = self._session(request)
+        async with session.lock:
+            game = session.game
+            if game.is_finished():
+                raise RequestException("game {} is finished".format(session.game_id))
+            if game.current_player is not game.nought_player:
+                raise RequestException("game {} - not your turn".format(session.game_id))
+            game.next_turn((int(request["row"]), int(request["col"])))
+
+            # A game the AI failed to move in would be left with the AI to move, so it is ended
+            try:
+                move = None if game.is_finished() else await self._ai_turn(session)
+            except Exception as error:
+                logger.exception("AI failed to move in game %s", session.game_id)
+                await self._forget(session)
+                raise RequestException("game {} ended, the AI failed to move - {}: {}".format(
+                    session.game_id, type(error).__name__, error))
+            response = session.summary()
+        response["move"] = None if move is None else list(move)
+        return response
+
+    async def _state(self, request):
+        """
+        Reports a game's board and outcome
+        """
+        session = self._session(request)
+        async with session.lock:
+            response = session.summary(board=True)
+            response["moves"] = [[row, col] for row, col, _ in session.game.board.moves]
+        return response
+
+    async def _close(self, request):
+        """
+        Forgets a game, shutting down anything its AI started (e.g. MCTS worker processes)
+        """
+        session = self._session(request)
+        async with session.lock:
+            await self._forget(session)
+        return {"game": session.game_id}
+
+    async def _forget(self, session):
+        """
+        Drops a session, and closes its game (shutting down anything its AI started, e.g. MCTS worker
+        processes). The caller holds the session's lock.
+        :param session: Session
+        """
+        self._sessions.pop(session.game_id, None)
+        await asyncio.get_running_loop().run_in_executor(None, session.game.close)
+
+    def _check_ai_options(self, ai_options, size, win_length):
+        """
+        Checks the AI options a client asked for are allowed, and within what the server can afford
+        :param ai_options: Dict of AiPlayer options from the request
+        :param size: Board size
+        :param win_length: Number of tiles in a row needed to win
+        :return: Dict of AiPlayer options to use, with a time limit added to anytime searches given another
+                 budget (so they still stop in time)
+        :raises RequestException if an option isn't allowed, is out of range, or the algorithm can't play
+                this board
+        """
+        # Raise exception if the options aren't a dict of known options
+        if not isinstance(ai_options, dict):
+            raise RequestException("ai:{!r} - expected an object of AiPlayer options".format(ai_options))
+        unknown = set(ai_options) - set(AI_OPTIONS)
+        if unknown:
+            raise RequestException("ai options:{} - allowed:{}".format(sorted(unknown), AI_OPTIONS))
+        algorithm = ai_options.get("algorithm", AiPlayer.RANDOM_ALGORITHM)
+        if algorithm not in AI_ALGORITHMS or isinstance(algorithm, bool):
+            raise RequestException("algorithm:{!r} - allowed:{}".format(algorithm, AI_ALGORITHMS))
+
+        # Raise exception if a budget isn't a number in range
+        for name, types, maximum in (("time_limit", (int, float), MAX_TIME_LIMIT), ("playouts", (int,), MAX_PLAYOUTS),
+                                     ("search_depth", (int,), MAX_SEARCH_DEPTH)):
+            value = ai_options.get(name)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, types) or
+                                      not 0 < value <= maximum):
+                raise RequestException("{}:{!r} - min:0 (exclusive), max:{}".format(name, value, maximum))
+
+        # Raise exception if the algorithm can't play (or can't afford to search) this board
+        if algorithm == AiPlayer.SOLVED_TABLE_ALGORITHM and (size, win_length) != (3, 3):
+            raise RequestException("size:{}, win_length:{} - the solved table is 3x3".format(size, win_length))
+        if algorithm == AiPlayer.TABLEBASE_ALGORITHM:
+            try:
+                table = tablebase.Tablebase.load()
+            except (OSError, CorruptTableException) as error:
+                raise RequestException("no tablebase: {}".format(error))
+            if (size, win_length) != (table.size, table.win_length):
+                raise RequestException("size:{}, win_length:{} - the tablebase is {}x{}, win_length:{}".format(
+                    size, win_length, table.size, table.size, table.win_length))
+        if algorithm == AiPlayer.NEGAMAX_ALGORITHM:
+            if size > NEGAMAX_MAX_SIZE:
+                raise RequestException("size:{} - negamax max:{}, use iterative deepening".format(
+                    size, NEGAMAX_MAX_SIZE))
+            if ai_options.get("search_depth") is None and size > FULL_SEARCH_MAX_SIZE:
+                raise RequestException("search_depth:None - negamax needs a search_depth past size:{}".format(
+                    FULL_SEARCH_MAX_SIZE))
+
+        # Anytime searches stop at whichever budget runs out first, so one given only playouts or a depth
+        # still gets the longest time limit
+        anytime = (AiPlayer.MCTS_ALGORITHM, AiPlayer.ITERATIVE_DEEPENING_ALGORITHM)
+        if algorithm in anytime and ai_options.get("time_limit") is None and (
+                ai_options.get("playouts") is not None or ai_options.get("search_depth") is not None):
+            ai_options = dict(ai_options, time_limit=MAX_TIME_LIMIT)
+        return ai_options
+
+    def _check_capacity(self):
+        """
+        Checks there is room for another game
+        :raises RequestException if the server is full
+        """
+        if len(self._sessions) >= self._max_sessions:
+            raise RequestException("server full, {} games".format(self._max_sessions))
+
+    def _session(self, request):
+        """
+        Finds the session a request is for
+        :param request: Request dict
+        :return: Session
+        :raises RequestException if there is no such game
+        """
+        session = self._sessions.get(request.get("game"))
+        if session is None:
+            raise RequestException("no game {!r}".format(request.get("game")))
+        return session
+
+    async def _ai_turn(self, session):
+        """
+        Has the AI make its move, off the event loop (the caller holds the session's lock)
+        :param session: Session
+        :return: (row, col) tuple of the move made
+        """
+        loop = asyncio.get_running_loop()
+        game = session.game
+
+        # Threads can search the game itself, processes get a copy of the position and hand back a move
+        if not self._processes:
+            return await loop.run_in_executor(self._executor, game.next_turn)
+        move = await loop.run_in_executor(self._executor, _worker_move, game.board.size, game.board.win_length,
+                                          session.ai_options, game.board.moves, False)
+        return game.next_turn(move)
+
+    async def serve_connection(self, reader, writer):
+        """
+        Serves one client connection. Requests are handled concurrently, so responses to requests for
+        different games may come back out of order (match them up by "id").
+        :param reader: asyncio.StreamReader
+        :param writer: asyncio.StreamWriter
+        """
+        async def respond(line):
+            """
+            Handles a request line, and writes its response line
+            """
+            try:
+                request = json.loads(line)
+            except ValueError as error:
+                response = {"ok": False, "error": "bad json: {}".format(error)}
+            else:
+
+                # Anything handle didn't expect is a server bug, but the client still gets a response
+                try:
+                    response = await self.handle(request)
+                except Exception as error:
+                    logger.exception("request failed: %r", request)
+                    response = {"ok": False, "error": "internal error: {}: {}".format(type(error).__name__, error)}
+                    if isinstance(request, dict) and "id" in request:
+                        response["id"] = request["id"]
+            writer.write(json.dumps(response).encode() + b"\n")
+            await writer.drain()
+
+        self._connections.add(asyncio.current_task())
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    task = asyncio.ensure_future(respond(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+
+            # Let the last requests finish before hanging up
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+            self._connections.discard(asyncio.current_task())
+
+    async def wait_connections(self):
+        """
+        Waits for every open connection to hang up
+        """
+        if self._connections:
+            await asyncio.wait(list(self._connections))
+
+    async def start(self, host="127.0.0.1", port=8765, path=None):
+        """
+        Starts listening
+        :param host: TCP host
+        :param port: TCP port (0 picks a free one)
+        :param path: Unix socket path, used instead of TCP if given
+        :return: asyncio Server
+        """
+        if path is not None:
+            return await asyncio.start_unix_server(self.serve_connection, path, limit=MAX_LINE)
+        return await asyncio.start_server(self.serve_connection, host, port, limit=MAX_LINE)
+
+    def close(self):
+        """
+        Closes every game still held, and shuts down the executor
+        """
+        for session in list(self._sessions.values()):
+            session.game.close()
+        self._sessions.clear()
+        self._executor.shutdown(wait=False)
+
+
+def main():
+    """
+    Runs the server from the command line
+    """
+    parser = argparse.ArgumentParser(description="Host noughts and crosses games over line based JSON")
+    parser.add_argument("--host", default="127.0.0.1", help="TCP host")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port")
+    parser.add_argument("--unix", default=None, help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=None, help="executor workers")
+    parser.add_argument("--processes", action="store_true", help="search in a process pool, not threads")
+    parser.add_argument("--max-sessions", type=int, default=MAX_SESSIONS, help="most games held at once")
+    args = parser.parse_args()
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s")
+
+    async def serve():
+        """
+        Serves until interrupted
+        """
+        game_server = GameServer(args.workers, args.processes, args.max_sessions)
+        server = await game_server.start(args.host, args.port, args.unix)
+        print("Serving on {}".format(", ".join(str(sock.getsockname()) for sock in server.sockets)))
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            game_server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+# If this script is execute directly, call the main function
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+
+# Library imports
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Project imports
+from board import Board
+from game import Game
+from game_record import GameRecordWriter
+from player import AiPlayer
+
+
+# Algorithm names accepted on the command line
+ALGORITHMS = {"random": AiPlayer.RANDOM_ALGORITHM,
+              "defensive": AiPlayer.RANDOM_DEFENSIVE_ALGORITHM,
+              "negamax": AiPlayer.NEGAMAX_ALGORITHM,
+              "solved": AiPlayer.SOLVED_TABLE_ALGORITHM,
+              "tablebase": AiPlayer.TABLEBASE_ALGORITHM,
+              "mcts": AiPlayer.MCTS_ALGORITHM,
+              "deepening": AiPlayer.ITERATIVE_DEEPENING_ALGORITHM,
+              "threats": AiPlayer.THREAT_SPACE_ALGORITHM}
+
+
+def play_game(index, size, win_length, nought_player, cross_player, seed):
+    """
+    Plays one headless game between two AI players
+    :param index: Game number, returned with the result
+    :param size: Board size
+    :param win_length: Number of tiles in a row needed to win
+    :param nought_player: Dict of AiPlayer options for noughts
+    :param cross_player: Dict of AiPlayer options for crosses
+    :param seed: Seed for the game. The first player, and each player's random number generator, are
+                 seeded from it.
+    :return: dict of game number, seed, first player, winner ("nought", "cross" or None) and moves
+    """
+    # Give each player its own seed, derived from the game's
+    nought_player = dict(nought_player, seed=seed * 2)
+    cross_player = dict(cross_player, seed=seed * 2 + 1)
+    game = Game(size, win_length, nought_player, cross_player, headless=True, seed=seed)
+
+    # Play until the game finishes
+    while not game.is_finished():
+        game.next_turn()
+    game.close()
+
+    winner = game.winning_player
+    return {"game": index,
+            "seed": seed,
+            "first": "nought" if game.players[0] is game.nought_player else "cross",
+            "winner": None if winner is None else "nought" if winner is game.nought_player else "cross",
+            "moves": len(game.board.moves),
+            "move_list": [[row, col] for row, col, _ in game.board.moves]}
+
+
+def _play_chunk(indices, size, win_length, nought_player, cross_player, seed):
+    """
+    Worker function, plays a chunk of games
+    :param indices: Game numbers to play (each game's seed is the base seed plus its number)
+    :param size: Board size
+    :param win_length: Number of tiles in a row needed to win
+    :param nought_player: Dict of AiPlayer options for noughts
+    :param cross_player: Dict of AiPlayer options for crosses
+    :param seed: Base seed
+    :return: list of result dicts
+    """
+    return [play_game(index, size, win_length, nought_player, cross_player, seed + index) for index in indices]
+
+
+def simulate(games, nought_player, cross_player, size=3, win_length=None, workers=None, seed=0, chunk_size=50):
+    """
+    Plays many headless games between two AI players, spread across a process pool, yielding each result
+    as soon as its chunk of games finishes (so not necessarily in game order). Each game is seeded from
+    the base seed and its game number, so runs are reproducible whatever the number of workers.
+    :param games: Number of games to play
+    :param nought_player: Dict of AiPlayer options for noughts, e.g. {"algorithm": AiPlayer.RANDOM_ALGORITHM}
+    :param cross_player: Dict of AiPlayer options for crosses
+    :param size: Board size
+    :param win_length: Number of tiles in a row needed to win (defaults to a full row, column or diagonal)
+    :param workers: Number of worker processes (defaults to the number of cores, 1 plays in this process)
+    :param seed: Base seed
+    :param chunk_size: Games per task handed to a worker
+    :return: generator of result dicts (see play_game)
+    """
+    chunks = [range(start, min(start + chunk_size, games)) for start in range(0, games, chunk_size)]
+
+    # With a single worker, skip the pool and play here
+    if workers == 1:
+        for chunk in chunks:
+            for result in _play_chunk(chunk, size, win_length, nought_player, cross_player, seed):
+                yield result
+        return
+
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(_play_chunk, chunk, size, win_length, nought_player, cross_player, seed)
+                   for chunk in chunks]
+        for future in as_completed(futures):
+            for result in future.result():
+                yield result
+
+
+def main():
+    """
+    Runs a simulation from the command line, streaming results to stdout as JSON lines and printing a
+    summary to stderr
+    """
+    parser = argparse.ArgumentParser(description="Play headless AI vs AI games")
+    parser.add_argument("--games", type=int, default=1000, help="number of games to play")
+    parser.add_argument("--size", type=int, default=3, help="board size")
+    parser.add_argument("--win-length", type=int, default=None, help="tiles in a row needed to win")
+    parser.add_argument("--nought", choices=sorted(ALGORITHMS), default="random", help="nought algorithm")
+    parser.add_argument("--cross", choices=sorted(ALGORITHMS), default="defensive", help="cross algorithm")
+    parser.add_argument("--playouts", type=int, default=None, help="playouts per move, for mcts")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0, help="base seed")
+    parser.add_argument("--quiet", action="store_true", help="only print the summary")
+    parser.add_argument("--record", default=None, help="append the games to this game record file")
+    args = parser.parse_args()
+
+    # Build each side's AiPlayer options
+    players = []
+    for name in (args.nought, args.cross):
+        options = {"algorithm": ALGORITHMS[name]}
+        if name == "mcts" and args.playouts is not None:
+            options["playouts"] = args.playouts
+        players.append(options)
+
+    # Stream the results as they come in, counting the outcomes (and recording the games)
+    recorder = None if args.record is None else GameRecordWriter(args.record)
+    tiles = {"nought": Board.NOUGHT, "cross": Board.CROSS, None: Board.EMPTY}
+    counts = {"nought": 0, "cross": 0, None: 0}
+    start = time.time()
+    for result in simulate(args.games, players[0], players[1], args.size, args.win_length, args.workers,
+                           args.seed):
+        counts[result["winner"]] += 1
+        if not args.quiet:
+            sys.stdout.write(json.dumps(result) + "\n")
+        if recorder is not None:
+            recorder.write_game(args.size, args.size if args.win_length is None else args.win_length,
+                                players[0]["algorithm"], players[1]["algorithm"], tiles[result["first"]],
+                                result["seed"], tiles[result["winner"]], result["move_list"])
+    elapsed = time.time() - start
+    if recorder is not None:
+        recorder.close()
+
+    sys.stderr.write("{} games in {:.2f}s ({:.0f} games/sec) - noughts ({}): {}, crosses ({}): {}, draws: {}\n".format(
+        args.games, elapsed, args.games / elapsed, args.nought, counts["nought"], args.cross, counts["cross"],
+        counts[None]))
+
+
+# If this script is execute directly, call the main function
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+
+# Library imports
+import mmap
+import os
+import struct
+import zlib
+
+# Project imports
+from board import canonical_key, symmetry_tables
+from bitboard import win_masks
+
+
+# Custom exception classes
+class CorruptTableException(Exception): pass
+
+
+# File format: header (magic, version, board size, win length, entry count, crc32 of the entries), then one
+# byte per position, indexed by canonical key
+MAGIC = b"NGST"
+VERSION = 1
+HEADER = struct.Struct("<4sHHHII")
+
+# Default location of the 3x3 table, next to this module
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "solved_3x3.tbl")
+
+# Position values, from the point of view of the side to move (UNKNOWN for positions not in the table)
+UNKNOWN = 0
+LOSS = 1
+DRAW = 2
+WIN = 3
+
+# Entry bytes hold the value in the top 2 bits and the best move's tile index in the low 6 bits
+MOVE_MASK = 0x3f
+
+# Tile values in table positions, relative to the side to move rather than noughts/crosses
+EMPTY = 0
+MINE = 1
+THEIRS = 2
+
+
+def relative_tiles(matrix, size, value):
+    """
+    Reads a board matrix into a flat list of tiles relative to the side to move
+    :param matrix: Board matrix (anything indexable as matrix[row, col])
+    :param size: Board size
+    :param value: Side to move (Board.NOUGHT or Board.CROSS)
+    :return: list of EMPTY, MINE or THEIRS
+    """
+    tiles = []
+    for row in range(size):
+        for col in range(size):
+            tile = matrix[row, col]
+            tiles.append(EMPTY if not tile else MINE if tile == value else THEIRS)
+    return tiles
+
+
+def build(path=DEFAULT_PATH, size=3, win_length=None):
+    """
+    Solves every position reachable from the empty board, and writes the value and best move of each
+    canonical position to a table file. Only practical for 3x3 (the table has 3^(size*size) entries).
+    :param path: File to write
+    :param size: Board size
+    :param win_length: Number of tiles in a row needed to win (defaults to size)
+    """
+    win_length = size if win_length is None else win_length
+    cells = size * size
+    masks = win_masks(size, win_length)
+    inverses = symmetry_tables(size)[1]
+    entries = bytearray(3 ** cells)
+    solved = {}
+
+    def solve(tiles):
+        """
+        Solves a position where the game isn't over yet, storing its entry
+        :param tiles: Flat list of tiles, relative to the side to move
+        :return: (value, plies to the end of the game) tuple
+        """
+        key, transform = canonical_key(tiles, size)
+        if key in solved:
+            return solved[key]
+
+        best = None
+        for cell in range(cells):
+            if tiles[cell] != EMPTY:
+                continue
+
+            # Take the tile, and see if it wins
+            tiles[cell] = MINE
+            mine = sum(1 << index for index, tile in enumerate(tiles) if tile == MINE)
+            if any(mine & mask == mask for mask in masks):
+                outcome = (WIN, 1)
+
+            # A full board is a draw, otherwise solve the reply with the sides swapped
+            elif EMPTY not in tiles:
+                outcome = (DRAW, 1)
+            else:
+                reply, plies = solve([THEIRS if tile == MINE else MINE if tile == THEIRS else EMPTY
+                                      for tile in tiles])
+                outcome = (WIN + LOSS - reply if reply != DRAW else DRAW, plies + 1)
+            tiles[cell] = EMPTY
+
+            # Prefer the best value, winning as quickly as possible, or losing as slowly as possible
+            rank = (outcome[0], -outcome[1] if outcome[0] == WIN else outcome[1])
+            if best is None or rank > best[0]:
+                best = (rank, outcome, cell)
+
+        # Store the best move in the canonical orientation
+        _, outcome, cell = best
+        entries[key] = outcome[0] << 6 | inverses[transform][cell]
+        solved[key] = outcome
+        return outcome
+
+    solve([EMPTY] * cells)
+
+    # Write to a temporary file, and move it into place so readers never see half a table
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as table_file:
+        table_file.write(HEADER.pack(MAGIC, VERSION, size, win_length, len(entries), zlib.crc32(entries) & 0xffffffff))
+        table_file.write(entries)
+    os.replace(temp_path, path)
+
+    return len(solved)
+
+
+class SolvedTable(object):
+
+    # Tables already mapped in this process, keyed by path
+    _loaded = {}
+
+    def __init__(self, path=DEFAULT_PATH):
+        """
+        Read only, memory mapped solved position table. The OS shares the mapped pages between every
+        process using the same file, so there is no per-process load cost.
+        :param path: Table file, written by build()
+        :raises CorruptTableException if the file's header or contents don't check out
+        """
+        with open(path, "rb") as table_file:
+            self._mmap = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Raise exception if the header is missing or doesn't match this format
+        if len(self._mmap) < HEADER.size:
+            raise CorruptTableException("{} - too short for a header".format(path))
+        magic, version, self.size, self.win_length, count, crc = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            raise CorruptTableException("{} - magic:{!r}, version:{} - expected {!r}, {}".format(
+                path, magic, version, MAGIC, VERSION))
+
+        # Raise exception if the entries are truncated, or don't match their checksum
+        if count != 3 ** (self.size * self.size) or len(self._mmap) != HEADER.size + count:
+            raise CorruptTableException("{} - {} bytes, expected {}".format(path, len(self._mmap), HEADER.size + count))
+        if zlib.crc32(self._mmap[HEADER.size:]) & 0xffffffff != crc:
+            raise CorruptTableException("{} - checksum mismatch".format(path))
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        """
+        Returns the table at path, mapping it the first time it is asked for
+        :param path: Table file
+        :return: SolvedTable
+        """
+        if path not in cls._loaded:
+            cls._loaded[path] = cls(path)
+        return cls._loaded[path]
+
+    def lookup(self, tiles):
+        """
+        Looks up a position
+        :param tiles: Flat list of tiles, relative to the side to move (see relative_tiles)
+        :return: (value, cell) tuple. Value is WIN, LOSS, DRAW or UNKNOWN, cell is the best move's tile
+                 index on the given position (None if the position isn't in the table)
+        """
+        key, transform = canonical_key(tiles, self.size)
+        entry = ord(self._mmap[HEADER.size + key:HEADER.size + key + 1])
+
+        # Positions that can't be reached, or where the game is already over, have no entry
+        if not entry:
+            return UNKNOWN, None
+
+        # Map the move from the canonical orientation back onto the position
+        return entry >> 6, symmetry_tables(self.size)[0][transform][entry & MOVE_MASK]
+
+
+# If this script is execute directly, build the default table
+if __name__ == "__main__":
+    print("Solved {} canonical positions, written to {}".format(build(), DEFAULT_PATH))
@@ -0,0 +1,360 @@
+
+# Library imports
+import random
+
+# Project imports
+from lazy_import import lazy_import
+from board import Board, DIRECTIONS, IndexOutOfBoundsException, NotEmptyException
+
+# numpy is only needed for matrix_copy
+np = lazy_import("numpy")
+
+
+class _Tiles(dict):
+    """
+    Taken tiles keyed by (row, col), reading as Board.EMPTY for any tile not in it
+    """
+
+    def __missing__(self, key):
+        return Board.EMPTY
+
+
+class SparseBoard(object):
+
+    # Numerical definitions for nought, cross and empty, the same as Board's
+    EMPTY = Board.EMPTY
+    NOUGHT = Board.NOUGHT
+    CROSS = Board.CROSS
+
+    def __init__(self, size=None, win_length=5, radius=2):
+        """
+        Noughts & crosses board that only stores the tiles taken, for very large or unbounded boards. Memory
+        and the cost of each move scale with the number of tiles taken rather than the board's area: wins are
+        only looked for through the tile just set, and candidate moves are the empty tiles near taken ones.
+        :param size: Board size (None for an unbounded board, where rows and cols can be any int)
+        :param win_length: Number of tiles in a row needed to win (defaults to a full row, column or diagonal
+                           on a bounded board)
+        :param radius: How far from a taken tile (in rows or cols) an empty tile counts as a candidate move
+        """
+        self._size = size
+        self._win_length = size if win_length is None else win_length
+        self._radius = radius
+
+        # Raise exception if the win length can't fit on the board
+        if self._win_length is None or self._win_length < 1 or (size is not None and self._win_length > size):
+            raise ValueError("win_length:{} - min:1, max:{}".format(self._win_length, size))
+
+        # Taken tiles, and for every tile within radius of a taken tile, how many taken tiles it is near
+        self._tiles = _Tiles()
+        self._near = {}
+
+        # Empty tiles where each side would complete a line, kept up to date around every tile set or cleared
+        self._winning_tiles = {self.NOUGHT: set(), self.CROSS: set()}
+
+        # Cached outcome, and the bounding box of the taken tiles (min row, min col, max row, max col)
+        self._winner = None
+        self._bounds = None
+
+        # Stack of moves made, (row, col, value, winner before the move, bounds before the move), for pop
+        self._moves = []
+
+        # Free tiles of a bounded board, and where each sits in the list (so one can be swapped out in O(1)).
+        # Only built once half the board is taken, when it's no bigger than the taken tiles already are.
+        self._free = None
+        self._free_index = None
+
+    @property
+    def size(self):
+        """
+        Read only size property, returns size of one side of the board (None if unbounded)
+        :return: int or None
+        """
+        return self._size
+
+    @property
+    def win_length(self):
+        """
+        Read only win length property, returns the number of tiles in a row needed to win
+        :return: int
+        """
+        return self._win_length
+
+    @property
+    def bounds(self):
+        """
+        Read only bounding box of the taken tiles
+        :return: (min row, min col, max row, max col) tuple, or None if no tiles are taken
+        """
+        return self._bounds
+
+    def __len__(self):
+        """
+        Number of tiles taken
+        :return: int
+        """
+        return len(self._tiles)
+
+    def get_tile(self, row, col):
+        """
+        Returns the value of a tile
+        :param row: Row index
+        :param col: Column index
+        :return: Board.EMPTY, Board.NOUGHT or Board.CROSS
+        """
+        return self._tiles[row, col]
+
+    def is_full(self):
+        """
+        Checks if all board tiles have been taken (never, if unbounded)
+        :return: bool
+        """
+        return self._size is not None and len(self._tiles) == self._size * self._size
+
+    def is_won(self):
+        """
+        Returns the winner cached by set_tile
+        :return: Board.NOUGHT, Board.CROSS or None
+        """
+        return self._winner
+
+    def is_empty(self, row, col):
+        """
+        Checks if the tile with row, col specifed is empty or not
+        :param row: Row index
+        :param col: Column index
+        :return: bool
+        """
+        return (row, col) not in self._tiles
+
+    def set_tile(self, row, col, value):
+        """
+        Sets the tile with the given value
+        :param row: Row index
+        :param col: Column index
+        :param value: Value to set (should be Board.NOUGHT or Board.CROSS)
+        :raises IndexOutOfBoundsException if row/col are out of bounds
+        :raises NotEmptyException if tile already taken
+        """
+        # Raise exception if row/col are out of bounds
+        if not self._in_bounds(row, col):
+            raise IndexOutOfBoundsException("row:{}, col:{} - min:0, max:{}".format(row, col, self._size))
+
+        # Raise exception if tile isn't empty
+        if (row, col) in self._tiles:
+            raise NotEmptyException("row:{}, col:{}".format(row, col))
+
+        # Record the move, then set the tile and update the neighbourhood, bounding box and cached outcome
+        self._moves.append((row, col, value, self._winner, self._bounds))
+        self._tiles[row, col] = value
+        self._count_near(row, col, 1)
+        if self._free is not None:
+            self._take_free(row, col)
+        if self._bounds is None:
+            self._bounds = (row, col, row, col)
+        else:
+            min_row, min_col, max_row, max_col = self._bounds
+            self._bounds = (min(min_row, row), min(min_col, col), max(max_row, row), max(max_col, col))
+        if self._winner is None and self._completes_line(row, col, value):
+            self._winner = value
+        self._update_winning_tiles(row, col)
+
+    def push(self, row, col, value):
+        """
+        Makes a move in place, so it can be undone by pop
+        :param row: Row index
+        :param col: Column index
+        :param value: Value to set (should be Board.NOUGHT or Board.CROSS)
+        :raises IndexOutOfBoundsException if row/col are out of bounds
+        :raises NotEmptyException if tile already taken
+        """
+        self.set_tile(row, col, value)
+
+    def pop(self):
+        """
+        Undoes the last move made (by push or set_tile)
+        :return: (row, col, value) tuple of the move undone
+        :raises IndexError if there are no moves to undo
+        """
+        row, col, value, self._winner, self._bounds = self._moves.pop()
+        del self._tiles[row, col]
+        self._count_near(row, col, -1)
+        if self._free is not None:
+            self._free_index[row, col] = len(self._free)
+            self._free.append((row, col))
+        self._update_winning_tiles(row, col)
+        return row, col, value
+
+    @property
+    def moves(self):
+        """
+        Read only list of the moves made so far, oldest first
+        :return: list of (row, col, value) tuples
+        """
+        return [move[:3] for move in self._moves]
+
+    def candidate_tiles(self):
+        """
+        Lists the empty tiles within radius of a taken tile, the only moves worth considering on a big board.
+        On an empty board, that is the centre tile (or 0, 0 if unbounded).
+        :return: list of (row, col) tuples
+        """
+        if not self._tiles:
+            return [(0, 0) if self._size is None else (self._size // 2, self._size // 2)]
+        return [tile for tile in self._near if tile not in self._tiles]
+
+    def winning_tiles(self, value):
+        """
+        Lists the empty tiles where a side would complete a line, without searching the board
+        :param value: Side to look for (Board.NOUGHT or Board.CROSS)
+        :return: list of (row, col) tuples, sorted
+        """
+        return sorted(self._winning_tiles[value])
+
+    def list_empty_tiles(self):
+        """
+        Produces a list of (row, col) tuples of all the empty tiles on a bounded board. This scans the whole
+        board, so prefer candidate_tiles on big boards.
+        :return: list of tuples
+        :raises ValueError if the board is unbounded
+        """
+        # Raise exception if there are infinitely many empty tiles
+        if self._size is None:
+            raise ValueError("unbounded board - use candidate_tiles")
+
+        return [(row, col) for row in range(self._size) for col in range(self._size) if (row, col) not in self._tiles]
+
+    def random_empty_tile(self, rng=random):
+        """
+        Picks an empty tile of a bounded board, uniformly at random. While at least half the board is free,
+        that is by drawing tiles until an empty one turns up. After that, it is picked from the free tiles,
+        which are listed once and then kept up to date by every move.
+        :param rng: Random number generator to use (anything with randrange, e.g. a random.Random)
+        :return: (row, col) tuple, or None if the board is full
+        :raises ValueError if the board is unbounded
+        """
+        # Raise exception if there are infinitely many empty tiles
+        if self._size is None:
+            raise ValueError("unbounded board - use candidate_tiles")
+        if self.is_full():
+            return None
+
+        # Drawing is cheap while at least half the board is free, expect at most two draws a tile then
+        if self._free is None and len(self._tiles) * 2 <= self._size * self._size:
+            while True:
+                tile = divmod(rng.randrange(self._size * self._size), self._size)
+                if tile not in self._tiles:
+                    return tile
+        if self._free is None:
+            self._free = self.list_empty_tiles()
+            self._free_index = {tile: index for index, tile in enumerate(self._free)}
+        return self._free[rng.randrange(len(self._free))]
+
+    def matrix_copy(self):
+        """
+        Returns a dense copy of the board, for display. A bounded board is copied whole, and an unbounded board
+        just its bounding box (whose top left is bounds[:2]).
+        :return: np.matrix of board state, values are Board.EMPTY, Board.NOUGHT or Board.CROSS
+        """
+        if self._size is not None:
+            min_row = min_col = 0
+            rows = cols = self._size
+        elif self._bounds is None:
+            return np.matrix(np.zeros((0, 0), dtype=int))
+        else:
+            min_row, min_col, max_row, max_col = self._bounds
+            rows, cols = max_row - min_row + 1, max_col - min_col + 1
+
+        matrix = np.full((rows, cols), self.EMPTY)
+        for (row, col), value in self._tiles.items():
+            matrix[row - min_row, col - min_col] = value
+        return np.matrix(matrix)
+
+    def _take_free(self, row, col):
+        """
+        Removes a tile from the free tiles, by moving the last free tile into its place
+        :param row: Row index
+        :param col: Column index
+        """
+        index = self._free_index.pop((row, col))
+        last = self._free.pop()
+        if index < len(self._free):
+            self._free[index] = last
+            self._free_index[last] = index
+
+    def _count_near(self, row, col, change):
+        """
+        Adds to (or takes from) the taken tile count of every tile within radius of a tile
+        :param row: Row index
+        :param col: Column index
+        :param change: 1 for a tile being set, -1 for a tile being cleared
+        """
+        near = self._near
+        for near_row in range(row - self._radius, row + self._radius + 1):
+            for near_col in range(col - self._radius, col + self._radius + 1):
+                if not self._in_bounds(near_row, near_col):
+                    continue
+                count = near.get((near_row, near_col), 0) + change
+                if count:
+                    near[near_row, near_col] = count
+                else:
+                    del near[near_row, near_col]
+
+    def _update_winning_tiles(self, row, col):
+        """
+        Rechecks which sides would win at each empty tile whose lines run through a tile just set or cleared.
+        Whether a tile wins only depends on the win_length - 1 tiles either side of it, so no others can change.
+        :param row: Row index of the tile set or cleared
+        :param col: Column index of the tile set or cleared
+        """
+        tiles = self._tiles
+        reach = self._win_length - 1
+
+        for row_step, col_step in DIRECTIONS:
+            for offset in range(-reach, reach + 1):
+                tile = (row + row_step * offset, col + col_step * offset)
+                if not self._in_bounds(*tile):
+                    continue
+
+                # Check both sides, treating the empty tile as theirs (the walk from it only reads the others)
+                for value, winning in self._winning_tiles.items():
+                    if tile not in tiles and self._completes_line(tile[0], tile[1], value):
+                        winning.add(tile)
+                    else:
+                        winning.discard(tile)
+
+    def _completes_line(self, row, col, value):
+        """
+        Checks whether the tile at row, col is (or, if empty, would be) part of win_length tiles of value in a
+        row. Only looks at the win_length - 1 tiles either side of it, in each direction.
+        :param row: Row index
+        :param col: Column index
+        :param value: Value to look for (Board.NOUGHT or Board.CROSS)
+        :return: bool
+        """
+        tiles = self._tiles
+
+        for row_step, col_step in DIRECTIONS:
+
+            # Count the tile itself, then walk forwards and backwards along the line while the value matches.
+            # Tiles off a bounded board are never taken, so they stop the walk without a bounds check.
+            run = 1
+            for direction in (1, -1):
+                r, c = row + row_step * direction, col + col_step * direction
+                while run < self._win_length and tiles[r, c] == value:
+                    run += 1
+                    r, c = r + row_step * direction, c + col_step * direction
+
+            # Return true as soon as any direction has a long enough run
+            if run >= self._win_length:
+                return True
+
+        return False
+
+    def _in_bounds(self, row, col):
+        """
+        Checks if the row/col passed are in bounds (always, if unbounded)
+        :param row: row to check
+        :param col: column to check
+        :return: bool
+        """
+        return self._size is None or ((0 <= row < self._size) and (0 <= col < self._size))
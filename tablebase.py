@@ -0,0 +1,351 @@
+
+# Library imports
+import argparse
+import mmap
+import os
+import shutil
+import struct
+
+# Project imports
+from lazy_import import lazy_import
+from board import symmetry_tables
+from bitboard import win_masks
+from solved_table import CorruptTableException, UNKNOWN, DRAW, WIN, EMPTY, MINE, THEIRS
+
+# numpy is imported when a tablebase is first loaded or built, rather than whenever player.py is
+np = lazy_import("numpy")
+
+# Process pools are only needed to build a tablebase
+futures = lazy_import("concurrent.futures")
+
+
+# File format: header (magic, version, board size, win length, position count, layers solved), then the
+# packed values, 2 bits per position, indexed by the position's base 3 key (4 positions per byte)
+MAGIC = b"NGTB"
+VERSION = 1
+HEADER = struct.Struct("<4sHHHIH")
+
+# Default location of the 4x4 tablebase, next to this module
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tablebase_4x4.tbl")
+
+# Number of positions handed to a worker at a time
+CHUNK_SIZE = 1 << 15
+
+
+class _Geometry(object):
+
+    def __init__(self, size, win_length):
+        """
+        Precomputed arrays for working on whole chunks of positions at once. Positions are held as arrays of
+        tile digits [N, cells] (EMPTY, MINE or THEIRS, relative to the side to move), and keyed by reading
+        the digits as a base 3 number, first tile most significant.
+        :param size: Board size
+        :param win_length: Number of tiles in a row needed to win
+        """
+        self.cells = size * size
+        self.weights = 3 ** np.arange(self.cells - 1, -1, -1, dtype=np.int64)
+        self.tables = np.array(symmetry_tables(size)[0], dtype=np.intp)
+
+        # Tile indices of each winning line, and which lines run through each tile
+        lines = [[cell for cell in range(self.cells) if mask >> cell & 1] for mask in win_masks(size, win_length)]
+        self.lines = np.array(lines, dtype=np.intp)
+        self.cell_lines = [self.lines[[cell in line for line in lines]] for cell in range(self.cells)]
+
+    def digits(self, keys):
+        """
+        Converts keys to tile digits
+        :param keys: int64 array [N]
+        :return: uint8 array [N, cells]
+        """
+        return (keys[:, None] // self.weights % 3).astype(np.uint8)
+
+    def keys(self, digits):
+        """
+        Converts tile digits to keys
+        :param digits: uint8 array [N, cells]
+        :return: int64 array [N]
+        """
+        return digits.astype(np.int64) @ self.weights
+
+    def symmetric_keys(self, digits):
+        """
+        Returns the keys of all 8 orientations of each position
+        :param digits: uint8 array [N, cells]
+        :return: int64 array [8, N]
+        """
+        return np.stack([self.keys(digits[:, table]) for table in self.tables])
+
+    def children(self, digits, cell):
+        """
+        Plays the side to move at cell, for every position (where it's empty), and returns the results
+        from the other side's point of view
+        :param digits: uint8 array [N, cells]
+        :param cell: Tile index to play
+        :return: (rows, child digits, won, full) tuple. rows indexes the positions where the cell was
+                 empty, won/full say whether the move won or filled the board.
+        """
+        rows = np.flatnonzero(digits[:, cell] == EMPTY)
+
+        # Swap the sides over (MINE <-> THEIRS), and the move becomes one of theirs
+        child = (3 - digits[rows]) % 3
+        child[:, cell] = THEIRS
+
+        # Only lines through the played tile can have been completed
+        won = (child[:, self.cell_lines[cell]] == THEIRS).all(axis=-1).any(axis=-1)
+        full = (child != EMPTY).all(axis=-1)
+
+        return rows, child, won, full
+
+
+def _read_values(packed, keys):
+    """
+    Reads 2 bit values out of the packed array
+    :param packed: uint8 array (or memmap) of packed values
+    :param keys: int64 array of position keys
+    :return: uint8 array of values
+    """
+    return (packed[keys >> 2] >> ((keys & 3) << 1).astype(np.uint8)) & 3
+
+
+def _expand_chunk(size, win_length, keys):
+    """
+    Worker function, generates the canonical keys of every position one move on from a chunk of positions,
+    leaving out positions where the game is over
+    :param size: Board size
+    :param win_length: Number of tiles in a row needed to win
+    :param keys: int64 array of canonical position keys
+    :return: int64 array of unique canonical child keys
+    """
+    geometry = _Geometry(size, win_length)
+    digits = geometry.digits(keys)
+
+    found = []
+    for cell in range(geometry.cells):
+        _, child, won, full = geometry.children(digits, cell)
+        live = child[~won & ~full]
+        if len(live):
+            found.append(geometry.symmetric_keys(live).min(axis=0))
+
+    return np.unique(np.concatenate(found)) if found else np.zeros(0, dtype=np.int64)
+
+
+def _solve_chunk(path, size, win_length, keys):
+    """
+    Worker function, solves a chunk of positions whose children are already in the tablebase file
+    :param path: Tablebase file (read only here)
+    :param size: Board size
+    :param win_length: Number of tiles in a row needed to win
+    :param keys: int64 array of canonical position keys
+    :return: uint8 array of values, from the point of view of the side to move
+    """
+    geometry = _Geometry(size, win_length)
+    packed = np.memmap(path, dtype=np.uint8, mode="r", offset=HEADER.size)
+    digits = geometry.digits(keys)
+
+    # Take the best outcome over every move (UNKNOWN is lower than any real value)
+    best = np.full(len(keys), UNKNOWN, dtype=np.uint8)
+    for cell in range(geometry.cells):
+        rows, child, won, full = geometry.children(digits, cell)
+
+        # A winning move wins, a move that fills the board draws, otherwise it's the opposite of the reply's
+        # value (LOSS <-> WIN, DRAW stays DRAW, which is 4 - value)
+        outcome = np.full(len(rows), WIN, dtype=np.uint8)
+        outcome[full & ~won] = DRAW
+        pending = ~won & ~full
+        outcome[pending] = 4 - _read_values(packed, geometry.keys(child[pending]))
+
+        np.maximum.at(best, rows, outcome)
+
+    return best
+
+
+def build(path=DEFAULT_PATH, size=4, win_length=None, workers=None):
+    """
+    Builds the tablebase by retrograde analysis. Every move adds a tile, so positions are grouped into
+    layers by tile count and solved from the fullest layer back to the empty board, each layer looking up
+    the already solved layer after it. Only canonical positions are solved; their values are written for
+    all 8 orientations so lookups never need to canonicalise.
+    The build resumes where it left off if interrupted: each layer's positions are saved as they are found,
+    and the header records how many layers have been solved.
+    :param path: Tablebase file to write
+    :param size: Board size
+    :param win_length: Number of tiles in a row needed to win (defaults to size)
+    :param workers: Number of worker processes (defaults to the number of cores)
+    """
+    win_length = size if win_length is None else win_length
+    cells = size * size
+    positions = 3 ** cells
+    layer_dir = path + ".layers"
+    geometry = _Geometry(size, win_length)
+
+    # Start a new file, unless there's a partial build of the same tablebase to resume
+    layers_solved = 0
+    if os.path.exists(path):
+        with open(path, "rb") as table_file:
+            header = HEADER.unpack(table_file.read(HEADER.size))
+        if header[:5] != (MAGIC, VERSION, size, win_length, positions):
+            raise CorruptTableException("{} - exists, but isn't a tablebase for this board".format(path))
+        layers_solved = header[5]
+    else:
+        with open(path, "wb") as table_file:
+            table_file.write(HEADER.pack(MAGIC, VERSION, size, win_length, positions, 0))
+            table_file.truncate(HEADER.size + (positions + 3) // 4)
+
+    if not os.path.isdir(layer_dir):
+        os.makedirs(layer_dir)
+
+    with futures.ProcessPoolExecutor(workers) as pool:
+
+        # Forward pass, find every live canonical position, one layer (tile count) at a time
+        layer_path = os.path.join(layer_dir, "{}.npy")
+        layers = [np.zeros(1, dtype=np.int64)]
+        for tiles in range(1, cells):
+            if os.path.exists(layer_path.format(tiles)):
+                layers.append(np.load(layer_path.format(tiles)))
+                continue
+            chunks = np.array_split(layers[-1], max(1, len(layers[-1]) // CHUNK_SIZE))
+            found = pool.map(_expand_chunk, [size] * len(chunks), [win_length] * len(chunks), chunks)
+            layers.append(np.unique(np.concatenate(list(found))))
+
+            # Save under a temporary name first, so an interrupted save isn't mistaken for a finished layer
+            with open(layer_path.format(tiles) + ".tmp", "wb") as layer_file:
+                np.save(layer_file, layers[-1])
+            os.replace(layer_path.format(tiles) + ".tmp", layer_path.format(tiles))
+
+        # Backward pass, solve layers from the fullest back to the empty board
+        packed = np.memmap(path, dtype=np.uint8, mode="r+", offset=HEADER.size)
+        for tiles in range(cells - 1 - layers_solved, -1, -1):
+            keys = layers[tiles]
+            chunks = np.array_split(keys, max(1, len(keys) // CHUNK_SIZE))
+            for chunk, values in zip(chunks, pool.map(_solve_chunk, [path] * len(chunks), [size] * len(chunks),
+                                                      [win_length] * len(chunks), chunks)):
+
+                # Write the values of every orientation (writes are idempotent, so a resumed layer is safe)
+                image_keys = geometry.symmetric_keys(geometry.digits(chunk))
+                image_values = np.broadcast_to(values, image_keys.shape)
+                np.bitwise_or.at(packed, image_keys.ravel() >> 2,
+                                 image_values.ravel() << ((image_keys.ravel() & 3) << 1).astype(np.uint8))
+
+            # Flush the layer, then record it as solved
+            packed.flush()
+            layers_solved += 1
+            with open(path, "r+b") as table_file:
+                table_file.write(HEADER.pack(MAGIC, VERSION, size, win_length, positions, layers_solved))
+
+    # The layer files are only needed to resume, tidy them up
+    shutil.rmtree(layer_dir)
+    return sum(len(layer) for layer in layers)
+
+
+class Tablebase(object):
+
+    # Tablebases already mapped in this process, keyed by path
+    _loaded = {}
+
+    def __init__(self, path=DEFAULT_PATH):
+        """
+        Read only, memory mapped tablebase of win/draw/loss values, packed 2 bits per position
+        :param path: Tablebase file, written by build()
+        :raises CorruptTableException if the file's header doesn't check out, or the build didn't finish
+        """
+        with open(path, "rb") as table_file:
+            self._mmap = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Raise exception if the header is missing or doesn't match this format
+        if len(self._mmap) < HEADER.size:
+            raise CorruptTableException("{} - too short for a header".format(path))
+        magic, version, self.size, self.win_length, positions, layers_solved = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            raise CorruptTableException("{} - magic:{!r}, version:{} - expected {!r}, {}".format(
+                path, magic, version, MAGIC, VERSION))
+
+        # Raise exception if the values are truncated, or the build was interrupted
+        cells = self.size * self.size
+        if positions != 3 ** cells or len(self._mmap) != HEADER.size + (positions + 3) // 4:
+            raise CorruptTableException("{} - {} bytes, expected {}".format(
+                path, len(self._mmap), HEADER.size + (positions + 3) // 4))
+        if layers_solved != cells:
+            raise CorruptTableException("{} - {} of {} layers solved, run the build again to resume".format(
+                path, layers_solved, cells))
+
+        # Key weight of each tile, and the win masks that run through each tile
+        self._weights = [3 ** (cells - 1 - cell) for cell in range(cells)]
+        masks = win_masks(self.size, self.win_length)
+        self._cell_masks = [tuple(mask for mask in masks if mask >> cell & 1) for cell in range(cells)]
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        """
+        Returns the tablebase at path, mapping it the first time it is asked for
+        :param path: Tablebase file
+        :return: Tablebase
+        """
+        if path not in cls._loaded:
+            cls._loaded[path] = cls(path)
+        return cls._loaded[path]
+
+    def value(self, key):
+        """
+        Looks up the value of a position by key
+        :param key: Base 3 key of the position, relative to the side to move
+        :return: WIN, LOSS, DRAW or UNKNOWN (game already over, or not reachable)
+        """
+        return ord(self._mmap[HEADER.size + (key >> 2):HEADER.size + (key >> 2) + 1]) >> ((key & 3) << 1) & 3
+
+    def best_move(self, tiles):
+        """
+        Finds the best move in a position, by looking up every move's resulting position
+        :param tiles: Flat list of tiles, relative to the side to move (see solved_table.relative_tiles)
+        :return: (value, cell) tuple, cell is None if there are no moves
+        """
+        # Key the position from the other side's point of view, ready to add each move as one of theirs
+        swapped_key = 0
+        mine = 0
+        for cell, tile in enumerate(tiles):
+            if tile == MINE:
+                swapped_key += THEIRS * self._weights[cell]
+                mine |= 1 << cell
+            elif tile == THEIRS:
+                swapped_key += MINE * self._weights[cell]
+        empties = tiles.count(EMPTY)
+
+        best_value, best_cell = UNKNOWN, None
+        for cell, tile in enumerate(tiles):
+            if tile != EMPTY:
+                continue
+
+            # Winning straight away beats anything
+            moved = mine | (1 << cell)
+            if any(moved & mask == mask for mask in self._cell_masks[cell]):
+                return WIN, cell
+
+            # Filling the board draws, otherwise it's the opposite of the reply's value
+            if empties == 1:
+                value = DRAW
+            else:
+                value = 4 - self.value(swapped_key + THEIRS * self._weights[cell])
+
+            if value > best_value:
+                best_value, best_cell = value, cell
+
+        return best_value, best_cell
+
+
+def main():
+    """
+    Builds (or resumes building) the tablebase from the command line
+    """
+    parser = argparse.ArgumentParser(description="Build a win/draw/loss tablebase by retrograde analysis")
+    parser.add_argument("--path", default=DEFAULT_PATH, help="tablebase file to write")
+    parser.add_argument("--size", type=int, default=4, help="board size")
+    parser.add_argument("--win-length", type=int, default=None, help="tiles in a row needed to win")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    count = build(args.path, args.size, args.win_length, args.workers)
+    print("Solved {} canonical positions, written to {}".format(count, args.path))
+
+
+# If this script is execute directly, call the main function
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+
+# Library imports
+import random
+import unittest
+
+# Project imports
+from board import Board
+from bitboard import BitBoard
+from sparse_board import SparseBoard
+
+
+def _state(board):
+    """
+    Reads everything a board reports about its position, in a form that compares the same across backends
+    :param board: Board, BitBoard or SparseBoard
+    :return: tuple
+    """
+    return board.moves, board.is_won(), bool(board.is_full()), sorted(board.list_empty_tiles())
+
+
+class PushPopTest(unittest.TestCase):
+
+    def _check_backend(self, board_class, seed):
+        """
+        Plays random pushes and pops on a board, checking it against a fresh board replaying its moves after
+        every step, and against Board played the same way
+        :param board_class: Board, BitBoard or SparseBoard
+        :param seed: Random seed
+        """
+        rng = random.Random(seed)
+        size = rng.randint(1, 7)
+        win_length = rng.randint(1, size)
+        board = board_class(size, win_length)
+        reference = Board(size, win_length)
+
+        for _ in range(size * size * 2):
+
+            # Mostly push (sometimes past a win), and sometimes pop
+            if board.moves and rng.random() < 0.3:
+                self.assertEqual(board.pop(), reference.pop())
+            else:
+                tile = reference.random_empty_tile(rng)
+                if tile is None:
+                    break
+                value = rng.choice((Board.NOUGHT, Board.CROSS))
+                board.push(tile[0], tile[1], value)
+                reference.push(tile[0], tile[1], value)
+
+            fresh = board_class(size, win_length)
+            for row, col, value in board.moves:
+                fresh.push(row, col, value)
+            self.assertEqual(_state(board), _state(fresh))
+            self.assertEqual(_state(board), _state(reference))
+
+            # Random picks only ever land on empty tiles
+            tile = board.random_empty_tile(rng)
+            self.assertEqual(tile is None, bool(board.is_full()))
+            if tile is not None:
+                self.assertTrue(board.is_empty(*tile))
+
+    def test_board(self):
+        for seed in range(30):
+            self._check_backend(Board, seed)
+
+    def test_bitboard(self):
+        for seed in range(30):
+            self._check_backend(BitBoard, seed)
+
+    def test_sparse_board(self):
+        for seed in range(30):
+            self._check_backend(SparseBoard, seed)
+
+    def test_bitboard_matrix_check_agrees_with_cached_winner(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            board = BitBoard(4, 3)
+            while not board.is_won() and not board.is_full():
+                row, col = board.random_empty_tile(rng)
+                board.push(row, col, Board.NOUGHT if len(board.moves) % 2 == 0 else Board.CROSS)
+            self.assertEqual(board.is_won(board.matrix_copy()), board.is_won())
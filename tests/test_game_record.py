@@ -0,0 +1,91 @@
+
+# Library imports
+import os
+import shutil
+import tempfile
+import unittest
+
+# Project imports
+from board import Board
+from game_record import GameRecordReader, GameRecordWriter, FILE_HEADER, MAGIC, VERSION
+
+
+def _game(index):
+    """
+    Builds the arguments of a small recorded game, different for each index
+    :param index: Game number
+    :return: tuple of GameRecordWriter.write_game arguments
+    """
+    moves = [(0, index % 3), (1, 1), (2, 2)][:1 + index % 3]
+    return 3, 3, 0, 1, Board.NOUGHT, index, Board.EMPTY, moves
+
+
+class GameRecordCrashTest(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._path = os.path.join(self._directory, "games.ngr")
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def _read(self):
+        """
+        Reads back every game in the file, as tuples comparable with _game
+        """
+        reader = GameRecordReader(self._path)
+        try:
+            return [tuple(record) for record in reader]
+        finally:
+            reader.close()
+
+    def test_crash_then_append_loses_only_the_cut_off_game(self):
+        # Two complete games, then a game cut off after its first move, as if the process died
+        writer = GameRecordWriter(self._path)
+        for index in range(2):
+            writer.write_game(*_game(index))
+        writer.start_game(3, 3, 0, 1, Board.NOUGHT, 99)
+        writer.add_move(1, 2)
+        writer.close()
+
+        # Appending after the crash keeps every complete game, before and after it
+        writer = GameRecordWriter(self._path)
+        for index in range(2, 5):
+            writer.write_game(*_game(index))
+        writer.close()
+
+        self.assertEqual(self._read(), [_game(index) for index in range(5)])
+
+    def test_append_after_every_cut_off_point(self):
+        # Record two games, and note where the second one starts
+        writer = GameRecordWriter(self._path)
+        writer.write_game(*_game(0))
+        start = os.path.getsize(self._path)
+        writer.write_game(*_game(1))
+        writer.close()
+        end = os.path.getsize(self._path)
+        with open(self._path, "rb") as record_file:
+            contents = record_file.read()
+
+        # Cut the file off at every byte of the second game (including mid header), then append a third
+        for cut in range(start, end):
+            with open(self._path, "wb") as record_file:
+                record_file.write(contents[:cut])
+            writer = GameRecordWriter(self._path)
+            writer.write_game(*_game(2))
+            writer.close()
+            self.assertEqual(self._read(), [_game(0), _game(2)], "cut at byte {}".format(cut))
+
+    def test_append_after_cut_off_file_header(self):
+        # A file header cut off part way is written again
+        with open(self._path, "wb") as record_file:
+            record_file.write(FILE_HEADER.pack(MAGIC, VERSION)[:3])
+        writer = GameRecordWriter(self._path)
+        writer.write_game(*_game(0))
+        writer.close()
+
+        self.assertEqual(self._read(), [_game(0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
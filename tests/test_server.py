@@ -0,0 +1,120 @@
+
+# Library imports
+import asyncio
+import unittest
+
+# Project imports
+from player import AiPlayer
+from server import GameServer, MAX_TIME_LIMIT
+
+
+class GameServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self._server = GameServer(workers=2)
+
+    def tearDown(self):
+        self._server.close()
+
+    def _handle(self, request):
+        """
+        Handles one request on a fresh event loop
+        :param request: Request dict
+        :return: Response dict
+        """
+        return asyncio.run(self._server.handle(request))
+
+    def _new_game(self, **request):
+        """
+        Starts a game where the human moves first (the seed decides who starts)
+        :return: Response dict
+        """
+        for seed in range(20):
+            response = self._handle(dict({"op": "new", "seed": seed}, **request))
+            self.assertTrue(response["ok"], response)
+            if response["move"] is None:
+                return response
+            self._handle({"op": "close", "game": response["game"]})
+        self.fail("no seed lets the human move first")
+
+    def test_new_rejects_bad_requests(self):
+        bad = [{"size": 0}, {"size": 51}, {"size": 3, "win_length": 4}, {"ai": [1]}, {"ai": {"workers": 4}},
+               {"ai": {"algorithm": 99}}, {"ai": {"algorithm": True}},
+               {"ai": {"algorithm": AiPlayer.MCTS_ALGORITHM, "time_limit": "x"}},
+               {"ai": {"algorithm": AiPlayer.MCTS_ALGORITHM, "time_limit": MAX_TIME_LIMIT * 2}},
+               {"ai": {"algorithm": AiPlayer.MCTS_ALGORITHM, "playouts": 0}},
+               {"size": 4, "ai": {"algorithm": AiPlayer.SOLVED_TABLE_ALGORITHM}},
+               {"size": 4, "ai": {"algorithm": AiPlayer.NEGAMAX_ALGORITHM}},
+               {"size": 8, "ai": {"algorithm": AiPlayer.NEGAMAX_ALGORITHM, "search_depth": 2}}]
+        for request in bad:
+            response = self._handle(dict(request, op="new", id=7))
+            self.assertFalse(response["ok"], request)
+            self.assertEqual(response["id"], 7)
+        self.assertEqual(self._server.sessions, 0)
+
+    def test_new_and_move(self):
+        game = self._new_game(ai={"algorithm": AiPlayer.RANDOM_DEFENSIVE_ALGORITHM})["game"]
+        response = self._handle({"op": "move", "game": game, "row": 1, "col": 1})
+        self.assertTrue(response["ok"], response)
+        self.assertNotEqual(response["move"], [1, 1])
+
+        # The AI's reply is on the board, after the human's move
+        moves = self._handle({"op": "state", "game": game})["moves"]
+        self.assertEqual(moves, [[1, 1], response["move"]])
+
+    def test_move_errors(self):
+        game = self._new_game()["game"]
+        self.assertFalse(self._handle({"op": "move", "game": game + 1000, "row": 0, "col": 0})["ok"])
+        self.assertFalse(self._handle({"op": "move", "game": game, "row": 3, "col": 0})["ok"])
+        self.assertFalse(self._handle({"op": "move", "game": game, "row": "x", "col": 0})["ok"])
+        self.assertFalse(self._handle({"op": "move", "game": game})["ok"])
+
+        # Taking a taken tile fails, and leaves the game as it was
+        response = self._handle({"op": "move", "game": game, "row": 0, "col": 0})
+        taken = [0, 0] if response["move"] is None else response["move"]
+        before = self._handle({"op": "state", "game": game})["moves"]
+        self.assertFalse(self._handle({"op": "move", "game": game, "row": taken[0], "col": taken[1]})["ok"])
+        self.assertEqual(self._handle({"op": "state", "game": game})["moves"], before)
+
+    def test_move_out_of_turn_is_rejected(self):
+        game = self._new_game()["game"]
+
+        # Hand the turn to the AI, as if its move had gone missing
+        self._server._sessions[game].game.players.reverse()
+        response = self._handle({"op": "move", "game": game, "row": 0, "col": 0})
+        self.assertFalse(response["ok"])
+        self.assertIn("not your turn", response["error"])
+        self.assertEqual(self._handle({"op": "state", "game": game})["moves"], [])
+
+    def test_ai_failure_ends_the_game(self):
+        game = self._new_game()["game"]
+
+        def fail():
+            raise TypeError("broken")
+        self._server._sessions[game].game.cross_player.make_move = fail
+
+        response = self._handle({"op": "move", "game": game, "row": 0, "col": 0})
+        self.assertFalse(response["ok"])
+        self.assertIn("ended", response["error"])
+        self.assertEqual(self._server.sessions, 0)
+        self.assertFalse(self._handle({"op": "move", "game": game, "row": 1, "col": 1})["ok"])
+
+    def test_finished_and_closed_games(self):
+        game = self._new_game(ai={"algorithm": AiPlayer.RANDOM_ALGORITHM})["game"]
+
+        # Play the first free tile until the game ends
+        response = {"finished": False}
+        while not response["finished"]:
+            moves = self._handle({"op": "state", "game": game})["moves"]
+            row, col = next((row, col) for row in range(3) for col in range(3) if [row, col] not in moves)
+            response = self._handle({"op": "move", "game": game, "row": row, "col": col})
+            self.assertTrue(response["ok"], response)
+        self.assertFalse(self._handle({"op": "move", "game": game, "row": 0, "col": 0})["ok"])
+
+        self.assertTrue(self._handle({"op": "close", "game": game})["ok"])
+        self.assertEqual(self._server.sessions, 0)
+        self.assertFalse(self._handle({"op": "state", "game": game})["ok"])
+
+    def test_unknown_op(self):
+        self.assertFalse(self._handle({"op": "fly", "id": "a"})["ok"])
+        self.assertFalse(self._handle([1, 2])["ok"])
@@ -0,0 +1,77 @@
+
+# Library imports
+import os
+import shutil
+import tempfile
+import unittest
+
+# Project imports
+import solved_table
+import tablebase
+from solved_table import EMPTY, MINE, THEIRS, WIN, LOSS, DRAW
+from bitboard import win_masks
+
+
+def _positions(size):
+    """
+    Lists every position reachable in play where the game isn't over yet, relative to the side to move
+    :param size: Board size
+    :return: list of flat tile lists
+    """
+    masks = win_masks(size)
+    found = set()
+
+    def walk(tiles):
+        """
+        Adds a position and everything reachable from it
+        """
+        key = tuple(tiles)
+        if key in found:
+            return
+        found.add(key)
+        for cell in range(size * size):
+            if tiles[cell] != EMPTY:
+                continue
+            tiles[cell] = MINE
+            mine = sum(1 << index for index, tile in enumerate(tiles) if tile == MINE)
+            if EMPTY in tiles and not any(mine & mask == mask for mask in masks):
+                walk([THEIRS if tile == MINE else MINE if tile == THEIRS else EMPTY for tile in tiles])
+            tiles[cell] = EMPTY
+
+    walk([EMPTY] * size * size)
+    return [list(tiles) for tiles in found]
+
+
+class TablesTest(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def test_tablebase_agrees_with_solved_table_on_3x3(self):
+        solved_path = os.path.join(self._directory, "solved.tbl")
+        tablebase_path = os.path.join(self._directory, "tablebase.tbl")
+        solved_table.build(solved_path, 3)
+        tablebase.build(tablebase_path, 3, workers=1)
+        solved = solved_table.SolvedTable(solved_path)
+        table = tablebase.Tablebase(tablebase_path)
+        masks = win_masks(3)
+
+        for tiles in _positions(3):
+            value, cell = table.best_move(tiles)
+            self.assertEqual(solved.lookup(tiles)[0], value, tiles)
+
+            # The tablebase's move keeps the position's value, whichever best move it picks: it wins on the
+            # spot, fills the board for a draw, or leaves the other side with the opposite value
+            self.assertEqual(tiles[cell], EMPTY)
+            moved = tiles[:cell] + [MINE] + tiles[cell + 1:]
+            mine = sum(1 << index for index, tile in enumerate(moved) if tile == MINE)
+            if any(mine & mask == mask for mask in masks):
+                self.assertEqual(value, WIN)
+            elif EMPTY not in moved:
+                self.assertEqual(value, DRAW)
+            else:
+                reply = [THEIRS if tile == MINE else MINE if tile == THEIRS else EMPTY for tile in moved]
+                self.assertEqual(solved.lookup(reply)[0], WIN + LOSS - value)
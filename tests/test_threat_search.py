@@ -0,0 +1,33 @@
+
+# Library imports
+import random
+import unittest
+
+# Project imports
+from bitboard import win_masks
+from negamax import NegamaxSearch
+from threat_search import ThreatSpaceSearch
+
+
+class ThreatSearchTest(unittest.TestCase):
+
+    def test_claimed_wins_are_real(self):
+        # On 4x4, three in a row, a full negamax search can check every win the threat search claims
+        size, win_length = 4, 3
+        masks = win_masks(size, win_length)
+        threats = ThreatSpaceSearch(size, win_length)
+        negamax = NegamaxSearch(size, win_length, table_size=1 << 18)
+        rng = random.Random(0)
+
+        claims = 0
+        for _ in range(200):
+            cells = rng.sample(range(size * size), 2 * rng.randint(1, 3))
+            attacker = sum(1 << cell for cell in cells[0::2])
+            defender = sum(1 << cell for cell in cells[1::2])
+            if any(side & mask == mask for mask in masks for side in (attacker, defender)):
+                continue
+
+            if threats.find_win(attacker, defender) is not None:
+                claims += 1
+                self.assertGreater(negamax.search(attacker, defender, 0)[0], 0, (attacker, defender))
+        self.assertGreater(claims, 0)
@@ -0,0 +1,443 @@
+
+# Library imports
+import time
+
+# Project imports
+from board import Board
+from bitboard import win_masks
+from negamax import SearchStoppedException, STOP_CHECK_NODES
+
+
+# Sides in the search, the side looking for a forced win and the side defending against it
+ATTACKER = 0
+DEFENDER = 1
+
+# Neighbourhood of the tiles already taken that the fallback policy picks from
+NEIGHBOURHOOD = 2
+
+
+class ThreatSpaceSearch(object):
+
+    def __init__(self, size, win_length=None, time_limit=None, vcf_depth=12, vct_depth=3):
+        """
+        Threat space search, for big boards (e.g. 15x15, five in a row) where searching every move gets
+        nowhere. The attacker only plays forcing moves: fours (a line one tile from complete, which must be
+        blocked) and, in the deeper VCT stage, threes (a move after which the attacker could make two fours
+        at once). The defender only tries the replies that stop the threat, or counter with a four of its
+        own. Line counts are kept per window and updated only around each move, so threats are found
+        without rescanning the board. If there is no forced win, it blocks the opponent's, and otherwise
+        falls back to a cheap open line heuristic.
+        :param size: Board size
+        :param win_length: Number of tiles in a row needed to win (defaults to size)
+        :param time_limit: Seconds to search per move (defaults to one)
+        :param vcf_depth: Most attacker moves in a victory by continuous fours
+        :param vct_depth: Most attacker moves in a victory by continuous threats (threes and fours)
+        """
+        self._size = size
+        self._cells = size * size
+        self._time_limit = 1.0 if time_limit is None else time_limit
+        self._vcf_depth = vcf_depth
+        self._vct_depth = vct_depth
+        self._deadline = None
+
+        # Windows (every run of win_length tiles), the tiles in each, and the windows through each tile
+        self._masks = win_masks(size, win_length)
+        self._win_length = bin(self._masks[0]).count("1")
+        self._cell_windows = [tuple(window for window, mask in enumerate(self._masks) if mask >> cell & 1)
+                              for cell in range(self._cells)]
+
+        # Tiles near each tile, for the fallback policy's candidate moves
+        self._neighbours = []
+        for cell in range(self._cells):
+            row, col = divmod(cell, size)
+            mask = 0
+            for near_row in range(max(0, row - NEIGHBOURHOOD), min(size, row + NEIGHBOURHOOD + 1)):
+                for near_col in range(max(0, col - NEIGHBOURHOOD), min(size, col + NEIGHBOURHOOD + 1)):
+                    mask |= 1 << (near_row * size + near_col)
+            self._neighbours.append(mask)
+
+        # Fallback move scores, by the tiles a window would hold, and tile order for ties (centre first)
+        self._weights = [4 ** tiles for tiles in range(self._win_length + 1)]
+        centre = (size - 1) / 2.0
+        self._ordering = sorted(range(self._cells),
+                                key=lambda cell: abs(cell // size - centre) + abs(cell % size - centre))
+        self._rank = [0] * self._cells
+        for rank, cell in enumerate(self._ordering):
+            self._rank[cell] = rank
+
+        # Search state, the position and the tile counts of every window, for each side. Windows only one
+        # side has tiles in are also indexed by count, for the counts threats are made of.
+        self._bits = [0, 0]
+        self._counts = [[0] * len(self._masks), [0] * len(self._masks)]
+        self._tracked = tuple(count for count in range(self._win_length - 3, self._win_length) if count > 0)
+        self._levels = [dict((count, set()) for count in self._tracked) for _ in range(2)]
+        self._table = {}
+
+        # Counters for the most recent search
+        self.nodes = 0
+        self.reason = None
+        self.sequence = []
+        self.elapsed = 0.0
+
+    def stats(self):
+        """
+        Returns the counters for the most recent search
+        :return: dict
+        """
+        return {"nodes": self.nodes,
+                "reason": self.reason,
+                "sequence": list(self.sequence),
+                "elapsed": self.elapsed}
+
+    def best_move(self, board, value):
+        """
+        Searches the board's current position, and returns the move to make
+        :param board: Board (or BitBoard) instance
+        :param value: Side to move (Board.NOUGHT or Board.CROSS)
+        :return: (row, col) tuple
+        """
+        return divmod(self.search(*self.masks_of(board, value)), self._size)
+
+    def masks_of(self, board, value):
+        """
+        Reads a board into a pair of bitmasks
+        :param board: Board (or BitBoard) instance
+        :param value: Side to move (Board.NOUGHT or Board.CROSS)
+        :return: (mine, theirs) tuple of int
+        """
+        matrix = board.matrix_copy()
+        mine = theirs = 0
+        for cell in range(self._cells):
+            tile = matrix[divmod(cell, self._size)]
+            if tile == value:
+                mine |= 1 << cell
+            elif tile != Board.EMPTY:
+                theirs |= 1 << cell
+        return mine, theirs
+
+    def search(self, mine, theirs):
+        """
+        Picks a move: the first move of a forced win if there is one, otherwise a block of the opponent's
+        immediate win or forced win, otherwise the fallback policy's move. The time limit is split between
+        looking for our win and looking for theirs.
+        :param mine: Bitmask of tiles taken by the side to move
+        :param theirs: Bitmask of tiles taken by the other side
+        :return: int tile index (None if the board is full)
+        """
+        start = time.time()
+        self.nodes = 0
+        self.sequence = []
+
+        # Our forced win
+        line = self.find_win(mine, theirs, start + self._time_limit / 2)
+        if line:
+            self.reason, self.sequence = "win", line
+            return self._finish(start, line[0])
+
+        # Their immediate win, which must be blocked
+        self._reset(theirs, mine)
+        gains = self._gains(ATTACKER)
+        if gains:
+            self.reason = "block"
+            return self._finish(start, min(gains, key=self._rank.__getitem__))
+
+        # Their forced win, take the tile it starts from
+        line = self.find_win(theirs, mine, start + self._time_limit)
+        if line:
+            self.reason, self.sequence = "defend", line
+            return self._finish(start, line[0])
+
+        self.reason = "heuristic"
+        return self._finish(start, self._fallback(mine, theirs))
+
+    def find_win(self, attacker, defender, deadline=None):
+        """
+        Looks for a forced win for the attacker (who is to move), by continuous fours, then by continuous
+        threats, each one attacker move deeper at a time until the deadline
+        :param attacker: Bitmask of the attacker's tiles
+        :param defender: Bitmask of the defender's tiles
+        :param deadline: time.time() to give up at (None for no limit)
+        :return: list of the attacker's moves along the main line (tile indices), or None
+        """
+        self._reset(attacker, defender)
+        self._deadline = deadline
+        self._table = {}
+        try:
+            for vct, max_depth in ((False, self._vcf_depth), (True, self._vct_depth)):
+                for depth in range(1, max_depth + 1):
+                    line = self._attack(depth, vct)
+                    if line is not None:
+                        return line
+        except SearchStoppedException:
+            pass
+        finally:
+            self._deadline = None
+        return None
+
+    def _finish(self, start, cell):
+        """
+        Records the search time, and passes the chosen move through
+        :param start: time.time() the search started
+        :param cell: Tile index chosen
+        :return: cell
+        """
+        self.elapsed = time.time() - start
+        return cell
+
+    def _reset(self, attacker, defender):
+        """
+        Sets up the search state for a position, counting every window from scratch
+        :param attacker: Bitmask of the attacker's tiles
+        :param defender: Bitmask of the defender's tiles
+        """
+        self._bits = [attacker, defender]
+        for side, bits in enumerate(self._bits):
+            self._counts[side] = [bin(bits & mask).count("1") for mask in self._masks]
+            for windows in self._levels[side].values():
+                windows.clear()
+        for window in range(len(self._masks)):
+            self._classify(window)
+
+    def _classify(self, window):
+        """
+        Files a window under the tile count of the side holding it, if only one side has tiles in it
+        :param window: Window index
+        """
+        for side in (ATTACKER, DEFENDER):
+            levels = self._levels[side]
+            for windows in levels.values():
+                windows.discard(window)
+            count = self._counts[side][window]
+            if count in levels and not self._counts[1 - side][window]:
+                levels[count].add(window)
+
+    def _play(self, cell, side):
+        """
+        Takes a tile, updating the windows through it
+        :param cell: Tile index
+        :param side: ATTACKER or DEFENDER
+        """
+        self._bits[side] |= 1 << cell
+        counts = self._counts[side]
+        for window in self._cell_windows[cell]:
+            counts[window] += 1
+            self._classify(window)
+
+    def _unplay(self, cell, side):
+        """
+        Gives a tile back, updating the windows through it
+        :param cell: Tile index
+        :param side: ATTACKER or DEFENDER
+        """
+        self._bits[side] &= ~(1 << cell)
+        counts = self._counts[side]
+        for window in self._cell_windows[cell]:
+            counts[window] -= 1
+            self._classify(window)
+
+    def _empty_cells(self, windows):
+        """
+        Lists the free tiles of some windows
+        :param windows: Iterable of window indices
+        :return: set of tile indices
+        """
+        free = ~(self._bits[ATTACKER] | self._bits[DEFENDER])
+        cells = set()
+        for window in windows:
+            empty = self._masks[window] & free
+            while empty:
+                low_bit = empty & -empty
+                cells.add(low_bit.bit_length() - 1)
+                empty ^= low_bit
+        return cells
+
+    def _gains(self, side):
+        """
+        Finds the tiles that would win straight away for a side (the last free tile of its fours)
+        :param side: ATTACKER or DEFENDER
+        :return: set of tile indices
+        """
+        return self._empty_cells(self._levels[side][self._win_length - 1])
+
+    def _four_moves(self, side):
+        """
+        Finds the moves that make a four for a side
+        :param side: ATTACKER or DEFENDER
+        :return: set of tile indices
+        """
+        if self._win_length - 2 not in self._levels[side]:
+            return set()
+        return self._empty_cells(self._levels[side][self._win_length - 2])
+
+    def _double_fours(self):
+        """
+        Finds the moves that would give the attacker two winning tiles at once, which can't both be blocked
+        :return: dict of tile index: set of the window indices it would make fours of
+        """
+        if self._win_length - 2 not in self._levels[ATTACKER]:
+            return {}
+        threes = self._levels[ATTACKER][self._win_length - 2]
+        free = ~(self._bits[ATTACKER] | self._bits[DEFENDER])
+        doubles = {}
+        for cell in self._empty_cells(threes):
+
+            # The winning tiles a move makes are the other free tile of each three through it
+            windows = [window for window in self._cell_windows[cell] if window in threes]
+            gains = set((self._masks[window] & free & ~(1 << cell)).bit_length() - 1 for window in windows)
+            if len(gains) >= 2:
+                doubles[cell] = windows
+        return doubles
+
+    def _three_moves(self):
+        """
+        Finds the attacker's candidate threes: moves into a window where it already has all but three tiles
+        :return: set of tile indices
+        """
+        if self._win_length - 3 not in self._levels[ATTACKER]:
+            return set()
+        return self._empty_cells(self._levels[ATTACKER][self._win_length - 3])
+
+    def _check_time(self):
+        """
+        Counts a node, and gives up the search if it has run out of time
+        :raises SearchStoppedException if past the deadline
+        """
+        self.nodes += 1
+        if not self.nodes % STOP_CHECK_NODES and self._deadline is not None and time.time() >= self._deadline:
+            raise SearchStoppedException()
+
+    def _attack(self, depth, vct):
+        """
+        Attacker to move, tries each forcing move
+        :param depth: Attacker moves left
+        :param vct: Allow threes, not just fours?
+        :return: list of the attacker's moves along the main line, or None if there's no forced win
+        """
+        self._check_time()
+
+        # Win straight away if a four is already there
+        gains = self._gains(ATTACKER)
+        if gains:
+            return [min(gains)]
+        if depth == 0:
+            return None
+
+        key = (self._bits[ATTACKER], self._bits[DEFENDER], depth, vct)
+        if key in self._table:
+            return self._table[key]
+
+        # A four from the defender has to be blocked. That's only forcing if the block keeps the attack
+        # going, which the defender's reply checks.
+        threats = self._gains(DEFENDER)
+        if threats:
+            line = None
+            if len(threats) == 1:
+                cell = threats.pop()
+                self._play(cell, ATTACKER)
+                reply = self._defend(depth, vct)
+                self._unplay(cell, ATTACKER)
+                line = None if reply is None else [cell] + reply
+            self._table[key] = line
+            return line
+
+        # Moves making two fours at once win outright, then other fours, then threes
+        doubles = self._double_fours()
+        fours = self._four_moves(ATTACKER) - set(doubles)
+        candidates = sorted(doubles, key=self._rank.__getitem__) + sorted(fours, key=self._rank.__getitem__)
+        if vct and depth > 1:
+            candidates += sorted(self._three_moves() - fours - set(doubles), key=self._rank.__getitem__)
+
+        line = None
+        for cell in candidates:
+            self._play(cell, ATTACKER)
+            reply = self._defend(depth, vct)
+            self._unplay(cell, ATTACKER)
+            if reply is not None:
+                line = [cell] + reply
+                break
+
+        self._table[key] = line
+        return line
+
+    def _defend(self, depth, vct):
+        """
+        Defender to move after a threat, tries every reply that matters
+        :param depth: Attacker moves left, including the one just made
+        :param vct: Allow threes, not just fours?
+        :return: list of the attacker's moves along the main line after this, or None if the defender escapes
+        """
+        self._check_time()
+
+        # The defender wins first if it has a four of its own
+        if self._gains(DEFENDER):
+            return None
+
+        # Two winning tiles can't both be blocked, and one must be
+        gains = self._gains(ATTACKER)
+        if len(gains) >= 2:
+            return [min(gains)]
+        if gains:
+            replies = gains
+
+        # A three only forces a reply if it threatens two fours at once, and the replies that matter are
+        # those tiles, the other free tiles of their windows, and counter fours
+        elif vct:
+            doubles = self._double_fours()
+            if not doubles:
+                return None
+            replies = set(doubles) | self._four_moves(DEFENDER)
+            replies |= self._empty_cells(window for windows in doubles.values() for window in windows)
+        else:
+            return None
+
+        # The attack has to work against every reply
+        line = None
+        for cell in sorted(replies, key=self._rank.__getitem__):
+            self._play(cell, DEFENDER)
+            reply = self._attack(depth - 1, vct)
+            self._unplay(cell, DEFENDER)
+            if reply is None:
+                return None
+            if line is None:
+                line = reply
+        return line
+
+    def _fallback(self, mine, theirs):
+        """
+        Cheap policy for when nobody has a forced win: the free tile near the others that adds most to our
+        open lines and takes most from theirs
+        :param mine: Bitmask of tiles taken by the side to move
+        :param theirs: Bitmask of tiles taken by the other side
+        :return: int tile index (None if the board is full)
+        """
+        taken = mine | theirs
+        free = ((1 << self._cells) - 1) & ~taken
+        if not free:
+            return None
+
+        # Candidates are the free tiles near taken ones (the centre on an empty board)
+        near = 0
+        remaining = taken
+        while remaining:
+            low_bit = remaining & -remaining
+            near |= self._neighbours[low_bit.bit_length() - 1]
+            remaining ^= low_bit
+        candidates = near & free or free
+
+        self._reset(mine, theirs)
+        weights = self._weights
+        best, best_score = None, -1
+        for cell in self._ordering:
+            if not candidates >> cell & 1:
+                continue
+            score = 0
+            for window in self._cell_windows[cell]:
+                mine_count = self._counts[ATTACKER][window]
+                theirs_count = self._counts[DEFENDER][window]
+                if not theirs_count:
+                    score += weights[mine_count + 1]
+                if not mine_count:
+                    score += weights[theirs_count + 1]
+            if score > best_score:
+                best, best_score = cell, score
+        return best
@@ -1,53 +1,122 @@
 
+# Library imports
+import sys
+import time
+
+
+# ANSI escape codes: clear the screen, move the cursor to a line and column (1 based), and clear from the
+# cursor to the end of the screen
+CLEAR_SCREEN = "\x1b[2J"
+MOVE_CURSOR = "\x1b[{};{}H"
+CLEAR_BELOW = "\x1b[J"
+
 
 class View(object):
 
-    def __init__(self, board):
+    def __init__(self, board, stream=None, max_fps=None):
         """
-        Simple ascii text based view, to display the current board state
-        :param board:
+        Text based view, to display the current board state in an ANSI terminal. The first frame draws the
+        whole board, and later frames only redraw the tiles that changed since the last one (found from the
+        board's move stack), each frame written to the terminal in one go.
+        :param board: Board to display (a bounded one, if a SparseBoard)
+        :param stream: Text stream to write frames to (defaults to sys.stdout)
+        :param max_fps: Most frames to draw per second, for fast AI vs AI playback (None for no limit).
+                        Frames asked for sooner are skipped, the next frame drawn catches up on them.
         """
         self._board = board
+        self._stream = sys.stdout if stream is None else stream
+        self._interval = 0.0 if max_fps is None else 1.0 / max_fps
+        self._last_frame = None
+
+        # Moves shown on screen, to diff the board's move stack against
+        self._shown = None
+
+        # Layout: row numbers are label_width wide, and each column cell_width wide, icon last
+        self._label_width = len(str(board.size - 1))
+        self._cell_width = self._label_width + 2
+        self._icons = {board.EMPTY: ".", board.NOUGHT: "0", board.CROSS: "X"}
+
+    def render(self, force=False):
+        """
+        Render the current board state to the screen, in ascii text, unless the frame rate limit skips it
+        :param force: Render even if the frame rate limit would skip this frame (e.g. for the final position)
+        """
+        # Skip the frame if the last one was too recent
+        now = time.perf_counter()
+        if not force and self._last_frame is not None and now - self._last_frame < self._interval:
+            return
+        self._last_frame = now
 
-    def render(self):
+        # Draw the whole board the first time, and after that just the tiles that changed
+        moves = self._board.moves
+        frame = self._full_frame() if self._shown is None else self._diff_frame(moves)
+        self._shown = moves
+
+        # Leave the cursor under the board, clearing anything printed there since the last frame
+        frame += MOVE_CURSOR.format(self._board.size + 2, 1) + CLEAR_BELOW
+        self._stream.write(frame)
+        self._stream.flush()
+
+    def _full_frame(self):
         """
-        Render the current board state to the screen, in ascii text
+        Builds a frame that clears the screen and draws the whole board
+        :return: str
         """
+        matrix = self._board.matrix_copy().tolist()
+        icons = self._icons
 
-        # Grab a copy of the board matrix
-        board_matrix = self._board.matrix_copy()
+        # Column numbers, then each row number followed by its icons
+        lines = [" " * (self._label_width + 2) + "".join(str(col).rjust(self._cell_width)
+                                                         for col in range(self._board.size))]
+        for row, values in enumerate(matrix):
+            lines.append(" {} ".format(str(row).rjust(self._label_width)) +
+                         "".join(icons[value].rjust(self._cell_width) for value in values))
 
-        # Clear the console screen
-        self.clear_screen()
+        return CLEAR_SCREEN + MOVE_CURSOR.format(1, 1) + "\n".join(lines)
 
-        # Print the initial line col numbers
-        print("     "+"  ".join([str(x) for x in range(self._board.size)]))
+    def _diff_frame(self, moves):
+        """
+        Builds a frame that redraws only the tiles whose moves differ from the moves shown. Moves no longer on
+        the board (undone by pop) are blanked first, then the new moves drawn.
+        :param moves: Board's current list of (row, col, value) moves
+        :return: str
+        """
+        shown = self._shown
 
-        # Iterate through each row
-        for row in range(self._board.size):
+        # Find how many moves are the same as last frame
+        same = 0
+        limit = min(len(shown), len(moves))
+        while same < limit and shown[same] == moves[same]:
+            same += 1
 
-            # Prepare a string with the row number
-            row_str = " {} ".format(row)
+        parts = [self._tile(row, col, self._board.EMPTY) for row, col, _ in shown[same:]]
+        parts.extend(self._tile(row, col, value) for row, col, value in moves[same:])
+        return "".join(parts)
 
-            # Iterate through each column
-            for col in range(self._board.size):
+    def _tile(self, row, col, value):
+        """
+        Builds the escape sequence drawing one tile's icon in place
+        :param row: Row index
+        :param col: Column index
+        :param value: Tile value
+        :return: str
+        """
+        # The column numbers take the first line, and each row's label comes before its icons
+        return MOVE_CURSOR.format(row + 2, self._label_width + 2 + (col + 1) * self._cell_width) + self._icons[value]
 
-                # Set the appropriate icon char if the tile is nought, cross or empty
-                if board_matrix[row, col] == self._board.NOUGHT:
-                    icon = "0"
-                elif board_matrix[row, col] == self._board.CROSS:
-                    icon = "X"
-                else:
-                    icon = "."
 
-                # Append icon to row string
-                row_str += "  " + icon
+class NullView(object):
 
-            # Now we've finished concating the row string, print it
-            print(row_str)
+    def __init__(self, board=None):
+        """
+        View that displays nothing, for headless games
+        :param board: Ignored
+        """
+        pass
 
-    def clear_screen(self):
+    def render(self, force=False):
         """
-        Clear the screen, by printing loads of newlines
+        Does nothing
+        :param force: Ignored
         """
-        print('\n' * 80)
+        pass